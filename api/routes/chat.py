@@ -6,6 +6,7 @@ conversation management.
 """
 
 import logging
+from typing import Optional
 from fastapi import APIRouter, Depends, Request, Form
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
@@ -53,11 +54,16 @@ async def chat_page(
 async def process_chat(
     request: Request, 
     message: str = Form(...),
+    start_date: Optional[str] = Form(None),
+    end_date: Optional[str] = Form(None),
     chat_service: ChatService = Depends(get_chat_service_dependency)
 ):
     """Process a chat message and return the response"""
+    # Optional YYYY-MM-DD bounds scope the vector context to those days
+    date_range = (start_date or None, end_date or None) if (start_date or end_date) else None
+
     # Process the chat message
-    response = await chat_service.process_chat_message(message)
+    response = await chat_service.process_chat_message(message, date_range=date_range)
     
     # Get updated chat history
     history = chat_service.get_chat_history(limit=10)
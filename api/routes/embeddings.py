@@ -6,9 +6,9 @@ and processing operations.
 """
 
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
 from services.startup import StartupService
@@ -49,4 +49,44 @@ async def process_pending_embeddings(
         success=True,
         message=f"Processed {result['processed']} items",
         result=result
-    )
\ No newline at end of file
+    )
+
+@router.post("/backfill", response_model=EmbeddingProcessResponse)
+@handle_api_exceptions("Failed to start embedding backfill", 500)
+async def start_embedding_backfill(
+    workers: Optional[int] = None,
+    page_size: Optional[int] = None,
+    restart: bool = False,
+    startup_service: StartupService = Depends(get_startup_service_dependency)
+):
+    """Re-embed the whole corpus on worker processes, in the background"""
+    if not startup_service.vector_store:
+        raise HTTPException(status_code=503, detail="Vector store not available")
+    if startup_service.backfill_running:
+        raise HTTPException(status_code=409, detail="Embedding backfill already running")
+    
+    startup_service.start_embedding_backfill(workers, page_size, restart)
+    
+    return EmbeddingProcessResponse(
+        success=True,
+        message="Embedding backfill started",
+        result=startup_service.get_embedding_backfill_status()
+    )
+
+
+@router.get("/backfill", response_model=EmbeddingProcessResponse)
+@handle_api_exceptions("Failed to get embedding backfill status", 500)
+async def get_embedding_backfill_status(
+    startup_service: StartupService = Depends(get_startup_service_dependency)
+):
+    """Progress of the embedding backfill and the result of the last run"""
+    if not startup_service.vector_store:
+        raise HTTPException(status_code=503, detail="Vector store not available")
+    
+    status = startup_service.get_embedding_backfill_status()
+    
+    return EmbeddingProcessResponse(
+        success=status["error"] is None,
+        message="Embedding backfill running" if status["running"] else "Embedding backfill idle",
+        result=status
+    )
@@ -94,12 +94,45 @@ def create_production_config() -> AppConfig:
         embeddings=EmbeddingConfig(
             model_name=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
             device=os.getenv("EMBEDDING_DEVICE", "cpu"),
-            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+            cache_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+            encode_executor=os.getenv("EMBEDDING_ENCODE_EXECUTOR", "thread"),
+            encode_workers=int(os.getenv("EMBEDDING_ENCODE_WORKERS", "1")),
+            micro_batch_wait_ms=float(os.getenv("EMBEDDING_MICRO_BATCH_WAIT_MS", "5")),
+            micro_batch_max_size=int(os.getenv("EMBEDDING_MICRO_BATCH_MAX_SIZE", "32")),
+            token_budget=int(os.getenv("EMBEDDING_TOKEN_BUDGET", "8192")),
+            backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+            onnx_quantize=os.getenv("EMBEDDING_ONNX_QUANTIZE", "false").lower() == "true",
+            onnx_cache_dir=os.getenv("EMBEDDING_ONNX_CACHE_DIR", "onnx_models"),
+            chunking_enabled=os.getenv("EMBEDDING_CHUNKING_ENABLED", "true").lower() == "true",
+            chunk_max_tokens=int(os.getenv("EMBEDDING_CHUNK_MAX_TOKENS", "0")),
+            chunk_overlap_tokens=int(os.getenv("EMBEDDING_CHUNK_OVERLAP_TOKENS", "32")),
+            chunk_parent_vector=os.getenv("EMBEDDING_CHUNK_PARENT_VECTOR", "true").lower() == "true",
+            backfill_workers=int(os.getenv("EMBEDDING_BACKFILL_WORKERS", "2")),
+            backfill_page_size=int(os.getenv("EMBEDDING_BACKFILL_PAGE_SIZE", "256")),
+            backfill_threads_per_worker=int(os.getenv("EMBEDDING_BACKFILL_THREADS_PER_WORKER", "0"))
         ),
         vector_store=VectorStoreConfig(
             index_path=os.getenv("VECTOR_INDEX_PATH", "vector_index.faiss"),
             id_map_path=os.getenv("VECTOR_ID_MAP_PATH", "vector_ids.json"),
-            dimension=int(os.getenv("VECTOR_DIMENSION", "384"))
+            dimension=int(os.getenv("VECTOR_DIMENSION", "384")),
+            wal_enabled=os.getenv("VECTOR_WAL_ENABLED", "true").lower() == "true",
+            wal_fsync=os.getenv("VECTOR_WAL_FSYNC", "false").lower() == "true",
+            checkpoint_interval=int(os.getenv("VECTOR_CHECKPOINT_INTERVAL", "1000")),
+            mmap_index=os.getenv("VECTOR_MMAP_INDEX", "false").lower() == "true",
+            index_type=os.getenv("VECTOR_INDEX_TYPE", "flat"),
+            ivf_nlist=int(os.getenv("VECTOR_IVF_NLIST", "0")),
+            ivf_nprobe=int(os.getenv("VECTOR_IVF_NPROBE", "8")),
+            ivf_min_train_size=int(os.getenv("VECTOR_IVF_MIN_TRAIN_SIZE", "1024")),
+            quantization=os.getenv("VECTOR_QUANTIZATION", "none"),
+            quantization_rescore=int(os.getenv("VECTOR_QUANTIZATION_RESCORE", "4")),
+            hnsw_m=int(os.getenv("VECTOR_HNSW_M", "16")),
+            hnsw_ef_construction=int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "200")),
+            hnsw_ef_search=int(os.getenv("VECTOR_HNSW_EF_SEARCH", "64")),
+            compaction_interval_hours=int(os.getenv("VECTOR_COMPACTION_INTERVAL_HOURS", "24")),
+            compaction_min_free_ratio=float(os.getenv("VECTOR_COMPACTION_MIN_FREE_RATIO", "0.1")),
+            search_threads=int(os.getenv("VECTOR_SEARCH_THREADS", "1")),
+            unversioned_index_model=os.getenv("VECTOR_UNVERSIONED_INDEX_MODEL") or None
         ),
         limitless=LimitlessConfig(
             api_key=os.getenv("LIMITLESS_API_KEY"),
@@ -127,7 +160,10 @@ def create_production_config() -> AppConfig:
             default_limit=int(os.getenv("SEARCH_DEFAULT_LIMIT", "20")),
             max_limit=int(os.getenv("SEARCH_MAX_LIMIT", "100")),
             similarity_threshold=float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.7")),
-            max_top_k=int(os.getenv("SEARCH_MAX_TOP_K", "50"))
+            max_top_k=int(os.getenv("SEARCH_MAX_TOP_K", "50")),
+            mmr_enabled=os.getenv("SEARCH_MMR_ENABLED", "false").lower() == "true",
+            mmr_lambda=float(os.getenv("SEARCH_MMR_LAMBDA", "0.5")),
+            mmr_candidate_pool=int(os.getenv("SEARCH_MMR_CANDIDATE_POOL", "20"))
         ),
         scheduler=SchedulerConfig(
             check_interval_seconds=int(os.getenv("SCHEDULER_CHECK_INTERVAL", "300")),
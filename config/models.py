@@ -20,6 +20,35 @@ class EmbeddingConfig(BaseModel):
     model_name: str = "all-MiniLM-L6-v2"
     device: str = "cpu"
     batch_size: int = 32
+    # SQLite cache of vectors keyed by content hash and model name (None disables it)
+    cache_path: Optional[str] = None
+    # model.encode runs off the event loop on a "thread" or "process" pool,
+    # with at most encode_workers batches encoding at once
+    encode_executor: str = "thread"
+    encode_workers: int = 1
+    # Concurrent embed_text calls are collected for up to micro_batch_wait_ms
+    # (or micro_batch_max_size texts) and encoded together (0 ms disables it)
+    micro_batch_wait_ms: float = 5.0
+    micro_batch_max_size: int = 32
+    # embed_texts sorts texts by token length and sizes each batch so its
+    # padded length stays within token_budget tokens (0 uses batch_size batches)
+    token_budget: int = 8192
+    # "torch" runs the SentenceTransformer; "onnx" exports it once to onnx_cache_dir
+    # (int8-quantized with onnx_quantize) and runs it on ONNX Runtime
+    backend: str = "torch"
+    onnx_quantize: bool = False
+    onnx_cache_dir: str = "onnx_models"
+    # Texts longer than chunk_max_tokens (0 uses the model's max_seq_length) are
+    # embedded as overlapping chunks, plus the mean of their vectors as the parent
+    chunking_enabled: bool = True
+    chunk_max_tokens: int = 0
+    chunk_overlap_tokens: int = 32
+    chunk_parent_vector: bool = True
+    # Bulk backfills stream backfill_page_size records per task to backfill_workers
+    # processes, each pinned to backfill_threads_per_worker torch threads (0 splits the CPUs)
+    backfill_workers: int = 2
+    backfill_page_size: int = 256
+    backfill_threads_per_worker: int = 0
     
     @field_validator('device')
     @classmethod
@@ -28,6 +57,69 @@ class EmbeddingConfig(BaseModel):
             raise ValueError("Device must be one of: cpu, cuda, mps")
         return v
     
+    @field_validator('encode_executor')
+    @classmethod
+    def validate_encode_executor(cls, v):
+        if v not in ["thread", "process"]:
+            raise ValueError("Encode executor must be one of: thread, process")
+        return v
+    
+    @field_validator('encode_workers')
+    @classmethod
+    def validate_encode_workers(cls, v):
+        if v < 1:
+            raise ValueError("Encode workers must be at least 1")
+        return v
+    
+    @field_validator('micro_batch_wait_ms')
+    @classmethod
+    def validate_micro_batch_wait_ms(cls, v):
+        if v < 0:
+            raise ValueError("Micro-batch wait must be non-negative")
+        return v
+    
+    @field_validator('micro_batch_max_size')
+    @classmethod
+    def validate_micro_batch_max_size(cls, v):
+        if v < 1:
+            raise ValueError("Micro-batch max size must be at least 1")
+        return v
+    
+    @field_validator('token_budget')
+    @classmethod
+    def validate_token_budget(cls, v):
+        if v < 0:
+            raise ValueError("Token budget must be non-negative")
+        return v
+    
+    @field_validator('backend')
+    @classmethod
+    def validate_backend(cls, v):
+        if v not in ["torch", "onnx"]:
+            raise ValueError("Backend must be one of: torch, onnx")
+        return v
+    
+    @field_validator('chunk_max_tokens', 'chunk_overlap_tokens')
+    @classmethod
+    def validate_chunk_tokens(cls, v):
+        if v < 0:
+            raise ValueError("Chunk token counts must be non-negative")
+        return v
+    
+    @field_validator('backfill_workers', 'backfill_page_size')
+    @classmethod
+    def validate_backfill_sizes(cls, v):
+        if v < 1:
+            raise ValueError("Backfill workers and page size must be at least 1")
+        return v
+    
+    @field_validator('backfill_threads_per_worker')
+    @classmethod
+    def validate_backfill_threads_per_worker(cls, v):
+        if v < 0:
+            raise ValueError("Backfill threads per worker must be non-negative")
+        return v
+    
     @classmethod
     def from_env(cls):
         """Create config from environment variables"""
@@ -35,22 +127,144 @@ class EmbeddingConfig(BaseModel):
         return cls(
             model_name=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
             device=os.getenv("EMBEDDING_DEVICE", "cpu"),
-            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+            cache_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+            encode_executor=os.getenv("EMBEDDING_ENCODE_EXECUTOR", "thread"),
+            encode_workers=int(os.getenv("EMBEDDING_ENCODE_WORKERS", "1")),
+            micro_batch_wait_ms=float(os.getenv("EMBEDDING_MICRO_BATCH_WAIT_MS", "5")),
+            micro_batch_max_size=int(os.getenv("EMBEDDING_MICRO_BATCH_MAX_SIZE", "32")),
+            token_budget=int(os.getenv("EMBEDDING_TOKEN_BUDGET", "8192")),
+            backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+            onnx_quantize=os.getenv("EMBEDDING_ONNX_QUANTIZE", "false").lower() == "true",
+            onnx_cache_dir=os.getenv("EMBEDDING_ONNX_CACHE_DIR", "onnx_models"),
+            chunking_enabled=os.getenv("EMBEDDING_CHUNKING_ENABLED", "true").lower() == "true",
+            chunk_max_tokens=int(os.getenv("EMBEDDING_CHUNK_MAX_TOKENS", "0")),
+            chunk_overlap_tokens=int(os.getenv("EMBEDDING_CHUNK_OVERLAP_TOKENS", "32")),
+            chunk_parent_vector=os.getenv("EMBEDDING_CHUNK_PARENT_VECTOR", "true").lower() == "true",
+            backfill_workers=int(os.getenv("EMBEDDING_BACKFILL_WORKERS", "2")),
+            backfill_page_size=int(os.getenv("EMBEDDING_BACKFILL_PAGE_SIZE", "256")),
+            backfill_threads_per_worker=int(os.getenv("EMBEDDING_BACKFILL_THREADS_PER_WORKER", "0"))
         )
 
 
 class VectorStoreConfig(BaseModel):
     """Vector store configuration"""
     index_path: str = "vector_index.faiss"
-    id_map_path: str = "vector_ids.json"
+    id_map_path: str = "vector_ids.json"  # legacy JSON ID map, read once for migration
     dimension: int = 384  # Matches all-MiniLM-L6-v2
-    
+    # Append-only mutation log, folded into the snapshot every checkpoint_interval records
+    wal_enabled: bool = True
+    wal_fsync: bool = False
+    checkpoint_interval: int = 1000
+    # Memory-map the snapshot read-only instead of loading it into RAM
+    mmap_index: bool = False
+    # "flat" scans every row; "ivf" probes the nprobe closest of nlist k-means lists;
+    # "hnsw" uses the graph backend in core/hnsw_store.py
+    index_type: str = "flat"
+    ivf_nlist: int = 0  # 0 picks sqrt(vector count) at training time
+    ivf_nprobe: int = 8
+    ivf_min_train_size: int = 1024
+    ivf_imbalance_threshold: float = 4.0  # retrain when the largest list exceeds this multiple of the mean
+    # Scan int8/float16 codes first, then rescore the best k * quantization_rescore
+    # candidates in float32 (0 returns the approximate scores)
+    quantization: str = "none"
+    quantization_rescore: int = 4
+    hnsw_m: int = 16  # links per node on upper layers (2 * M on layer 0)
+    hnsw_ef_construction: int = 200
+    hnsw_ef_search: int = 64
+    # Scheduled compaction renumbers live rows densely once this fraction of rows is free
+    compaction_interval_hours: int = 24  # 0 disables the scheduled job
+    compaction_min_free_ratio: float = 0.1
+    # Exact scans are split into blocks scored on this many threads (0 uses every core)
+    search_threads: int = 1
+    # Embedding model of an index saved before models were recorded; unset, such an index is rebuilt
+    unversioned_index_model: Optional[str] = None
+
     @field_validator('index_path', 'id_map_path')
     @classmethod
     def validate_paths(cls, v):
         if not v or not isinstance(v, str):
             raise ValueError("Path must be a non-empty string")
         return v
+    
+    @field_validator('checkpoint_interval')
+    @classmethod
+    def validate_checkpoint_interval(cls, v):
+        if v <= 0:
+            raise ValueError("Checkpoint interval must be positive")
+        return v
+
+    @field_validator('index_type')
+    @classmethod
+    def validate_index_type(cls, v):
+        valid_types = ["flat", "ivf", "hnsw"]
+        if v not in valid_types:
+            raise ValueError(f"Index type must be one of: {valid_types}")
+        return v
+
+    @field_validator('ivf_nprobe', 'ivf_min_train_size')
+    @classmethod
+    def validate_ivf_positive(cls, v):
+        if v <= 0:
+            raise ValueError("IVF nprobe and minimum training size must be positive")
+        return v
+
+    @field_validator('quantization')
+    @classmethod
+    def validate_quantization(cls, v):
+        valid_modes = ["none", "int8", "float16"]
+        if v not in valid_modes:
+            raise ValueError(f"Quantization must be one of: {valid_modes}")
+        return v
+
+    @field_validator('quantization_rescore')
+    @classmethod
+    def validate_quantization_rescore(cls, v):
+        if v < 0:
+            raise ValueError("Quantization rescore factor must be non-negative")
+        return v
+
+    @field_validator('hnsw_m')
+    @classmethod
+    def validate_hnsw_m(cls, v):
+        if v < 2:
+            raise ValueError("HNSW M must be at least 2")
+        return v
+
+    @field_validator('hnsw_ef_construction', 'hnsw_ef_search')
+    @classmethod
+    def validate_hnsw_ef(cls, v):
+        if v <= 0:
+            raise ValueError("HNSW ef parameters must be positive")
+        return v
+
+    @field_validator('ivf_nlist')
+    @classmethod
+    def validate_ivf_nlist(cls, v):
+        if v < 0:
+            raise ValueError("IVF nlist must be non-negative")
+        return v
+
+    @field_validator('compaction_interval_hours')
+    @classmethod
+    def validate_compaction_interval(cls, v):
+        if v < 0:
+            raise ValueError("Compaction interval must be non-negative")
+        return v
+
+    @field_validator('compaction_min_free_ratio')
+    @classmethod
+    def validate_compaction_min_free_ratio(cls, v):
+        if not 0.0 <= v <= 1.0:
+            raise ValueError("Compaction minimum free ratio must be between 0 and 1")
+        return v
+
+    @field_validator('search_threads')
+    @classmethod
+    def validate_search_threads(cls, v):
+        if v < 0:
+            raise ValueError("Search threads must be non-negative")
+        return v
 
 
 
@@ -160,6 +374,11 @@ class SearchConfig(BaseModel):
     max_limit: int = 100
     similarity_threshold: float = 0.7
     max_top_k: int = 50
+    # Maximal marginal relevance reranking of vector results: mmr_candidate_pool
+    # matches are retrieved and the most relevant yet mutually dissimilar kept
+    mmr_enabled: bool = False
+    mmr_lambda: float = 0.5  # 1.0 is pure relevance, 0.0 pure diversity
+    mmr_candidate_pool: int = 20
     
     @field_validator('max_top_k')
     @classmethod
@@ -168,6 +387,20 @@ class SearchConfig(BaseModel):
             raise ValueError("max_top_k must be positive")
         return v
 
+    @field_validator('mmr_lambda')
+    @classmethod
+    def validate_mmr_lambda(cls, v):
+        if not 0.0 <= v <= 1.0:
+            raise ValueError("MMR lambda must be between 0 and 1")
+        return v
+
+    @field_validator('mmr_candidate_pool')
+    @classmethod
+    def validate_mmr_candidate_pool(cls, v):
+        if v <= 0:
+            raise ValueError("MMR candidate pool must be positive")
+        return v
+
 
 class SchedulerConfig(BaseModel):
     """Scheduler configuration"""
@@ -95,11 +95,24 @@ class DatabaseService:
             """, (status, id))
             conn.commit()
     
+    def update_embedding_status_batch(self, ids: List[str], status: str):
+        """Update embedding status for several data items in one transaction"""
+        if not ids:
+            return
+        
+        with self.get_connection() as conn:
+            conn.executemany("""
+                UPDATE data_items 
+                SET embedding_status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [(status, id) for id in ids])
+            conn.commit()
+    
     def get_pending_embeddings(self, limit: int = 100) -> List[Dict]:
         """Get data items that need embedding"""
         with self.get_connection() as conn:
             cursor = conn.execute("""
-                SELECT id, namespace, source_id, content, metadata
+                SELECT id, namespace, source_id, content, metadata, days_date
                 FROM data_items 
                 WHERE embedding_status = 'pending'
                 ORDER BY created_at ASC
@@ -118,6 +131,86 @@ class DatabaseService:
             
             return results
     
+    def get_data_items_page(self, after_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Get data items in id order, starting after after_id (keyset pagination)"""
+        with self.get_connection() as conn:
+            cursor = conn.execute("""
+                SELECT id, namespace, source_id, content, metadata, days_date
+                FROM data_items 
+                WHERE id > ?
+                ORDER BY id ASC
+                LIMIT ?
+            """, (after_id or '', limit))
+            
+            return DatabaseRowParser.parse_rows_with_metadata(
+                [dict(row) for row in cursor.fetchall()]
+            )
+    
+    def store_segments(self, parent_id: str, segments: List[Dict], days_date: str = None) -> List[str]:
+        """Replace the conversation segments of an item, returning the ids of segments removed"""
+        with self.get_connection() as conn:
+            cursor = conn.execute("SELECT id FROM data_item_segments WHERE parent_id = ?", (parent_id,))
+            previous = [row['id'] for row in cursor.fetchall()]
+            
+            conn.execute("DELETE FROM data_item_segments WHERE parent_id = ?", (parent_id,))
+            conn.executemany("""
+                INSERT INTO data_item_segments
+                (id, parent_id, segment_index, content, speaker, start_time, end_time, days_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(segment['id'], parent_id, segment['segment_index'], segment['content'],
+                   segment.get('speaker'), segment.get('start_time'), segment.get('end_time'), days_date)
+                  for segment in segments])
+            conn.commit()
+        
+        current = {segment['id'] for segment in segments}
+        return [segment_id for segment_id in previous if segment_id not in current]
+    
+    def _query_segments(self, where: str, params: tuple) -> List[Dict]:
+        """Segments joined with their item's namespace and metadata"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(f"""
+                SELECT s.id, s.parent_id, s.segment_index, s.content, s.speaker,
+                       s.start_time, s.end_time, s.days_date, d.namespace, d.metadata
+                FROM data_item_segments s
+                JOIN data_items d ON d.id = s.parent_id
+                {where}
+            """, params)
+            
+            return DatabaseRowParser.parse_rows_with_metadata(
+                [dict(row) for row in cursor.fetchall()]
+            )
+    
+    def get_segments_by_ids(self, ids: List[str]) -> List[Dict]:
+        """Batch fetch conversation segments by id"""
+        if not ids:
+            return []
+        
+        placeholders = ','.join('?' * len(ids))
+        return self._query_segments(f"WHERE s.id IN ({placeholders})", tuple(ids))
+    
+    def get_pending_segment_embeddings(self, limit: int = 100) -> List[Dict]:
+        """Get conversation segments that need embedding"""
+        return self._query_segments(
+            "WHERE s.embedding_status = 'pending' ORDER BY s.created_at ASC, s.id ASC LIMIT ?", (limit,)
+        )
+    
+    def update_segment_embedding_status_batch(self, ids: List[str], status: str):
+        """Update embedding status for several segments in one transaction"""
+        if not ids:
+            return
+        
+        with self.get_connection() as conn:
+            conn.executemany("""
+                UPDATE data_item_segments
+                SET embedding_status = ?
+                WHERE id = ?
+            """, [(status, id) for id in ids])
+            conn.commit()
+    
+    def get_segments_page(self, after_id: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Get conversation segments in id order, starting after after_id (keyset pagination)"""
+        return self._query_segments("WHERE s.id > ? ORDER BY s.id ASC LIMIT ?", (after_id or '', limit))
+    
     def get_setting(self, key: str, default: Any = None) -> Any:
         """Get database-backed setting"""
         with self.get_connection() as conn:
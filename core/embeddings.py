@@ -2,9 +2,19 @@
 Real embedding service using sentence transformers for semantic search
 """
 
+import asyncio
+import hashlib
+import multiprocessing
+import re
+import sqlite3
+import threading
+import time
 import numpy as np
 import logging
-from typing import List, Dict, Any, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 import torch
 
@@ -12,6 +22,118 @@ from .base_service import BaseService
 
 logger = logging.getLogger(__name__)
 
+# Model (or its ONNX Runtime embedder) loaded once per encode worker process
+_worker_model = None
+
+
+def _load_worker_model(model_name: str, device: str, onnx_options: Optional[Dict[str, Any]] = None,
+                       torch_threads: int = 0):
+    """Process pool initializer loading the model into the worker, optionally pinning its torch threads"""
+    global _worker_model
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+    _worker_model = SentenceTransformer(model_name, device=device)
+    if onnx_options is not None:
+        from .onnx_embedder import OnnxEmbedder
+        # The artifact was exported by the parent, so this only opens a session
+        _worker_model = OnnxEmbedder(_worker_model, model_name, **onnx_options)
+
+
+def _encode_in_worker(texts, encode_kwargs: Dict[str, Any]) -> np.ndarray:
+    """Encode texts with the worker process's model"""
+    return _worker_model.encode(texts, **encode_kwargs)
+
+
+class EmbeddingCache:
+    """Disk-backed map from (content hash, model key) to an embedding vector
+
+    Re-synced items whose text did not change, and repeated snippets, hash to
+    the same key, so their vectors are read back instead of re-encoded.
+    """
+
+    LOOKUP_CHUNK = 500  # keys per SELECT, below SQLite's bound-parameter limit
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    content_hash TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (content_hash, model_name)
+                )
+            """)
+            conn.commit()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Stable hash of the text being embedded"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, content_hashes: List[str], model_name: str) -> Dict[str, np.ndarray]:
+        """Cached vectors for the hashes that are present, counting hits and misses"""
+        unique = list(dict.fromkeys(content_hashes))
+        found: Dict[str, np.ndarray] = {}
+        with self._connect() as conn:
+            for start in range(0, len(unique), self.LOOKUP_CHUNK):
+                chunk = unique[start:start + self.LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                cursor = conn.execute(f"""
+                    SELECT content_hash, vector FROM embedding_cache
+                    WHERE model_name = ? AND content_hash IN ({placeholders})
+                """, [model_name, *chunk])
+                for content_hash, vector in cursor.fetchall():
+                    found[content_hash] = np.frombuffer(vector, dtype=np.float32)
+
+        hits = sum(1 for content_hash in content_hashes if content_hash in found)
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += len(content_hashes) - hits
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray], model_name: str):
+        """Store vectors under their content hashes"""
+        if not vectors:
+            return
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO embedding_cache (content_hash, model_name, vector)
+                VALUES (?, ?, ?)
+            """, [(content_hash, model_name, np.asarray(vector, dtype=np.float32).tobytes())
+                  for content_hash, vector in vectors.items()])
+            conn.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache since startup"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Lookup counters and the number of cached vectors"""
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        return {
+            'path': self.path,
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate
+        }
+
 
 class EmbeddingService(BaseService):
     """Real embedding service using sentence transformers"""
@@ -39,7 +161,38 @@ class EmbeddingService(BaseService):
         self.device = config.device
         self.batch_size = config.batch_size
         self.model: Optional[SentenceTransformer] = None
+        self.backend = config.backend
+        self.onnx = None
+        self.backend_agreement: Optional[Dict[str, Any]] = None
         self.dimension = self._get_model_dimension()
+        self.cache: Optional[EmbeddingCache] = None
+        if config.cache_path:
+            self.cache = EmbeddingCache(config.cache_path)
+        
+        # Encoding runs on a dedicated executor, created on first use; the
+        # semaphore keeps further batches waiting on the event loop
+        self.encode_executor = config.encode_executor
+        self.encode_workers = config.encode_workers
+        self._executor: Optional[Executor] = None
+        self._encode_slots = asyncio.Semaphore(self.encode_workers)
+        
+        # Single-text requests waiting to be encoded as one micro-batch
+        self.micro_batch_wait = config.micro_batch_wait_ms / 1000.0
+        self.micro_batch_max_size = config.micro_batch_max_size
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self.micro_batches = 0
+        self.micro_batched_texts = 0
+        
+        # Length-bucketed batching of embed_texts, with throughput counters
+        self.token_budget = config.token_budget
+        self.encode_stats = {'texts': 0, 'tokens': 0, 'padded_tokens': 0,
+                             'arrival_padded_tokens': 0, 'seconds': 0.0}
+        
+        # Splitting of texts longer than the model's sequence length
+        self.chunking_enabled = config.chunking_enabled
+        self.chunk_max_tokens = config.chunk_max_tokens
+        self.chunk_overlap_tokens = config.chunk_overlap_tokens
         
         # Add service capabilities
         self.add_capability("text_embedding")
@@ -51,6 +204,13 @@ class EmbeddingService(BaseService):
         """Check if the model has been loaded"""
         return self.model is not None
         
+    @property
+    def cache_model_key(self) -> str:
+        """Model identity the embedding cache is keyed by, including the numeric path that produced the vectors"""
+        if self.onnx is None:
+            return self.model_name
+        return f"{self.model_name}:onnx-int8" if self.config.onnx_quantize else f"{self.model_name}:onnx"
+        
     def _get_model_dimension(self) -> int:
         """Get expected dimension for the model"""
         return self.MODEL_DIMENSIONS.get(self.model_name, 384)  # Default to 384
@@ -92,12 +252,34 @@ class EmbeddingService(BaseService):
                 self.dimension = actual_dimension
             
             self.logger.info(f"Embedding model loaded successfully. Final dimension: {self.dimension}")
+            
+            if self.backend == "onnx":
+                self._load_onnx_backend()
             return True
             
         except Exception as e:
             self.logger.error(f"Failed to load embedding model {self.model_name}: {e}")
             return False
     
+    def _load_onnx_backend(self):
+        """Switch encoding to ONNX Runtime, staying on PyTorch if it can't be set up"""
+        try:
+            from .onnx_embedder import OnnxEmbedder
+            self.onnx = OnnxEmbedder(self.model, self.model_name, self.config.onnx_cache_dir,
+                                     self.config.onnx_quantize)
+            self.backend_agreement = self.onnx.agreement_with(self.model)
+        except Exception as e:
+            self.logger.error(f"ONNX backend unavailable, encoding with PyTorch: {e}")
+            self.onnx = None
+            return
+        
+        agreement = self.backend_agreement
+        self.logger.info(f"ONNX backend cosine agreement with PyTorch: mean {agreement['mean']:.5f}, "
+                         f"min {agreement['min']:.5f} over {agreement['samples']} samples")
+        if agreement['min'] < 0.99:
+            self.logger.warning(f"ONNX vectors diverge from the indexed PyTorch vectors "
+                                f"(min cosine {agreement['min']:.4f})")
+    
     async def embed_text(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text
@@ -116,8 +298,11 @@ class EmbeddingService(BaseService):
             return np.zeros(self.dimension, dtype=np.float32)
             
         try:
-            # Generate embedding
-            embedding = self.model.encode(
+            # Generate embedding, sharing a forward pass with concurrent callers
+            if self.micro_batch_wait > 0 and self.micro_batch_max_size > 1:
+                return await self._submit_to_micro_batch(text)
+            
+            embedding = await self._run_encode(
                 text,
                 convert_to_numpy=True,
                 normalize_embeddings=True,
@@ -130,6 +315,51 @@ class EmbeddingService(BaseService):
             logger.error(f"Error generating embedding for text: {e}")
             return np.zeros(self.dimension, dtype=np.float32)
     
+    def _submit_to_micro_batch(self, text: str) -> asyncio.Future:
+        """Queue a text for the next micro-batch, returning the future of its vector"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        
+        if len(self._pending) >= self.micro_batch_max_size:
+            self._flush_micro_batch()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.micro_batch_wait, self._flush_micro_batch)
+        return future
+    
+    def _flush_micro_batch(self):
+        """Start encoding every queued text as one batch"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._encode_micro_batch(batch))
+    
+    async def _encode_micro_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Encode a micro-batch in one call and resolve each caller's future"""
+        # Identical concurrent queries share one row
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            embeddings = await self._run_encode(
+                texts,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                batch_size=len(texts)
+            )
+            rows = dict(zip(texts, np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.micro_batches += 1
+        self.micro_batched_texts += len(batch)
+        for text, future in batch:
+            if not future.done():
+                future.set_result(rows[text])
+    
     async def embed_texts(self, texts: List[str]) -> List[np.ndarray]:
         """
         Generate embeddings for multiple texts
@@ -160,14 +390,11 @@ class EmbeddingService(BaseService):
                 logger.warning("No valid texts provided for embedding")
                 return [np.zeros(self.dimension, dtype=np.float32) for _ in texts]
             
-            # Generate embeddings in batches
-            embeddings = self.model.encode(
-                valid_texts,
-                convert_to_numpy=True,
-                normalize_embeddings=True,
-                batch_size=self.batch_size,
-                show_progress_bar=len(valid_texts) > 50
-            )
+            # Generate embeddings in batches, encoding only texts the cache misses
+            if self.cache is not None:
+                embeddings = await self._encode_with_cache(valid_texts)
+            else:
+                embeddings = await self._encode(valid_texts)
             
             # Create result array with zeros for invalid texts
             result = []
@@ -186,6 +413,199 @@ class EmbeddingService(BaseService):
             logger.error(f"Error generating embeddings for texts: {e}")
             return [np.zeros(self.dimension, dtype=np.float32) for _ in texts]
     
+    def _get_executor(self) -> Executor:
+        """Thread or process pool that model.encode runs on"""
+        if self._executor is None:
+            if self.encode_executor == "process":
+                # Spawned workers each load their own copy of the model
+                onnx_options = None
+                if self.onnx is not None:
+                    onnx_options = {'cache_dir': self.config.onnx_cache_dir, 'quantize': self.config.onnx_quantize}
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.encode_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_load_worker_model,
+                    initargs=(self.model_name, self.device, onnx_options)
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.encode_workers, thread_name_prefix="embedding-encode"
+                )
+        return self._executor
+    
+    async def _run_encode(self, texts, **encode_kwargs) -> np.ndarray:
+        """Run model.encode on the encode executor so the event loop stays responsive"""
+        async with self._encode_slots:
+            loop = asyncio.get_running_loop()
+            if self.encode_executor == "process":
+                return await loop.run_in_executor(self._get_executor(), _encode_in_worker, texts, encode_kwargs)
+            encoder = self.onnx if self.onnx is not None else self.model
+            return await loop.run_in_executor(self._get_executor(), partial(encoder.encode, texts, **encode_kwargs))
+    
+    def _max_seq_length(self) -> int:
+        """Tokens the model reads before truncating, special tokens included"""
+        limit = getattr(self.model, 'max_seq_length', None)
+        return limit if isinstance(limit, int) else 512
+    
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Token count of each text after truncation to the model's sequence length"""
+        limit = self._max_seq_length()
+        try:
+            input_ids = self.model.tokenizer(
+                texts, add_special_tokens=True, truncation=True, max_length=limit
+            )['input_ids']
+            return [len(ids) for ids in input_ids]
+        except Exception:
+            # No usable tokenizer; roughly four tokens per three words
+            return [min(limit, len(text.split()) * 4 // 3 + 2) for text in texts]
+    
+    async def chunk_texts(self, texts: List[str]) -> List[List[str]]:
+        """
+        Split texts the model would truncate into overlapping token windows
+        
+        Texts that fit the sequence length come back as their only chunk, so
+        their vectors (and cache keys) are unchanged.
+        
+        Args:
+            texts: List of input texts
+            
+        Returns:
+            List with the chunks of each text, in order
+        """
+        if not self.is_initialized:
+            await self.initialize()
+        
+        if not self.chunking_enabled or not texts:
+            return [[text] for text in texts]
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._chunk_texts, texts)
+    
+    def _chunk_texts(self, texts: List[str]) -> List[List[str]]:
+        """Cut each text at token boundaries into windows of the chunk size"""
+        # Leave room for the [CLS] and [SEP] tokens the model adds
+        window = max(1, (self.chunk_max_tokens or self._max_seq_length()) - 2)
+        try:
+            offsets = self.model.tokenizer(
+                texts, add_special_tokens=False, return_offsets_mapping=True
+            )['offset_mapping']
+            spans = [[tuple(span) for span in text_offsets] for text_offsets in offsets]
+            overlap = self.chunk_overlap_tokens
+        except Exception:
+            # No usable tokenizer; words stand in for tokens, roughly three words per four tokens
+            spans = [[match.span() for match in re.finditer(r'\S+', text)] for text in texts]
+            window = max(1, window * 3 // 4)
+            overlap = self.chunk_overlap_tokens * 3 // 4
+        step = max(1, window - overlap)
+        
+        chunked = []
+        for text, text_spans in zip(texts, spans):
+            if len(text_spans) <= window:
+                chunked.append([text])
+                continue
+            chunks = []
+            for start in range(0, len(text_spans), step):
+                piece = text_spans[start:start + window]
+                chunks.append(text[piece[0][0]:piece[-1][1]])
+                if start + window >= len(text_spans):
+                    break
+            chunked.append(chunks)
+        return chunked
+    
+    def _plan_batches(self, lengths: List[int]) -> List[List[int]]:
+        """Group text indices by length so each batch's padded size fits the token budget"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+            # Sorted ascending, so the text being added is the batch's longest
+            if current and (len(current) + 1) * lengths[index] > self.token_budget:
+                batches.append(current)
+                current = []
+            current.append(index)
+        if current:
+            batches.append(current)
+        return batches
+    
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts with the model into normalized vectors"""
+        if self.token_budget <= 0 or len(texts) <= 1:
+            return await self._run_encode(
+                texts,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                batch_size=self.batch_size,
+                show_progress_bar=len(texts) > 50
+            )
+        
+        loop = asyncio.get_running_loop()
+        lengths = await loop.run_in_executor(None, self._token_lengths, texts)
+        batches = self._plan_batches(lengths)
+        
+        started = time.perf_counter()
+        rows: List[Optional[np.ndarray]] = [None] * len(texts)
+        for batch in batches:
+            encoded = await self._run_encode(
+                [texts[i] for i in batch],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                batch_size=len(batch),
+                show_progress_bar=False
+            )
+            for i, row in zip(batch, np.asarray(encoded, dtype=np.float32).reshape(len(batch), -1)):
+                rows[i] = row
+        self._record_throughput(lengths, batches, time.perf_counter() - started)
+        return np.vstack(rows)
+    
+    def _record_throughput(self, lengths: List[int], batches: List[List[int]], seconds: float):
+        """Accumulate throughput and padding counters for a bucketed encode"""
+        # Padded tokens of the bucketed batches, and of batch_size batches in arrival order
+        padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+        arrival = sum(len(chunk) * max(chunk)
+                      for chunk in (lengths[start:start + self.batch_size]
+                                    for start in range(0, len(lengths), self.batch_size)))
+        stats = self.encode_stats
+        stats['texts'] += len(lengths)
+        stats['tokens'] += sum(lengths)
+        stats['padded_tokens'] += padded
+        stats['arrival_padded_tokens'] += arrival
+        stats['seconds'] += seconds
+        logger.debug(f"Encoded {len(lengths)} texts in {len(batches)} length buckets at "
+                     f"{len(lengths) / seconds if seconds else 0.0:.1f} texts/s; padded tokens "
+                     f"{padded} vs {arrival} in arrival order")
+    
+    def get_throughput_stats(self) -> Dict[str, Any]:
+        """Encoding throughput and padding overhead since startup"""
+        stats = self.encode_stats
+        seconds = stats['seconds']
+        return {
+            'texts': stats['texts'],
+            'texts_per_second': stats['texts'] / seconds if seconds else 0.0,
+            'tokens_per_second': stats['tokens'] / seconds if seconds else 0.0,
+            # Fraction of the encoded sequence positions that hold real tokens
+            'padding_efficiency': stats['tokens'] / stats['padded_tokens'] if stats['padded_tokens'] else 1.0,
+            'arrival_order_padding_efficiency': (stats['tokens'] / stats['arrival_padded_tokens']
+                                                 if stats['arrival_padded_tokens'] else 1.0)
+        }
+    
+    async def _encode_with_cache(self, texts: List[str]) -> List[np.ndarray]:
+        """Encode texts, reading vectors of previously embedded content from the cache"""
+        hashes = [EmbeddingCache.content_hash(text) for text in texts]
+        # SQLite reads and writes run off the event loop, like tokenization
+        loop = asyncio.get_running_loop()
+        vectors = await loop.run_in_executor(None, self.cache.get_many, hashes, self.cache_model_key)
+        
+        # Identical texts within the batch are encoded once
+        missing = {content_hash: text for content_hash, text in zip(hashes, texts) if content_hash not in vectors}
+        if missing:
+            encoded = await self._encode(list(missing.values()))
+            new_vectors = dict(zip(missing, np.asarray(encoded, dtype=np.float32).reshape(len(missing), -1)))
+            await loop.run_in_executor(None, self.cache.put_many, new_vectors, self.cache_model_key)
+            vectors.update(new_vectors)
+        
+        logger.debug(f"Embedding cache: {len(texts) - len(missing)} of {len(texts)} texts reused, "
+                     f"hit rate {self.cache.hit_rate:.1%}")
+        return [vectors[content_hash] for content_hash in hashes]
+    
     async def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for multiple texts efficiently, returning lists
@@ -202,7 +622,7 @@ class EmbeddingService(BaseService):
         logger.debug(f"Generating embeddings for {len(texts)} texts")
         
         try:
-            embeddings = self.model.encode(
+            embeddings = await self._run_encode(
                 texts,
                 batch_size=self.batch_size,
                 show_progress_bar=False,
@@ -252,7 +672,30 @@ class EmbeddingService(BaseService):
             "dimension": self.dimension,
             "device": self.device,
             "batch_size": self.batch_size,
-            "status": "active" if self.model is not None else "not_loaded"
+            "encode_executor": self.encode_executor,
+            "encode_workers": self.encode_workers,
+            "micro_batching": {
+                "wait_ms": self.micro_batch_wait * 1000.0,
+                "max_size": self.micro_batch_max_size,
+                "batches": self.micro_batches,
+                "average_size": self.micro_batched_texts / self.micro_batches if self.micro_batches else 0.0
+            },
+            "status": "active" if self.model is not None else "not_loaded",
+            "cache": self.cache.get_stats() if self.cache is not None else None,
+            "token_budget": self.token_budget,
+            "chunking": {
+                "enabled": self.chunking_enabled,
+                "max_tokens": self.chunk_max_tokens or (self._max_seq_length() if self.model is not None else None),
+                "overlap_tokens": self.chunk_overlap_tokens
+            },
+            "backend": {
+                "name": "onnx" if self.onnx is not None else "torch",
+                "requested": self.backend,
+                "quantized": self.onnx.quantize if self.onnx is not None else False,
+                "artifact_path": self.onnx.artifact_path if self.onnx is not None else None,
+                "cosine_agreement": self.backend_agreement
+            },
+            "throughput": self.get_throughput_stats()
         }
         
         if self.model is not None:
@@ -311,7 +754,11 @@ class EmbeddingService(BaseService):
                     torch.cuda.empty_cache()
                 
                 self.model = None
+                self.onnx = None
                 self.logger.info("Embedding model resources cleaned up")
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
             return True
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
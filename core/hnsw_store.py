@@ -0,0 +1,788 @@
+"""
+HNSW graph vector store
+
+A pure NumPy/Python Hierarchical Navigable Small World index exposing the
+same interface as VectorStoreService. Each vector is a node on a random
+number of layers; a search descends greedily through the sparse upper layers
+and then runs a best-first search of width ``ef_search`` on layer 0, so only
+a small fraction of the vectors is scored.
+
+Removed vectors are tombstoned: they keep their links so the graph stays
+navigable but are never returned. Re-adding an ID tombstones the old node
+and inserts a new one. The graph is rebuilt from the live nodes on
+checkpoint once tombstones outnumber them.
+
+Searches never take a lock: they walk the last published ``_Graph``. Links
+are stored in blocks of ``LINK_BLOCK_NODES`` nodes; a writer copies a block
+the first time it changes a link in it after a publish, so a published graph
+never changes under a search and publishing costs one list copy.
+
+Date-range and metadata predicates use the same per-node columns as
+VectorStoreService, applied to the layer-0 candidates.
+
+Persistence mirrors VectorStoreService: mutations are appended to a
+write-ahead log and the graph (vectors, levels and links) is written to
+``<index_path>.hnsw`` on checkpoint, so a restart loads it without rebuilding.
+"""
+
+import heapq
+import logging
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .vector_id_table import read_id_table, write_id_table
+from .vector_store import VectorStoreService, _LiveRows
+from .vector_wal import VectorWriteAheadLog
+
+logger = logging.getLogger(__name__)
+
+
+class _LinkBlock:
+    """Links of LINK_BLOCK_NODES consecutive nodes on every layer"""
+
+    __slots__ = ('level0', 'count', 'upper')
+
+    def __init__(self, level0: np.ndarray, count: np.ndarray, upper: Dict[int, List[List[int]]]):
+        self.level0 = level0  # (nodes, M0) layer 0 links, -1 padded
+        self.count = count  # layer 0 links per node
+        self.upper = upper  # node -> links on layers 1..level
+
+    @classmethod
+    def empty(cls, nodes: int, m0: int) -> '_LinkBlock':
+        return cls(np.full((nodes, m0), -1, dtype=np.int32), np.zeros(nodes, dtype=np.int32), {})
+
+    def copy(self) -> '_LinkBlock':
+        """Copy for a writer; per-node upper layer lists are replaced, never mutated, so they are shared"""
+        return _LinkBlock(self.level0.copy(), self.count.copy(), dict(self.upper))
+
+
+class _Graph(NamedTuple):
+    """Immutable view of the graph that searches walk"""
+    size: int  # number of live nodes
+    next_index: int
+    vectors: Optional[np.ndarray]
+    ids: np.ndarray
+    live: _LiveRows
+    blocks: Sequence[_LinkBlock]
+    row_days: np.ndarray
+    row_flags: np.ndarray
+    entry_point: int
+    max_level: int
+
+
+class HNSWVectorStore:
+    """Vector store backed by an HNSW proximity graph"""
+
+    INITIAL_CAPACITY = 1024
+    LINK_BLOCK_SHIFT = 10
+    LINK_BLOCK_NODES = 1 << LINK_BLOCK_SHIFT  # nodes per copy-on-write link block
+
+    def __init__(self, config):
+        self.config = config
+        self.M = config.hnsw_m
+        self.M0 = 2 * config.hnsw_m  # layer 0 is denser, as in the original paper
+        self.ef_construction = config.hnsw_ef_construction
+        self.ef_search = config.hnsw_ef_search
+        self._level_mult = 1 / np.log(self.M)
+        self._rng = np.random.default_rng(0)
+
+        self.id_to_index: Dict[str, int] = {}  # id -> live node
+        self.dimension = None
+        self.model_name: Optional[str] = None  # embedding model the vectors came from
+        self.next_index = 0  # number of nodes, including tombstones
+
+        self._vectors: Optional[np.ndarray] = None  # (capacity, dimension) unit rows
+        self._ids: np.ndarray = np.empty(0, dtype=object)  # node -> id (kept once tombstoned)
+        # node -> epoch of the first published graph without the node, as in VectorStoreService
+        self._freed_at: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._epoch = 0
+        self._levels: np.ndarray = np.zeros(0, dtype=np.int8)  # node -> top layer
+        self._blocks: List[_LinkBlock] = []
+        self._owned_blocks: set = set()  # blocks copied (or created) since the last publish
+        self._row_days: np.ndarray = np.zeros(0, dtype=np.int32)  # days_date ordinal per node
+        self._row_flags: np.ndarray = np.zeros(0, dtype=np.int32)  # VectorStoreService.FLAG_ATTRIBUTES bits
+        self._entry_point = -1
+        self._max_level = -1
+
+        self._wal: Optional[VectorWriteAheadLog] = None
+        if config.wal_enabled:
+            self._wal = VectorWriteAheadLog(self.wal_path, fsync=config.wal_fsync)
+        self.checkpoint_interval = config.checkpoint_interval
+
+        # Writers serialize on this lock; searches read the published graph
+        self._write_lock = threading.RLock()
+        self._snapshot: Optional[_Graph] = None
+
+        self._load_index()
+        self._publish()
+
+    @property
+    def graph_path(self) -> str:
+        """Path of the persisted graph"""
+        return self.config.index_path + '.hnsw'
+
+    @property
+    def id_table_path(self) -> str:
+        """Path of the node -> id table written next to the graph"""
+        return self.graph_path + '.ids'
+
+    @property
+    def wal_path(self) -> str:
+        """Path of the append-only mutation log"""
+        return self.graph_path + '.wal'
+
+    def _ensure_capacity(self, nodes_needed: int):
+        """Grow the node arrays so that at least nodes_needed nodes fit"""
+        grown = VectorStoreService._grown
+        if self._vectors is None:
+            self._vectors = np.zeros((0, self.dimension), dtype=np.float32)
+        self._vectors = grown(self._vectors, self.next_index, nodes_needed, 0.0)
+        self._ids = grown(self._ids, self.next_index, nodes_needed, None)
+        self._freed_at = grown(self._freed_at, self.next_index, nodes_needed, 0)
+        self._levels = grown(self._levels, self.next_index, nodes_needed, 0)
+        self._row_days = grown(self._row_days, self.next_index, nodes_needed, VectorStoreService.NO_DATE)
+        self._row_flags = grown(self._row_flags, self.next_index, nodes_needed, 0)
+        while len(self._blocks) << self.LINK_BLOCK_SHIFT < nodes_needed:
+            self._owned_blocks.add(len(self._blocks))
+            self._blocks.append(_LinkBlock.empty(self.LINK_BLOCK_NODES, self.M0))
+
+    @property
+    def _live(self) -> _LiveRows:
+        """Node -> live mask of the writer's own state"""
+        return _LiveRows(self._freed_at, self._epoch)
+
+    def _current_state(self) -> _Graph:
+        """The writer's own state as a graph, for walks made while holding the write lock"""
+        return _Graph(
+            size=len(self.id_to_index),
+            next_index=self.next_index,
+            vectors=self._vectors,
+            ids=self._ids,
+            live=self._live,
+            blocks=self._blocks,
+            row_days=self._row_days,
+            row_flags=self._row_flags,
+            entry_point=self._entry_point,
+            max_level=self._max_level
+        )
+
+    def _publish(self):
+        """Swap in the current graph for searches; later link changes copy their block first"""
+        self._snapshot = self._current_state()._replace(blocks=tuple(self._blocks))
+        self._owned_blocks = set()
+        self._epoch += 1
+
+    def _links(self, graph: _Graph, node: int, layer: int) -> List[int]:
+        """Neighbours of a node on a layer"""
+        block = graph.blocks[node >> self.LINK_BLOCK_SHIFT]
+        if layer == 0:
+            slot = node & (self.LINK_BLOCK_NODES - 1)
+            return block.level0[slot, :block.count[slot]].tolist()
+        return block.upper[node][layer - 1]
+
+    def _writable_block(self, node: int) -> _LinkBlock:
+        """The writer's block holding a node's links, copied if a published graph still uses it"""
+        index = node >> self.LINK_BLOCK_SHIFT
+        if index not in self._owned_blocks:
+            self._blocks[index] = self._blocks[index].copy()
+            self._owned_blocks.add(index)
+        return self._blocks[index]
+
+    def _set_links(self, node: int, layer: int, links: List[int]):
+        """Replace the neighbours of a node on a layer"""
+        block = self._writable_block(node)
+        if layer == 0:
+            slot = node & (self.LINK_BLOCK_NODES - 1)
+            block.level0[slot, :len(links)] = links
+            block.level0[slot, len(links):] = -1
+            block.count[slot] = len(links)
+        else:
+            layers = list(block.upper[node])
+            layers[layer - 1] = list(links)
+            block.upper[node] = layers
+
+    def _greedy_closest(self, graph: _Graph, query: np.ndarray, node: int, similarity: float,
+                        layer: int) -> Tuple[int, float]:
+        """Walk a layer towards the query until no neighbour is closer"""
+        while True:
+            links = self._links(graph, node, layer)
+            if not links:
+                return node, similarity
+            similarities = graph.vectors[links] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] <= similarity:
+                return node, similarity
+            node, similarity = links[best], float(similarities[best])
+
+    def _search_layer(self, graph: _Graph, query: np.ndarray, entry_points: List[Tuple[float, int]],
+                      ef: int, layer: int) -> List[Tuple[float, int]]:
+        """Best-first search of one layer, returning up to ef (similarity, node) pairs, best first"""
+        visited = {node for _, node in entry_points}
+        candidates = [(-similarity, node) for similarity, node in entry_points]
+        heapq.heapify(candidates)
+        results = list(entry_points)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            negative_similarity, node = heapq.heappop(candidates)
+            if len(results) >= ef and -negative_similarity < results[0][0]:
+                break
+
+            neighbours = [n for n in self._links(graph, node, layer) if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+
+            for similarity, neighbour in zip((graph.vectors[neighbours] @ query).tolist(), neighbours):
+                if len(results) < ef or similarity > results[0][0]:
+                    heapq.heappush(candidates, (-similarity, neighbour))
+                    heapq.heappush(results, (similarity, neighbour))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted(results, reverse=True)
+
+    def _select_neighbours(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """Pick up to m diverse neighbours from candidates sorted best first
+
+        A candidate is skipped when it is closer to an already selected
+        neighbour than to the base node, which keeps links spread across
+        clusters; skipped candidates top the list up if fewer than m remain.
+        """
+        selected: List[int] = []
+        skipped: List[int] = []
+        for similarity, node in candidates:
+            if len(selected) >= m:
+                break
+            if selected and (self._vectors[selected] @ self._vectors[node]).max() > similarity:
+                skipped.append(node)
+            else:
+                selected.append(node)
+        return selected + skipped[:m - len(selected)]
+
+    def _connect(self, graph: _Graph, node: int, new_neighbour: int, layer: int):
+        """Add a back-link, pruning the node's links if it exceeds the layer's limit"""
+        links = self._links(graph, node, layer)
+        if new_neighbour in links:
+            return
+
+        max_links = self.M0 if layer == 0 else self.M
+        links = links + [new_neighbour]
+        if len(links) > max_links:
+            similarities = self._vectors[links] @ self._vectors[node]
+            order = np.argsort(-similarities)
+            links = self._select_neighbours([(float(similarities[i]), links[i]) for i in order], max_links)
+        self._set_links(node, layer, links)
+
+    def _random_level(self) -> int:
+        """Draw a node's top layer from the usual exponential distribution"""
+        return int(-np.log(1.0 - self._rng.random()) * self._level_mult)
+
+    def _insert(self, node: int):
+        """Link a node whose vector is already stored into the graph"""
+        query = self._vectors[node]
+        level = self._random_level()
+        self._levels[node] = level
+        if level > 0:
+            self._writable_block(node).upper[node] = [[] for _ in range(level)]
+
+        if self._entry_point < 0:
+            self._entry_point, self._max_level = node, level
+            return
+
+        # Blocks are swapped for copies as links change, so the walk reads the live list
+        graph = self._current_state()
+        entry = self._entry_point
+        similarity = float(self._vectors[entry] @ query)
+        for layer in range(self._max_level, level, -1):
+            entry, similarity = self._greedy_closest(graph, query, entry, similarity, layer)
+
+        candidates = [(similarity, entry)]
+        for layer in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(graph, query, candidates, self.ef_construction, layer)
+            neighbours = self._select_neighbours(candidates, self.M)
+            self._set_links(node, layer, neighbours)
+            for neighbour in neighbours:
+                self._connect(graph, neighbour, node, layer)
+
+        if level > self._max_level:
+            self._entry_point, self._max_level = node, level
+
+    def _validate_dimension(self, dimension: int) -> bool:
+        """Check a vector dimension against the store, fixing it on first use"""
+        if self.dimension is None:
+            self.dimension = dimension
+        elif dimension != self.dimension:
+            logger.error(f"Vector dimension {dimension} doesn't match expected {self.dimension}")
+            return False
+        return True
+
+    def _apply_adds(self, vector_ids: List[str], vectors: np.ndarray):
+        """Insert a batch of vectors, tombstoning any previous node for the same id"""
+        self._ensure_capacity(self.next_index + len(vector_ids))
+        for vector_id, vector in zip(vector_ids, vectors):
+            node = self.next_index
+            previous = self.id_to_index.get(vector_id)
+            if previous is not None:
+                # The old node is tombstoned; its filter attributes carry over
+                self._row_days[node] = self._row_days[previous]
+                self._row_flags[node] = self._row_flags[previous]
+                self._apply_removes([vector_id])
+            self._vectors[node] = vector
+            self._ids[node] = vector_id
+            self._freed_at[node] = VectorStoreService.LIVE
+            self.id_to_index[vector_id] = node
+            self.next_index += 1
+            self._insert(node)
+
+    def _apply_removes(self, vector_ids: List[str]) -> int:
+        """Tombstone the nodes of a batch of ids; the published graph keeps them until the next publish"""
+        removed = 0
+        for vector_id in vector_ids:
+            node = self.id_to_index.pop(vector_id, None)
+            if node is not None:
+                self._freed_at[node] = self._epoch
+                removed += 1
+        return removed
+
+    def _apply_attributes(self, vector_ids: List[str], attributes: np.ndarray):
+        """Set the date and flag columns of stored vectors"""
+        published = self._snapshot
+        for vector_id, (days, flags) in zip(vector_ids, attributes.tolist()):
+            node = self.id_to_index.get(vector_id)
+            if node is None:
+                continue
+            if published is not None and node < published.next_index and self._row_days is published.row_days:
+                # Searches read these columns; give the writer its own copy
+                self._row_days = self._row_days.copy()
+                self._row_flags = self._row_flags.copy()
+            self._row_days[node] = days
+            self._row_flags[node] = flags
+
+    def add_vector(self, vector_id: str, vector: np.ndarray,
+                   attributes: Optional[Dict[str, Any]] = None) -> bool:
+        """Add a vector to the store"""
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        return self.add_vectors([vector_id], vector, None if attributes is None else [attributes])
+
+    def add_vectors(self, vector_ids: List[str], vectors: np.ndarray,
+                    attributes: Optional[List[Optional[Dict[str, Any]]]] = None) -> bool:
+        """Add a batch of vectors to the store with a single persistence write
+
+        Args:
+            vector_ids: IDs for each row of vectors
+            vectors: (len(vector_ids), dimension) matrix of vectors
+            attributes: Optional per-vector 'days_date' and boolean flag attributes
+
+        Returns:
+            True if the whole batch was stored, False if it was rejected
+        """
+        try:
+            vector_ids = list(vector_ids)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if not vector_ids:
+                return True
+
+            if vectors.ndim != 2 or vectors.shape[0] != len(vector_ids):
+                logger.error(f"Expected a ({len(vector_ids)}, dimension) matrix, got shape {vectors.shape}")
+                return False
+
+            if not self._validate_dimension(vectors.shape[1]):
+                return False
+
+            if attributes is not None and len(attributes) != len(vector_ids):
+                logger.error(f"Expected {len(vector_ids)} attribute entries, got {len(attributes)}")
+                return False
+            encoded = None if attributes is None else VectorStoreService._encode_attributes(attributes)
+
+            vectors = VectorStoreService._normalize_rows(vectors)
+            with self._write_lock:
+                if self._wal is not None:
+                    self._wal.append_adds(vector_ids, vectors, encoded)
+                self._apply_adds(vector_ids, vectors)
+                if encoded is not None:
+                    self._apply_attributes(vector_ids, encoded)
+                self._after_mutation()
+            return True
+
+        except Exception as e:
+            logger.error(f"Error adding {len(vector_ids)} vectors: {e}")
+            return False
+
+    def remove_vector(self, vector_id: str) -> bool:
+        """Remove a vector from the store"""
+        return self.remove_vectors([vector_id]) == 1
+
+    def remove_vectors(self, vector_ids: List[str]) -> int:
+        """Remove a batch of vectors with a single persistence write
+
+        Returns:
+            Number of vectors that were present and removed
+        """
+        try:
+            with self._write_lock:
+                present = [vector_id for vector_id in dict.fromkeys(vector_ids) if vector_id in self.id_to_index]
+                if not present:
+                    return 0
+
+                if self._wal is not None:
+                    self._wal.append_removes(present)
+                removed = self._apply_removes(present)
+                self._after_mutation()
+                return removed
+
+        except Exception as e:
+            logger.error(f"Error removing vectors: {e}")
+            return 0
+
+    def search(self, query_vector: np.ndarray, k: int = 10,
+               namespace_filter: Optional[List[str]] = None,
+               ef_search: Optional[int] = None,
+               date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+               metadata_filter: Optional[Dict[str, bool]] = None) -> List[Tuple[str, float]]:
+        """Search for similar vectors
+
+        The layer-0 search keeps ef_search candidates (defaults to the
+        configured hnsw_ef_search, and never fewer than k). When tombstones or
+        the filters leave fewer than k hits, the search is widened once and
+        then falls back to an exact scan of the allowed nodes, which is also
+        used straight away when a date or metadata filter leaves few nodes.
+        Searches read the last published graph and never wait for writers.
+        """
+        try:
+            graph = self._snapshot
+            if graph is None or not graph.size or k <= 0:
+                return []
+
+            query_vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+            query_norm = np.linalg.norm(query_vector)
+            if query_norm == 0:
+                logger.warning("Zero query vector provided for search")
+                return []
+            query_vector = query_vector / query_norm
+
+            entry = graph.entry_point
+            similarity = float(graph.vectors[entry] @ query_vector)
+            for layer in range(graph.max_level, 0, -1):
+                entry, similarity = self._greedy_closest(graph, query_vector, entry, similarity, layer)
+
+            namespaces = set(namespace_filter) if namespace_filter else None
+            n = graph.next_index
+            allowed = graph.live[:n]
+            if date_range or metadata_filter:
+                allowed = allowed & VectorStoreService._attribute_mask(
+                    graph.row_days[:n], graph.row_flags[:n], date_range, metadata_filter
+                )
+                if not allowed.any():
+                    return []
+
+            ef = max(ef_search or self.ef_search, k)
+            if (date_range or metadata_filter) and np.count_nonzero(allowed) <= ef * self.M0:
+                # Scanning the matching nodes scores no more vectors than a walk of width ef
+                return self._exact_search(graph, query_vector, k, allowed, namespaces)
+
+            for _ in range(2):
+                results = self._search_layer(graph, query_vector, [(similarity, entry)], ef, 0)
+                hits = [(s, node) for s, node in results
+                        if allowed[node] and (namespaces is None or self._namespace(graph, node) in namespaces)]
+                if len(hits) >= k or ef >= n:
+                    return [(graph.ids[node], s) for s, node in hits[:k]]
+                ef = min(ef * 2, n)
+
+            # The filters reject most of the graph: score the allowed nodes directly
+            return self._exact_search(graph, query_vector, k, allowed, namespaces)
+
+        except Exception as e:
+            logger.error(f"Error searching vectors: {e}")
+            return []
+
+    def _exact_search(self, graph: _Graph, query_vector: np.ndarray, k: int, allowed: np.ndarray,
+                      namespaces: Optional[set]) -> List[Tuple[str, float]]:
+        """Top k of a masked flat scan over the allowed nodes"""
+        nodes = np.flatnonzero(allowed)
+        if namespaces is not None:
+            nodes = nodes[np.array([self._namespace(graph, node) in namespaces for node in nodes.tolist()],
+                                   dtype=bool)]
+        if not nodes.size:
+            return []
+
+        scores = graph.vectors[nodes] @ query_vector
+        if nodes.size > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            nodes, scores = nodes[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return [(graph.ids[node], float(scores[i])) for i, node in zip(order.tolist(), nodes[order].tolist())]
+
+    def search_batch(self, query_matrix: np.ndarray, k: int = 10,
+                     namespace_filter: Optional[List[str]] = None,
+                     ef_search: Optional[int] = None,
+                     date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                     metadata_filter: Optional[Dict[str, bool]] = None) -> List[List[Tuple[str, float]]]:
+        """Search for each row of a query matrix; graph walks are per query"""
+        queries = np.asarray(query_matrix, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        return [
+            self.search(query_vector, k, namespace_filter, ef_search, date_range, metadata_filter)
+            for query_vector in queries
+        ]
+
+    def search_range(self, query_vector: np.ndarray, threshold: float, max_results: int,
+                     namespace_filter: Optional[List[str]] = None,
+                     ef_search: Optional[int] = None,
+                     date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                     metadata_filter: Optional[Dict[str, bool]] = None) -> List[Tuple[str, float]]:
+        """Every vector scoring at least threshold among the max_results nearest, best first"""
+        results = self.search(query_vector, max_results, namespace_filter, ef_search, date_range, metadata_filter)
+        return [(vector_id, score) for vector_id, score in results if score >= threshold]
+
+    def _namespace(self, graph: _Graph, node: int) -> str:
+        """Namespace prefix of a node's id"""
+        vector_id = graph.ids[node]
+        return vector_id.split(':', 1)[0] if ':' in vector_id else vector_id
+
+    def _write_graph(self, f):
+        """Write vectors, levels and links to an open file in .npz format"""
+        n = self.next_index
+        upper = {node: layers for block in self._blocks for node, layers in block.upper.items()}
+        upper_nodes = sorted(upper)
+        upper_links = np.full((int(self._levels[upper_nodes].sum()) if upper_nodes else 0, self.M), -1, dtype=np.int32)
+        row = 0
+        for node in upper_nodes:
+            for links in upper[node]:
+                upper_links[row, :len(links)] = links
+                row += 1
+
+        np.savez(
+            f,
+            vectors=self._vectors[:n],
+            levels=self._levels[:n],
+            level0=np.concatenate([block.level0 for block in self._blocks])[:n],
+            level0_count=np.concatenate([block.count for block in self._blocks])[:n],
+            days=self._row_days[:n],
+            flags=self._row_flags[:n],
+            upper_nodes=np.array(upper_nodes, dtype=np.int64),
+            upper_links=upper_links
+        )
+
+    def _save_index(self):
+        """Write a full snapshot of the graph to disk"""
+        if self.next_index:
+            VectorStoreService._atomic_write(self.graph_path, self._write_graph)
+
+        metadata = {
+            'next_index': self.next_index,
+            'dimension': self.dimension,
+            'model_name': self.model_name,
+            'entry_point': self._entry_point,
+            'max_level': self._max_level,
+            'M': self.M
+        }
+        row_ids = np.where(self._live[:self.next_index], self._ids[:self.next_index], None).tolist()
+        VectorStoreService._atomic_write(self.id_table_path, lambda f: write_id_table(f, row_ids, metadata))
+
+    def _load_index(self):
+        """Load the last checkpointed graph and replay logged mutations"""
+        try:
+            if os.path.exists(self.id_table_path):
+                metadata, row_ids = read_id_table(self.id_table_path)
+                if metadata.get('next_index') and os.path.exists(self.graph_path):
+                    self._load_graph(metadata, row_ids)
+        except Exception as e:
+            logger.warning(f"Could not load HNSW graph: {e}")
+
+        if self._wal is None:
+            return
+        try:
+            replayed = 0
+            for op, vector_id, vector in self._wal.replay():
+                if op == VectorWriteAheadLog.OP_ADD:
+                    if self._validate_dimension(vector.shape[0]):
+                        self._apply_adds([vector_id], vector.reshape(1, -1))
+                elif op == VectorWriteAheadLog.OP_ATTRIBUTES:
+                    self._apply_attributes([vector_id], vector.reshape(1, -1))
+                else:
+                    self._apply_removes([vector_id])
+                replayed += 1
+            if replayed:
+                logger.info(f"Replayed {replayed} HNSW log records from {self.wal_path}")
+        except Exception as e:
+            logger.warning(f"Could not replay HNSW log: {e}")
+
+    def _load_graph(self, metadata: Dict[str, Any], row_ids: List[Optional[str]]):
+        """Restore graph state from a snapshot"""
+        with np.load(self.graph_path) as data:
+            if data['level0'].shape[1] != self.M0:
+                # Links are sized for the M the graph was built with, so keep using it
+                logger.warning(f"HNSW graph was built with M={metadata.get('M')}, not {self.M}; keeping its links")
+                self.M0 = data['level0'].shape[1]
+                self.M = self.M0 // 2
+                self._level_mult = 1 / np.log(self.M)
+            self.dimension = metadata['dimension']
+            self.model_name = metadata.get('model_name')
+            n = metadata['next_index']
+            self._ensure_capacity(n)
+            self._vectors[:n] = data['vectors']
+            self._levels[:n] = data['levels']
+            self._row_days[:n] = data['days']
+            self._row_flags[:n] = data['flags']
+            level0, level0_count = data['level0'], data['level0_count']
+            for index, block in enumerate(self._blocks):
+                start = index << self.LINK_BLOCK_SHIFT
+                stop = min(start + self.LINK_BLOCK_NODES, n)
+                block.level0[:stop - start] = level0[start:stop]
+                block.count[:stop - start] = level0_count[start:stop]
+
+            upper_links = data['upper_links']
+            row = 0
+            for node in data['upper_nodes'].tolist():
+                layers = []
+                for _ in range(int(self._levels[node])):
+                    links = upper_links[row]
+                    layers.append(links[links >= 0].tolist())
+                    row += 1
+                self._blocks[node >> self.LINK_BLOCK_SHIFT].upper[node] = layers
+
+        self.next_index = n
+        self._entry_point = metadata['entry_point']
+        self._max_level = metadata['max_level']
+        for node, vector_id in enumerate(row_ids):
+            if vector_id is not None:
+                self._ids[node] = vector_id
+                self._freed_at[node] = VectorStoreService.LIVE
+                self.id_to_index[vector_id] = node
+
+    def _rebuild(self):
+        """Re-insert the live nodes into a fresh graph, dropping tombstones
+
+        Every array is replaced rather than cleared, so the published graph is untouched.
+        """
+        live = np.flatnonzero(self._live[:self.next_index])
+        vectors = self._vectors[live].copy()
+        vector_ids = self._ids[live].tolist()
+        days, flags = self._row_days[live].copy(), self._row_flags[live].copy()
+        tombstones = self.next_index - live.size
+
+        self.id_to_index = {}
+        self.next_index = 0
+        self._vectors = None
+        self._ids = np.empty(0, dtype=object)
+        self._freed_at = np.zeros(0, dtype=np.int64)
+        self._levels = np.zeros(0, dtype=np.int8)
+        self._blocks = []
+        self._owned_blocks = set()
+        self._row_days = np.zeros(0, dtype=np.int32)
+        self._row_flags = np.zeros(0, dtype=np.int32)
+        self._entry_point = -1
+        self._max_level = -1
+        if vector_ids:
+            self._apply_adds(vector_ids, vectors)
+            self._row_days[:live.size] = days
+            self._row_flags[:live.size] = flags
+        logger.info(f"Rebuilt HNSW graph over {live.size} vectors, dropping {tombstones} tombstones")
+
+    def compact(self, min_free_ratio: float = 0.0) -> Dict[str, Any]:
+        """Rebuild the graph without tombstones and rewrite the snapshot
+
+        Returns the same report as VectorStoreService.compact.
+        """
+        nodes_before = self.next_index
+        tombstones = nodes_before - len(self.id_to_index)
+        snapshot_files = [self.graph_path, self.id_table_path]
+        bytes_before = VectorStoreService._files_size(snapshot_files)
+        report = {
+            'compacted': False,
+            'rows_before': nodes_before,
+            'rows_after': nodes_before,
+            'rows_reclaimed': 0,
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_before,
+            'bytes_reclaimed': 0
+        }
+        if not tombstones or tombstones < min_free_ratio * nodes_before:
+            return report
+
+        try:
+            with self._write_lock:
+                self._rebuild()
+                self._publish()
+                if not self.checkpoint():
+                    return report
+
+            bytes_after = VectorStoreService._files_size(snapshot_files)
+            report.update({
+                'compacted': True,
+                'rows_after': self.next_index,
+                'rows_reclaimed': nodes_before - self.next_index,
+                'bytes_after': bytes_after,
+                'bytes_reclaimed': bytes_before - bytes_after
+            })
+            return report
+
+        except Exception as e:
+            logger.error(f"Error compacting HNSW graph: {e}")
+            return report
+
+    def checkpoint(self) -> bool:
+        """Fold logged mutations into the graph snapshot and truncate the log"""
+        try:
+            with self._write_lock:
+                if self.next_index - len(self.id_to_index) > len(self.id_to_index):
+                    self._rebuild()
+                    self._publish()
+                self._save_index()
+                if self._wal is not None:
+                    self._wal.truncate()
+                return True
+
+        except Exception as e:
+            logger.error(f"Could not save HNSW graph: {e}")
+            return False
+
+    def _after_mutation(self):
+        """Publish the mutated graph, checkpointing when the log has grown past the configured interval"""
+        if self._wal is None or self._wal.pending_records >= self.checkpoint_interval:
+            self.checkpoint()
+        self._publish()
+
+    def get_vectors(self, vector_ids: List[str]) -> np.ndarray:
+        """Stored (normalized) vectors of the given ids, with zero rows for unknown ids"""
+        with self._write_lock:
+            nodes = np.array([self.id_to_index.get(vector_id, -1) for vector_id in vector_ids], dtype=np.int64)
+            vectors = np.zeros((len(vector_ids), self.dimension or 0), dtype=np.float32)
+            vectors[nodes >= 0] = self._vectors[nodes[nodes >= 0]]
+            return vectors
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get vector store statistics"""
+        return {
+            'total_vectors': len(self.id_to_index),
+            'dimension': self.dimension,
+            'model_name': self.model_name,
+            'index_path': self.graph_path,
+            'id_table_path': self.id_table_path,
+            'wal_enabled': self._wal is not None,
+            'wal_pending_records': self._wal.pending_records if self._wal else 0,
+            'wal_size_bytes': self._wal.size_bytes() if self._wal else 0,
+            'index_type': 'hnsw',
+            'hnsw': {
+                'M': self.M,
+                'ef_construction': self.ef_construction,
+                'ef_search': self.ef_search,
+                'max_level': self._max_level,
+                'nodes': self.next_index,
+                'tombstones': self.next_index - len(self.id_to_index)
+            }
+        }
+
+    def cleanup(self):
+        """Checkpoint outstanding mutations and release file handles"""
+        if self._wal is not None:
+            if self._wal.pending_records:
+                self.checkpoint()
+            self._wal.close()
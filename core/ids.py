@@ -1,6 +1,12 @@
 from typing import Tuple
+import re
 import uuid
 
+# Vector IDs of the chunks of a long item: <item id>_chunk_<n>
+_CHUNK_SUFFIX = re.compile(r'_chunk_\d+$')
+# IDs of the conversation segments of an item: <item id>_segment_<n>
+_SEGMENT_SUFFIX = re.compile(r'_segment_\d+$')
+
 
 class NamespacedIDManager:
     """Manages namespaced IDs for data items across different sources"""
@@ -20,6 +26,26 @@ class NamespacedIDManager:
             raise ValueError(f"Invalid namespaced ID: {namespaced_id}")
         return parts[0], parts[1]
     
+    @staticmethod
+    def create_chunk_id(parent_id: str, chunk_index: int) -> str:
+        """Create the vector ID of a chunk of an item: parent_id_chunk_n"""
+        return f"{parent_id}_chunk_{chunk_index}"
+    
+    @staticmethod
+    def get_parent_id(vector_id: str) -> str:
+        """Item (or segment) ID a vector belongs to, stripping any chunk suffix"""
+        return _CHUNK_SUFFIX.sub('', vector_id)
+    
+    @staticmethod
+    def create_segment_id(parent_id: str, segment_index: int) -> str:
+        """Create the ID of a conversation segment of an item: parent_id_segment_n"""
+        return f"{parent_id}_segment_{segment_index}"
+    
+    @staticmethod
+    def is_segment_id(record_id: str) -> bool:
+        """Check if an ID names a conversation segment rather than an item"""
+        return _SEGMENT_SUFFIX.search(record_id) is not None
+    
     @staticmethod
     def get_namespace(namespaced_id: str) -> str:
         """Extract namespace from namespaced ID"""
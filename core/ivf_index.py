@@ -0,0 +1,221 @@
+"""
+Inverted-file (IVF) coarse index for the vector store
+
+Rows are clustered with spherical k-means into ``nlist`` lists. A search
+scores the query against the centroids, probes the ``nprobe`` closest lists
+and only scores the rows posted in them, instead of every row.
+
+The index only tracks row numbers; vectors stay in the store's matrix.
+Posting lists are append-only: moving a row changes its entry in the row ->
+list assignment array, so its old posting is skipped on search. A removed row
+only leaves the live counts; the store masks it out of probed rows, and its
+posting is dropped on the next retrain.
+"""
+
+import copy
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """Coarse-quantizer index over normalized row vectors"""
+
+    TRAIN_ITERATIONS = 10
+    TRAIN_SAMPLES_PER_LIST = 64
+    ASSIGN_CHUNK_ROWS = 65536
+
+    def __init__(self, nprobe: int = 8, imbalance_threshold: float = 4.0, seed: int = 0):
+        self.nprobe = nprobe
+        self.imbalance_threshold = imbalance_threshold
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None  # (nlist, dimension), unit rows
+        self._lists: list = []  # list -> posting array of rows
+        self._list_sizes: np.ndarray = np.zeros(0, dtype=np.int64)  # used length of each posting array
+        self._counts: np.ndarray = np.zeros(0, dtype=np.int64)  # live rows per list
+        self._assignment: np.ndarray = np.zeros(0, dtype=np.int64)  # row -> list (-1 if none)
+        # Imbalance right after training; data that is inherently skewed should
+        # not trigger a retrain on every mutation
+        self.baseline_imbalance = 0.0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else self.centroids.shape[0]
+
+    def reset(self, centroids: np.ndarray):
+        """Adopt a set of centroids and clear all posting lists"""
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+        self._list_sizes = np.zeros(self.nlist, dtype=np.int64)
+        self._counts = np.zeros(self.nlist, dtype=np.int64)
+        self._assignment = np.full(self._assignment.shape[0], -1, dtype=np.int64)
+
+    def train(self, vectors: np.ndarray, nlist: int):
+        """Fit centroids to a sample of normalized vectors with spherical k-means"""
+        rng = np.random.default_rng(self.seed)
+        nlist = max(1, min(nlist, vectors.shape[0]))
+
+        max_samples = nlist * self.TRAIN_SAMPLES_PER_LIST
+        if vectors.shape[0] > max_samples:
+            vectors = vectors[np.sort(rng.choice(vectors.shape[0], max_samples, replace=False))]
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        centroids = vectors[rng.choice(vectors.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.TRAIN_ITERATIONS):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+
+            # Reseed empty lists from random samples so no centroid goes unused
+            empty = np.flatnonzero(np.bincount(labels, minlength=nlist) == 0)
+            if empty.size:
+                sums[empty] = vectors[rng.choice(vectors.shape[0], empty.size, replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        self.reset(centroids)
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest list for each row of vectors"""
+        labels = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], self.ASSIGN_CHUNK_ROWS):
+            block = vectors[start:start + self.ASSIGN_CHUNK_ROWS]
+            labels[start:start + block.shape[0]] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        """Post rows to their nearest lists, moving rows that were already posted"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size == 0:
+            return
+
+        # A row repeated within a batch keeps its last vector, as in the matrix
+        _, last = np.unique(rows[::-1], return_index=True)
+        keep = rows.size - 1 - last
+        rows, vectors = rows[keep], vectors[keep]
+
+        # Rows already posted move lists
+        posted = rows[rows < self._assignment.shape[0]]
+        self.remove(posted[self._assignment[posted] >= 0])
+        if rows.max() >= self._assignment.shape[0]:
+            capacity = max(1024, self._assignment.shape[0])
+            while capacity <= rows.max():
+                capacity *= 2
+            grown = np.full(capacity, -1, dtype=np.int64)
+            grown[:self._assignment.shape[0]] = self._assignment
+            self._assignment = grown
+
+        labels = self.assign(vectors)
+        self._assignment[rows] = labels
+        np.add.at(self._counts, labels, 1)
+
+        order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[order]
+        boundaries = np.flatnonzero(np.diff(sorted_labels)) + 1
+        for group in np.split(order, boundaries):
+            self._append(int(labels[group[0]]), rows[group])
+
+    def _append(self, list_id: int, rows: np.ndarray):
+        """Append rows to a posting array, doubling its capacity as needed"""
+        postings = self._lists[list_id]
+        size = self._list_sizes[list_id]
+        needed = size + rows.size
+        if needed > postings.shape[0]:
+            capacity = max(16, postings.shape[0])
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=np.int64)
+            grown[:size] = postings[:size]
+            postings = self._lists[list_id] = grown
+        postings[size:needed] = rows
+        self._list_sizes[list_id] = needed
+
+    def remove(self, rows: np.ndarray):
+        """Take removed rows out of their lists' live counts; their postings become stale
+
+        The assignment array is left alone, so snapshots can share it; each
+        row must be removed at most once.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[rows < self._assignment.shape[0]]
+        labels = self._assignment[rows]
+        np.subtract.at(self._counts, labels[labels >= 0], 1)
+
+    def probe(self, query_vector: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Rows posted in the lists closest to a normalized query"""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query_vector
+        if nprobe < self.nlist:
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(self.nlist)
+
+        parts = []
+        for list_id in probes:
+            postings = self._lists[list_id][:self._list_sizes[list_id]]
+            parts.append(postings[self._assignment[postings] == list_id])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def snapshot(self) -> 'IVFIndex':
+        """Copy for concurrent probes that later adds and removes do not affect
+
+        Only the per-list state is copied. Posting arrays are shared: appends
+        land past the copied list sizes and a grown array replaces the entry in
+        this index's list only. The assignment array is shared too: removes
+        leave it alone and adds only write rows posted after the copy (or a
+        grown array).
+        """
+        frozen = copy.copy(self)
+        frozen._lists = list(self._lists)
+        frozen._list_sizes = self._list_sizes.copy()
+        frozen._counts = self._counts.copy()
+        return frozen
+
+    def imbalance(self) -> float:
+        """Size of the largest list as a multiple of the mean list size"""
+        live = int(self._counts.sum())
+        if not self.is_trained or live == 0:
+            return 0.0
+        return float(self._counts.max() / (live / self.nlist))
+
+    def record_baseline(self):
+        """Remember the balance achieved by the latest training run"""
+        self.baseline_imbalance = self.imbalance()
+
+    def needs_retrain(self) -> bool:
+        """Whether lists are too unbalanced, or too full of stale postings, to stay efficient"""
+        live = int(self._counts.sum())
+        if not self.is_trained or live == 0:
+            return False
+
+        threshold = max(self.imbalance_threshold, 2 * self.baseline_imbalance)
+        stale_ratio = self._list_sizes.sum() / live
+        return self.imbalance() > threshold or stale_ratio > 2.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Describe the index configuration and list balance"""
+        stats = {
+            'trained': self.is_trained,
+            'nlist': self.nlist,
+            'nprobe': self.nprobe,
+            'imbalance_threshold': self.imbalance_threshold
+        }
+        if self.is_trained and self._counts.sum():
+            stats.update({
+                'min_list_size': int(self._counts.min()),
+                'max_list_size': int(self._counts.max()),
+                'mean_list_size': float(self._counts.mean()),
+                'imbalance': self.imbalance(),
+                'stale_postings': int(self._list_sizes.sum() - self._counts.sum())
+            })
+        return stats
@@ -6,11 +6,14 @@ from the main DatabaseService class, following the single responsibility princip
 """
 
 import sqlite3
+import json
 import logging
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any
 from contextlib import contextmanager
 
+from .ids import NamespacedIDManager
+
 logger = logging.getLogger(__name__)
 
 
@@ -166,6 +169,63 @@ class NewsTableMigration(BaseMigration):
         conn.execute("CREATE INDEX IF NOT EXISTS idx_news_created_at ON news(created_at)")
 
 
+class SegmentsTableMigration(BaseMigration):
+    """Store conversation segments as their own searchable records"""
+    
+    @property
+    def version(self) -> str:
+        return "005_data_item_segments"
+    
+    @property
+    def description(self) -> str:
+        return "Add data item segments table and move segments out of item metadata"
+    
+    def up(self, conn: sqlite3.Connection) -> None:
+        """Create segments table and materialize segments held in metadata"""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS data_item_segments (
+                id TEXT PRIMARY KEY,
+                parent_id TEXT NOT NULL,
+                segment_index INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                speaker TEXT,
+                start_time TEXT,
+                end_time TEXT,
+                days_date DATE,
+                embedding_status TEXT DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (parent_id) REFERENCES data_items(id)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_parent_id ON data_item_segments(parent_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_embedding_status ON data_item_segments(embedding_status)")
+        
+        # Existing conversations carry their segments serialized in metadata
+        cursor = conn.execute("""
+            SELECT id, metadata, days_date FROM data_items
+            WHERE metadata LIKE '%"segments":%'
+        """)
+        for row in cursor.fetchall():
+            try:
+                metadata = json.loads(row['metadata'])
+            except (TypeError, ValueError):
+                continue
+            segmentation = metadata.get('segmentation') or {}
+            segments = segmentation.pop('segments', None)
+            if not segments:
+                continue
+            
+            conn.executemany("""
+                INSERT OR REPLACE INTO data_item_segments
+                (id, parent_id, segment_index, content, speaker, start_time, end_time, days_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(NamespacedIDManager.create_segment_id(row['id'], segment['segment_index']), row['id'],
+                   segment['segment_index'], segment['content'], segment.get('speaker'),
+                   segment.get('start_time'), segment.get('end_time'), row['days_date'])
+                  for segment in segments])
+            conn.execute("UPDATE data_items SET metadata = ? WHERE id = ?", (json.dumps(metadata), row['id']))
+
+
 class MigrationRunner:
     """Handles database migration execution"""
     
@@ -176,6 +236,7 @@ class MigrationRunner:
             IndexesMigration(),
             ChatMessagesMigration(),
             NewsTableMigration(),
+            SegmentsTableMigration(),
         ]
     
     @contextmanager
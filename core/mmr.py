@@ -0,0 +1,56 @@
+"""
+Maximal marginal relevance reranking of retrieved vectors
+"""
+
+from typing import List
+
+import numpy as np
+
+
+def maximal_marginal_relevance(query_vector: np.ndarray, candidates: np.ndarray,
+                               k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Pick k candidates that are relevant to the query but not to each other
+
+    Each step selects the candidate maximizing
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max sim(c, selected)``.
+    The candidate similarity matrix is computed once and the running maximum
+    is updated with one vectorized row per step.
+
+    Args:
+        query_vector: Query vector
+        candidates: (n, dimension) candidate vectors, best match first
+        k: Number of candidates to select
+        lambda_mult: 1.0 ranks by relevance only, 0.0 by diversity only
+
+    Returns:
+        Indices into candidates, in selection order
+    """
+    candidates = np.asarray(candidates, dtype=np.float32)
+    n = candidates.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    candidates = candidates / norms
+    query_vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    query_norm = np.linalg.norm(query_vector)
+    if query_norm:
+        query_vector = query_vector / query_norm
+
+    relevance = candidates @ query_vector
+    similarity = candidates @ candidates.T
+    redundancy = np.full(n, -np.inf, dtype=np.float32)  # max similarity to anything selected
+    available = np.ones(n, dtype=bool)
+
+    selected = [int(np.argmax(relevance))]
+    for _ in range(k - 1):
+        pick = selected[-1]
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick])
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
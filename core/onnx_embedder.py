@@ -0,0 +1,159 @@
+"""
+ONNX Runtime inference backend for sentence-transformer embeddings
+
+The transformer of a loaded SentenceTransformer is exported once to ONNX
+(optionally with dynamic int8 weight quantization) and cached on disk next
+to the other model artifacts, keyed by model name. Inference tokenizes with
+the model's own tokenizer, runs the graph on ONNX Runtime's CPU provider and
+applies the same mean pooling and L2 normalization as the PyTorch pipeline,
+so the vectors are interchangeable with those already in the index.
+
+onnxruntime (and onnx, for the export) are optional dependencies; building an
+OnnxEmbedder without them raises ImportError.
+"""
+
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Sentences embedded by both backends to measure agreement after loading
+AGREEMENT_SAMPLE = [
+    "Met with the team to plan next quarter's roadmap.",
+    "Remember to buy milk, eggs and coffee on the way home.",
+    "The central bank left interest rates unchanged on Wednesday.",
+    "We talked about the trip to Lisbon and where to stay.",
+    "ok",
+]
+
+
+class _TransformerOutput(torch.nn.Module):
+    """Wraps a Hugging Face encoder so the exported graph returns token embeddings"""
+
+    def __init__(self, auto_model, input_names: List[str]):
+        super().__init__()
+        self.auto_model = auto_model
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        return self.auto_model(**dict(zip(self.input_names, inputs))).last_hidden_state
+
+
+def mean_pool(token_embeddings: np.ndarray, attention_mask: np.ndarray, normalize: bool = True) -> np.ndarray:
+    """Average token embeddings over the attention mask, as sentence-transformers' Pooling does"""
+    mask = attention_mask[..., np.newaxis].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled.astype(np.float32)
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Mean and minimum cosine similarity between matching rows of two embedding matrices"""
+    reference = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    candidate = candidate / np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    cosines = (reference * candidate).sum(axis=1)
+    return {'mean': float(cosines.mean()), 'min': float(cosines.min())}
+
+
+class OnnxEmbedder:
+    """Runs a SentenceTransformer's encoder on ONNX Runtime with an encode() like the model's"""
+
+    def __init__(self, model, model_name: str, cache_dir: str, quantize: bool = False, threads: int = 0):
+        import onnxruntime
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.tokenizer = model.tokenizer
+        self.max_seq_length = model.max_seq_length
+        self.normalize_output = self._check_pipeline(model)
+
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', model_name)
+        self.artifact_dir = os.path.join(cache_dir, slug)
+        self.artifact_path = os.path.join(self.artifact_dir, "model.int8.onnx" if quantize else "model.onnx")
+        if not os.path.exists(self.artifact_path):
+            self._export(model)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            self.artifact_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        logger.info(f"ONNX Runtime embedder ready: {self.artifact_path}")
+
+    @staticmethod
+    def _check_pipeline(model) -> bool:
+        """Check the pipeline is transformer + mean pooling, returning whether it normalizes"""
+        modules = [type(module).__name__ for module in model]
+        pooling = model[1] if len(modules) > 1 and modules[1] == 'Pooling' else None
+        mode = getattr(pooling, 'pooling_mode', None)
+        if mode is None and getattr(pooling, 'pooling_mode_mean_tokens', False):
+            mode = 'mean'
+        if modules[0] != 'Transformer' or mode != 'mean' or any(m != 'Normalize' for m in modules[2:]):
+            raise ValueError(f"ONNX backend supports Transformer + mean Pooling models, got {modules} "
+                             f"with pooling mode {mode!r}")
+        return 'Normalize' in modules[2:]
+
+    def _export(self, model):
+        """Export the encoder to ONNX and, when requested, quantize its weights to int8"""
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        fp32_path = os.path.join(self.artifact_dir, "model.onnx")
+
+        if not os.path.exists(fp32_path):
+            sample = self.tokenizer(["export sample", "a second, longer export sample"],
+                                    padding=True, return_tensors="pt")
+            input_names = list(sample.keys())
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["token_embeddings"]}
+            wrapper = _TransformerOutput(model[0].auto_model, input_names).to("cpu").eval()
+            logger.info(f"Exporting {self.model_name} to ONNX at {fp32_path}")
+            with torch.no_grad():
+                torch.onnx.export(
+                    wrapper, tuple(sample[name] for name in input_names), fp32_path,
+                    input_names=input_names, output_names=["token_embeddings"],
+                    dynamic_axes=dynamic_axes, opset_version=17, dynamo=False
+                )
+
+        if self.quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info(f"Quantizing {self.model_name} ONNX weights to int8")
+            quantize_dynamic(fp32_path, self.artifact_path, weight_type=QuantType.QInt8)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """Embed sentences, returning a vector for a string and a matrix for a list"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            feeds = {name: inputs[name].astype(np.int64) for name in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+            batches.append(mean_pool(token_embeddings, inputs["attention_mask"],
+                                     normalize=normalize_embeddings or self.normalize_output))
+
+        embeddings = np.vstack(batches)
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        """Width of the exported encoder's output"""
+        shape = self.session.get_outputs()[0].shape
+        return shape[-1] if isinstance(shape[-1], int) else None
+
+    def agreement_with(self, model, texts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Cosine agreement of this backend's vectors with the PyTorch model's"""
+        texts = texts or AGREEMENT_SAMPLE
+        reference = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        return {**cosine_agreement(np.asarray(reference), self.encode(texts)), 'samples': len(texts)}
@@ -0,0 +1,85 @@
+"""
+Scalar quantization of normalized vectors for the vector store
+
+Codes are a compact copy of the matrix used for the first-pass scan of a
+search; the best candidates are then rescored against the full-precision
+rows. Two modes are supported:
+
+    float16: each value is stored as a half-precision float (2x smaller)
+    int8:    each value is mapped to 256 levels between a per-dimension
+             offset and offset + 255 * scale (4x smaller)
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ScalarQuantizer:
+    """Encodes float32 rows to int8/float16 codes and scores queries against them"""
+
+    MODES = ("int8", "float16")
+    SCORE_CHUNK_ROWS = 65536
+
+    def __init__(self, mode: str):
+        if mode not in self.MODES:
+            raise ValueError(f"Quantization mode must be one of: {self.MODES}")
+        self.mode = mode
+        self.offset: Optional[np.ndarray] = None  # int8 only, per dimension
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(np.int8 if self.mode == "int8" else np.float16)
+
+    def calibrate(self, minimum: np.ndarray, maximum: np.ndarray):
+        """Fit the int8 range of each dimension to the observed values"""
+        self.offset = np.asarray(minimum, dtype=np.float32)
+        span = np.asarray(maximum, dtype=np.float32) - self.offset
+        span[span <= 0] = 1.0
+        self.scale = span / 255.0
+
+    def _ensure_range(self, dimension: int):
+        """Default to the [-1, 1] range of unit vectors before calibration"""
+        if self.offset is None:
+            self.calibrate(np.full(dimension, -1.0), np.full(dimension, 1.0))
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Quantize a batch of float32 rows"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.mode == "float16":
+            return vectors.astype(np.float16)
+
+        self._ensure_range(vectors.shape[1])
+        levels = np.rint((vectors - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def score(self, codes: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+        """Approximate dot product of a float32 query with every code row"""
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        if self.mode == "int8":
+            # x = offset + scale * (code + 128), so x.q splits into a constant and code.(scale * q)
+            self._ensure_range(codes.shape[1])
+            weights = (self.scale * query_vector).astype(np.float32)
+            bias = float(self.offset @ query_vector + 128.0 * weights.sum())
+        else:
+            weights, bias = query_vector.astype(np.float32), 0.0
+
+        for start in range(0, codes.shape[0], self.SCORE_CHUNK_ROWS):
+            block = codes[start:start + self.SCORE_CHUNK_ROWS].astype(np.float32)
+            scores[start:start + block.shape[0]] = block @ weights + bias
+        return scores
+
+    def memory_stats(self, rows: int, dimension: int) -> Dict[str, Any]:
+        """Size of the codes compared with the float32 rows they replace"""
+        code_bytes = rows * dimension * self.dtype.itemsize
+        full_precision_bytes = rows * dimension * 4
+        return {
+            'mode': self.mode,
+            'code_bytes': code_bytes,
+            'full_precision_bytes': full_precision_bytes,
+            'memory_savings': 1.0 - code_bytes / full_precision_bytes if full_precision_bytes else 0.0
+        }
@@ -0,0 +1,65 @@
+"""
+Compact binary row -> id table for the vector store
+
+Replaces the JSON ID map, which stored the mapping in both directions with
+stringified row keys. The table stores each row's id once, in row order, so
+the reverse mapping is rebuilt on load.
+
+File layout (little-endian):
+    magic (8 bytes) | meta_len:uint32 | meta JSON | lengths:uint32[next_index] | UTF-8 id bytes
+
+Row ids are the concatenated UTF-8 strings split by the length array. Freed
+rows have length 0.
+"""
+
+import json
+import struct
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b'LBVIDS01'
+_META_LEN = struct.Struct('<I')
+
+
+def write_id_table(f: BinaryIO, row_ids: Sequence[Optional[str]], metadata: Dict[str, Any]):
+    """Write row ids (None for freed rows) and metadata to an open binary file"""
+    encoded = [b'' if vector_id is None else vector_id.encode('utf-8') for vector_id in row_ids]
+    lengths = np.fromiter((len(b) for b in encoded), dtype='<u4', count=len(encoded))
+    meta_bytes = json.dumps(metadata).encode('utf-8')
+
+    f.write(MAGIC)
+    f.write(_META_LEN.pack(len(meta_bytes)))
+    f.write(meta_bytes)
+    f.write(lengths.tobytes())
+    f.write(b''.join(encoded))
+
+
+def read_id_table(path: str) -> Tuple[Dict[str, Any], List[Optional[str]]]:
+    """Read metadata and row ids (None for freed rows) from a table file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a vector id table")
+
+    offset = len(MAGIC)
+    (meta_len,) = _META_LEN.unpack_from(data, offset)
+    offset += _META_LEN.size
+    metadata = json.loads(data[offset:offset + meta_len].decode('utf-8'))
+    offset += meta_len
+
+    rows = metadata.get('next_index', 0)
+    lengths = np.frombuffer(data, dtype='<u4', count=rows, offset=offset)
+    offset += lengths.nbytes
+
+    ends = offset + np.cumsum(lengths, dtype=np.int64)
+    if rows and ends[-1] > len(data):
+        raise ValueError(f"{path} is truncated")
+
+    row_ids: List[Optional[str]] = []
+    start = offset
+    for end in ends.tolist():
+        row_ids.append(data[start:end].decode('utf-8') if end > start else None)
+        start = end
+    return metadata, row_ids
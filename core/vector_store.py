@@ -1,169 +1,1473 @@
 import numpy as np
 import json
 import os
-from typing import List, Tuple, Optional, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Dict, Any, NamedTuple
 import logging
+from datetime import date
+
+from .vector_wal import VectorWriteAheadLog
+from .vector_id_table import read_id_table, write_id_table
+from .ivf_index import IVFIndex
+from .scalar_quantizer import ScalarQuantizer
 
 logger = logging.getLogger(__name__)
 
 
+class _LiveRows:
+    """Row -> occupied mask as of one snapshot epoch
+
+    A freed row is stamped with the epoch of the first snapshot that omits
+    it, so freeing rows never changes what an earlier snapshot sees.
+    """
+
+    __slots__ = ('freed_at', 'epoch')
+
+    def __init__(self, freed_at: np.ndarray, epoch: int):
+        self.freed_at = freed_at
+        self.epoch = epoch
+
+    def __getitem__(self, key) -> np.ndarray:
+        return self.freed_at[key] > self.epoch
+
+
+class _Snapshot(NamedTuple):
+    """Immutable view of the store that searches read from
+
+    Rows below next_index are never written while a snapshot refers to them,
+    apart from the freed-at stamps, which it reads through its own epoch;
+    columns that writers change in place are copied first.
+    """
+    size: int  # number of live vectors
+    next_index: int
+    base: Optional[np.ndarray]
+    base_rows: int
+    matrix: Optional[np.ndarray]
+    ids: np.ndarray
+    live: _LiveRows
+    row_namespace: np.ndarray
+    row_days: np.ndarray
+    row_flags: np.ndarray
+    codes: Optional[np.ndarray]
+    quantizer: Optional[ScalarQuantizer]
+    namespace_codes: Dict[str, int]
+    partitions: List[np.ndarray]
+    partition_sizes: List[int]
+    ivf: Optional[IVFIndex]  # None until trained
+
+
 class VectorStoreService:
-    """Simple vector store service using numpy and JSON for storage"""
-    
+    """Vector store service backed by a contiguous, pre-normalized numpy matrix
+
+    Vectors live in a float32 matrix (one row per vector) with a parallel array
+    of IDs. Rows are L2-normalized on insert so that cosine similarity is a plain
+    dot product and a search is one matrix-vector product.
+
+    Rows are split into two segments. The base segment holds the rows of the
+    last snapshot and, when ``mmap_index`` is enabled, is a read-only memory map
+    of the snapshot file. The delta segment is an in-RAM matrix holding rows
+    appended since. Row numbers are global: rows below ``_base_rows`` live in
+    the base, the rest in the delta. Without mmap the base is empty and every
+    row lives in the delta.
+
+    With ``index_type="ivf"`` an inverted-file index narrows each search to the
+    rows posted in the ``nprobe`` closest k-means lists. Until the store holds
+    ``ivf_min_train_size`` vectors, searches stay exact.
+
+    With ``quantization`` set to int8 or float16, the flat scan runs over a
+    compact copy of the rows and only the best ``k * quantization_rescore``
+    candidates are rescored against the float32 rows. Combined with
+    ``mmap_index`` only the codes and the delta have to stay resident.
+
+    Rows are also partitioned by the namespace prefix of their ID, so a
+    namespace-filtered search only gathers and scores the rows of the
+    requested partitions.
+
+    Each row also carries a ``days_date`` column and boolean metadata flags
+    (see ``FLAG_ATTRIBUTES``), so date-range and metadata predicates are
+    applied before scoring and only the matching rows are scanned.
+
+    With ``search_threads`` above one, large exact scans are split into blocks
+    scored on a thread pool and the per-block top k are merged.
+
+    Searches never take a lock: they read the last published ``_Snapshot``.
+    Writers serialize on ``_write_lock``, append rows past the published ones
+    (an update tombstones the old row and appends a new one) and publish a
+    new snapshot with a single attribute swap when they are done. A freed
+    row is stamped with the epoch of the next snapshot rather than cleared,
+    so publishing costs nothing per row.
+    """
+
+    INITIAL_CAPACITY = 1024
+    SNAPSHOT_CHUNK_ROWS = 65536
+    BATCH_SCORE_ELEMENTS = 1 << 24  # scores per block of a batched search (64 MB of float32)
+    RANGE_SCAN_ROWS = 65536  # rows scored per block of a range search
+    PARALLEL_SCAN_MIN_ROWS = 16384  # smallest block worth handing to a search thread
+    # Boolean item metadata that can be filtered on; a flag's bit is its position
+    FLAG_ATTRIBUTES = ('is_starred',)
+    NO_DATE = -1
+    LIVE = np.iinfo(np.int64).max  # freed-at stamp of an occupied row
+    # Per-row columns that are rewritten in place for published rows
+    ROW_COLUMNS = ('_row_days', '_row_flags')
+
     def __init__(self, config):
         self.config = config
-        self.vectors = {}  # id -> vector mapping
-        self.id_to_index = {}  # id -> index mapping  
-        self.index_to_id = {}  # index -> id mapping
+        self.id_to_index: Dict[str, int] = {}  # id -> row mapping
         self.dimension = None
-        self.next_index = 0
-        
+        self.model_name: Optional[str] = None  # embedding model the vectors came from
+        self.next_index = 0  # number of rows in use (including freed slots)
+        self.mmap_index = config.mmap_index
+
+        self._base: Optional[np.ndarray] = None  # read-only (base_rows, dimension) snapshot rows
+        self._base_rows = 0
+        self._matrix: Optional[np.ndarray] = None  # (capacity, dimension) delta rows
+        self._ids: np.ndarray = np.empty(0, dtype=object)  # row -> id (kept once the row is freed)
+        # row -> epoch of the first snapshot without the row (LIVE while occupied,
+        # 0 for unused capacity); see _live
+        self._freed_at: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._epoch = 0  # epoch the next published snapshot gets
+
+        # Namespace partitions: row -> namespace code, and per-namespace row lists.
+        # Freed rows stay in their list and are masked by _live
+        self._namespace_codes: Dict[str, int] = {}
+        self._row_namespace: np.ndarray = np.zeros(0, dtype=np.int32)  # -1 for unused rows
+        self._partitions: List[np.ndarray] = []
+        self._partition_sizes: List[int] = []
+
+        # Per-row filter columns: days_date as a date ordinal and FLAG_ATTRIBUTES bits
+        self._row_days: np.ndarray = np.zeros(0, dtype=np.int32)
+        self._row_flags: np.ndarray = np.zeros(0, dtype=np.int32)
+
+        # Mutations are appended to the write-ahead log and folded into the
+        # snapshot on checkpoint, instead of rewriting the snapshot every time
+        self._wal: Optional[VectorWriteAheadLog] = None
+        if config.wal_enabled:
+            self._wal = VectorWriteAheadLog(self.wal_path, fsync=config.wal_fsync)
+        self.checkpoint_interval = config.checkpoint_interval
+
+        self._quantizer: Optional[ScalarQuantizer] = None
+        self._codes: Optional[np.ndarray] = None  # (capacity, dimension) quantized rows
+        if config.quantization != "none":
+            self._quantizer = ScalarQuantizer(config.quantization)
+
+        self._ivf: Optional[IVFIndex] = None
+        if config.index_type == "ivf":
+            self._ivf = IVFIndex(nprobe=config.ivf_nprobe, imbalance_threshold=config.ivf_imbalance_threshold)
+
+        self._write_lock = threading.RLock()
+        self._snapshot: Optional[_Snapshot] = None
+
+        # Exact scans score blocks of rows on this pool; numpy releases the GIL
+        # inside the BLAS products, so the blocks run on separate cores
+        self.search_threads = config.search_threads or os.cpu_count() or 1
+        self._search_pool: Optional[ThreadPoolExecutor] = None
+        if self.search_threads > 1:
+            self._search_pool = ThreadPoolExecutor(max_workers=self.search_threads,
+                                                   thread_name_prefix="vector-search")
+
         # Load existing data if available
         self._load_index()
-    
+        self._publish()
+
+    @property
+    def wal_path(self) -> str:
+        """Path of the append-only mutation log"""
+        return self.config.index_path + '.wal'
+
+    @property
+    def id_table_path(self) -> str:
+        """Path of the binary row -> id table written next to the matrix"""
+        return self.config.index_path + '.ids'
+
+    @property
+    def codes_path(self) -> str:
+        """Path of the persisted quantized rows"""
+        return self.config.index_path + '.codes'
+
+    @property
+    def attributes_path(self) -> str:
+        """Path of the persisted per-row date and flag columns"""
+        return self.config.index_path + '.attrs'
+
+    @property
+    def ivf_path(self) -> str:
+        """Path of the persisted IVF centroids"""
+        return self.config.index_path + '.ivf'
+
+    @property
+    def index_to_id(self) -> Dict[str, str]:
+        """Row -> id mapping in the persisted (stringified key) format"""
+        return {str(row): vector_id for vector_id, row in self.id_to_index.items()}
+
+    @staticmethod
+    def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize each row, leaving all-zero rows untouched"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32, copy=False)
+
+    @classmethod
+    def _grown(cls, array: np.ndarray, used: int, needed: int, fill) -> np.ndarray:
+        """Return array with room for at least `needed` rows, keeping the first `used`"""
+        capacity = array.shape[0]
+        if needed <= capacity:
+            return array
+
+        new_capacity = max(cls.INITIAL_CAPACITY, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+
+        grown = np.full((new_capacity,) + array.shape[1:], fill, dtype=array.dtype)
+        grown[:used] = array[:used]
+        return grown
+
+    def _ensure_capacity(self, rows_needed: int):
+        """Grow the backing arrays so that at least rows_needed rows fit"""
+        self._ids = self._grown(self._ids, self.next_index, rows_needed, None)
+        self._freed_at = self._grown(self._freed_at, self.next_index, rows_needed, 0)
+        self._row_namespace = self._grown(self._row_namespace, self.next_index, rows_needed, -1)
+        self._row_days = self._grown(self._row_days, self.next_index, rows_needed, self.NO_DATE)
+        self._row_flags = self._grown(self._row_flags, self.next_index, rows_needed, 0)
+
+        if self._matrix is None:
+            self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+        self._matrix = self._grown(
+            self._matrix, self.next_index - self._base_rows, rows_needed - self._base_rows, 0.0
+        )
+
+        if self._quantizer is not None:
+            if self._codes is None:
+                self._codes = np.zeros((0, self.dimension), dtype=self._quantizer.dtype)
+            self._codes = self._grown(self._codes, self.next_index, rows_needed, 0)
+
+    @property
+    def _live(self) -> _LiveRows:
+        """Row -> occupied mask of the writer's own state"""
+        return _LiveRows(self._freed_at, self._epoch)
+
+    def _current_state(self) -> _Snapshot:
+        """The writer's own arrays as a snapshot, for reads made while holding the write lock"""
+        return _Snapshot(
+            size=len(self.id_to_index),
+            next_index=self.next_index,
+            base=self._base,
+            base_rows=self._base_rows,
+            matrix=self._matrix,
+            ids=self._ids,
+            live=self._live,
+            row_namespace=self._row_namespace,
+            row_days=self._row_days,
+            row_flags=self._row_flags,
+            codes=self._codes,
+            quantizer=self._quantizer,
+            namespace_codes=self._namespace_codes,
+            partitions=self._partitions,
+            partition_sizes=self._partition_sizes,
+            ivf=self._ivf if self._ivf is not None and self._ivf.is_trained else None
+        )
+
+    def _publish(self):
+        """Swap in a snapshot of the current state for searches
+
+        Only per-namespace and per-list state is copied; rows freed from now on
+        are stamped with the next epoch, which this snapshot still sees as live.
+        """
+        state = self._current_state()
+        self._snapshot = state._replace(
+            namespace_codes=dict(state.namespace_codes),
+            partitions=list(state.partitions),
+            partition_sizes=list(state.partition_sizes),
+            ivf=state.ivf.snapshot() if state.ivf is not None else None
+        )
+        self._epoch += 1
+
+    def _unshare_columns(self):
+        """Copy the per-row columns still referenced by the published snapshot before writing to them"""
+        if self._snapshot is None:
+            return
+        for name in self.ROW_COLUMNS:
+            column = getattr(self, name)
+            if column is getattr(self._snapshot, name[1:]):
+                setattr(self, name, column.copy())
+
     def _load_index(self):
-        """Load existing vector index"""
+        """Load the snapshot and replay any mutations logged since it was written"""
+        self._load_snapshot()
+        self._replay_wal()
+        if self._ivf is not None:
+            self._load_ivf()
+
+    def _load_ivf(self):
+        """Re-post rows to persisted centroids, or train them if there are none"""
+        try:
+            if os.path.exists(self.ivf_path):
+                centroids = np.load(self.ivf_path)
+                if centroids.shape[1] == self.dimension:
+                    self._ivf.reset(centroids)
+                    self._post_all_rows()
+                    self._ivf.record_baseline()
+                    return
+                logger.warning(f"Ignoring IVF centroids with dimension {centroids.shape[1]}")
+
+            if len(self.id_to_index) >= self.config.ivf_min_train_size:
+                self._train_ivf()
+
+        except Exception as e:
+            logger.warning(f"Could not load IVF index: {e}")
+
+    def _post_all_rows(self):
+        """Assign every live row to its nearest IVF list"""
+        for start in range(0, self.next_index, self.SNAPSHOT_CHUNK_ROWS):
+            stop = min(start + self.SNAPSHOT_CHUNK_ROWS, self.next_index)
+            live = self._live[start:stop]
+            self._ivf.add(np.flatnonzero(live) + start, self._row_block(start, stop)[live])
+
+    def _train_ivf(self):
+        """Fit IVF centroids to the current rows and rebuild the posting lists"""
+        live_rows = np.flatnonzero(self._live[:self.next_index])
+        nlist = self.config.ivf_nlist or max(1, int(np.sqrt(live_rows.size)))
+
+        sample_size = min(live_rows.size, nlist * IVFIndex.TRAIN_SAMPLES_PER_LIST)
+        sample = np.sort(np.random.default_rng(0).choice(live_rows, sample_size, replace=False))
+        self._ivf.train(self._take_rows(sample, self._current_state()), nlist)
+        self._post_all_rows()
+        self._ivf.record_baseline()
+        logger.info(f"Trained IVF index with {self._ivf.nlist} lists over {live_rows.size} vectors")
+
+    def _replay_wal(self):
+        """Re-apply logged adds and tombstones on top of the loaded snapshot"""
+        if self._wal is None:
+            return
+
+        try:
+            replayed = 0
+            pending_ids: List[str] = []
+            pending_vectors: List[np.ndarray] = []
+            attribute_ids: List[str] = []
+            attribute_values: List[np.ndarray] = []
+
+            def flush_adds():
+                if pending_ids:
+                    self._apply_adds(pending_ids, np.vstack(pending_vectors))
+                    pending_ids.clear()
+                    pending_vectors.clear()
+                if attribute_ids:
+                    self._apply_attributes(attribute_ids, np.vstack(attribute_values))
+                    attribute_ids.clear()
+                    attribute_values.clear()
+
+            # Consecutive adds are applied in bulk; a tombstone flushes them first
+            # so that operations keep their logged order
+            for op, vector_id, vector in self._wal.replay():
+                if op == VectorWriteAheadLog.OP_ADD:
+                    if attribute_ids:
+                        flush_adds()
+                    if self._validate_dimension(vector.shape[0]):
+                        pending_ids.append(vector_id)
+                        pending_vectors.append(vector)
+                elif op == VectorWriteAheadLog.OP_ATTRIBUTES:
+                    attribute_ids.append(vector_id)
+                    attribute_values.append(vector)
+                else:
+                    flush_adds()
+                    self._apply_removes([vector_id])
+                replayed += 1
+            flush_adds()
+
+            if replayed:
+                logger.info(f"Replayed {replayed} vector store log records from {self.wal_path}")
+
+        except Exception as e:
+            logger.warning(f"Could not replay vector store log: {e}")
+
+    def _read_id_map(self) -> Tuple[Optional[Dict[str, Any]], List[Optional[str]]]:
+        """Read snapshot metadata and row ids, falling back to the legacy JSON map"""
+        if os.path.exists(self.id_table_path):
+            return read_id_table(self.id_table_path)
+
+        if not os.path.exists(self.config.id_map_path):
+            return None, []
+
+        with open(self.config.id_map_path, 'r') as f:
+            data = json.load(f)
+        logger.info(f"Migrating legacy vector ID map {self.config.id_map_path}")
+
+        row_ids: List[Optional[str]] = [None] * data.get('next_index', 0)
+        for key, vector_id in data.get('index_to_id', {}).items():
+            row = int(key)
+            if row < len(row_ids):
+                row_ids[row] = vector_id
+        return data, row_ids
+
+    def _load_snapshot(self):
+        """Load the last checkpointed snapshot"""
         try:
-            if os.path.exists(self.config.id_map_path):
-                with open(self.config.id_map_path, 'r') as f:
-                    data = json.load(f)
-                    self.id_to_index = data.get('id_to_index', {})
-                    self.index_to_id = data.get('index_to_id', {})
-                    self.next_index = data.get('next_index', 0)
-                    self.dimension = data.get('dimension')
-            
-            # Load vectors if they exist
-            if os.path.exists(self.config.index_path):
-                vectors_array = np.load(self.config.index_path)
-                for i, vector in enumerate(vectors_array):
-                    if str(i) in self.index_to_id:
-                        vector_id = self.index_to_id[str(i)]
-                        self.vectors[vector_id] = vector
-                        
+            metadata, row_ids = self._read_id_map()
+            if any(os.path.exists(backup) for _, backup in self._compaction_backups()):
+                self._recover_compaction(metadata)
+            if metadata is None:
+                return
+            self.next_index = metadata.get('next_index', 0)
+            self.dimension = metadata.get('dimension')
+            self.model_name = metadata.get('model_name')
+            normalized = metadata.get('normalized', False)
+
+            if self.dimension is None or not any(row_ids):
+                self.next_index = 0
+                return
+
+            # np.save appends ".npy" to paths without that suffix, so accept both
+            index_path = self.config.index_path
+            if not os.path.exists(index_path) and os.path.exists(index_path + '.npy'):
+                index_path = index_path + '.npy'
+
+            if not os.path.exists(index_path):
+                logger.warning(f"Vector ID map found but matrix {self.config.index_path} is missing")
+                self.next_index = 0
+                return
+
+            if self.mmap_index and normalized:
+                # Map the snapshot instead of reading it; pages are faulted in on search
+                vectors_array = np.load(index_path, mmap_mode='r')
+                self._base = vectors_array
+                self._base_rows = vectors_array.shape[0]
+            else:
+                if self.mmap_index:
+                    logger.info("Snapshot predates normalized storage; loading into memory until next checkpoint")
+                vectors_array = np.load(index_path).astype(np.float32, copy=False)
+
+            rows = vectors_array.shape[0]
+            next_index = max(self.next_index, rows)
+            self.next_index = 0
+            self._ensure_capacity(next_index)
+            self.next_index = next_index
+
+            for row, vector_id in enumerate(row_ids[:rows]):
+                if vector_id is not None:
+                    self._ids[row] = vector_id
+                    self._freed_at[row] = self.LIVE
+                    self.id_to_index[vector_id] = row
+            live_rows = np.flatnonzero(self._live[:rows])
+            self._partition_rows(live_rows, self._ids[live_rows])
+
+            if self._base is None:
+                self._matrix[:rows] = self._normalize_rows(vectors_array)
+                # Freed rows are kept as zero placeholders
+                self._matrix[:rows][~self._live[:rows]] = 0.0
+
+            if self._quantizer is not None:
+                self._load_codes(rows)
+            self._load_attributes(rows)
+
         except Exception as e:
             logger.warning(f"Could not load existing index: {e}")
-    
+
+    def _load_attributes(self, rows: int):
+        """Load the per-row date and flag columns saved with the snapshot"""
+        if not os.path.exists(self.attributes_path):
+            return
+
+        with np.load(self.attributes_path) as data:
+            if data['days'].shape[0] != rows:
+                logger.warning("Vector attribute columns do not match the snapshot; ignoring them")
+                return
+            self._row_days[:rows] = data['days']
+            self._row_flags[:rows] = data['flags']
+
+    def _load_codes(self, rows: int):
+        """Load the quantized rows saved with the snapshot, or re-encode them"""
+        if os.path.exists(self.codes_path):
+            with np.load(self.codes_path) as data:
+                codes = data['codes']
+                if codes.shape == (rows, self.dimension) and codes.dtype == self._quantizer.dtype:
+                    self._codes[:rows] = codes
+                    if self._quantizer.mode == "int8":
+                        self._quantizer.offset = data['offset']
+                        self._quantizer.scale = data['scale']
+                    return
+            logger.info("Quantized rows do not match the snapshot; re-encoding")
+        self._encode_all()
+
+    def _encode_all(self):
+        """Recalibrate the quantizer on the live rows and re-encode every row
+
+        The codes and quantizer are replaced rather than updated in place, as
+        the published snapshot may still be scoring against them.
+        """
+        quantizer = ScalarQuantizer(self._quantizer.mode)
+        if quantizer.mode == "int8" and self._live[:self.next_index].any():
+            minimum = np.full(self.dimension, np.inf, dtype=np.float32)
+            maximum = np.full(self.dimension, -np.inf, dtype=np.float32)
+            for start in range(0, self.next_index, self.SNAPSHOT_CHUNK_ROWS):
+                stop = min(start + self.SNAPSHOT_CHUNK_ROWS, self.next_index)
+                block = self._row_block(start, stop)[self._live[start:stop]]
+                if block.size:
+                    minimum = np.minimum(minimum, block.min(axis=0))
+                    maximum = np.maximum(maximum, block.max(axis=0))
+            quantizer.calibrate(minimum, maximum)
+
+        codes = np.zeros_like(self._codes)
+        for start in range(0, self.next_index, self.SNAPSHOT_CHUNK_ROWS):
+            stop = min(start + self.SNAPSHOT_CHUNK_ROWS, self.next_index)
+            codes[start:stop] = quantizer.encode(self._row_block(start, stop))
+        self._quantizer, self._codes = quantizer, codes
+
+    def _write_codes(self, f):
+        """Write the quantized rows and their calibration in .npz format"""
+        arrays = {'codes': self._codes[:self.next_index]}
+        if self._quantizer.mode == "int8":
+            arrays.update(offset=self._quantizer.offset, scale=self._quantizer.scale)
+        np.savez(f, **arrays)
+
+    @staticmethod
+    def _atomic_write(path: str, write_func):
+        """Write a file via a temporary sibling and atomically swap it into place"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            write_func(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _row_block(self, start: int, stop: int) -> np.ndarray:
+        """Return rows [start, stop) across the base and delta segments"""
+        parts = []
+        if start < self._base_rows:
+            parts.append(self._base[start:min(stop, self._base_rows)])
+        if stop > self._base_rows:
+            parts.append(self._matrix[max(start, self._base_rows) - self._base_rows:stop - self._base_rows])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _write_matrix(self, f):
+        """Stream all rows to an open file in .npy format, zeroing freed rows"""
+        header = {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+            'fortran_order': False,
+            'shape': (self.next_index, self.dimension)
+        }
+        np.lib.format.write_array_header_1_0(f, header)
+
+        for start in range(0, self.next_index, self.SNAPSHOT_CHUNK_ROWS):
+            stop = min(start + self.SNAPSHOT_CHUNK_ROWS, self.next_index)
+            block = np.array(self._row_block(start, stop), dtype=np.float32)
+            block[~self._live[start:stop]] = 0.0
+            f.write(block.tobytes())
+
     def _save_index(self):
-        """Save vector index to disk"""
-        try:
-            # Save ID mappings
-            data = {
-                'id_to_index': self.id_to_index,
-                'index_to_id': self.index_to_id,
-                'next_index': self.next_index,
-                'dimension': self.dimension
+        """Write a full snapshot of the index to disk"""
+        # The matrix and attribute columns are swapped in before the ID table so
+        # the table never refers to rows that are missing from either on disk
+        if self.next_index:
+            self._atomic_write(self.config.index_path, self._write_matrix)
+            self._atomic_write(self.attributes_path, lambda f: np.savez(
+                f, days=self._row_days[:self.next_index], flags=self._row_flags[:self.next_index]
+            ))
+
+        metadata = {
+            'next_index': self.next_index,
+            'dimension': self.dimension,
+            'model_name': self.model_name,
+            'normalized': True
+        }
+        row_ids = np.where(self._live[:self.next_index], self._ids[:self.next_index], None).tolist()
+        self._atomic_write(self.id_table_path, lambda f: write_id_table(f, row_ids, metadata))
+
+        if self._ivf is not None and self._ivf.is_trained:
+            self._atomic_write(self.ivf_path, lambda f: np.save(f, self._ivf.centroids))
+
+        if self._quantizer is not None and self.next_index:
+            if self._quantizer.mode == "int8":
+                # Refit the int8 ranges to everything added since the last checkpoint
+                self._encode_all()
+            self._atomic_write(self.codes_path, self._write_codes)
+
+        # The binary table supersedes the legacy JSON map once it is written
+        if os.path.exists(self.config.id_map_path):
+            os.remove(self.config.id_map_path)
+            logger.info(f"Removed legacy vector ID map {self.config.id_map_path}")
+
+    def _remap_base(self):
+        """Re-open the freshly written snapshot as the base segment and drop the delta"""
+        if not self.next_index:
+            return
+
+        self._base = np.load(self.config.index_path, mmap_mode='r')
+        self._base_rows = self._base.shape[0]
+        self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+
+    @property
+    def compaction_backup_path(self) -> str:
+        """Path the previous matrix is moved to while a compaction swaps files"""
+        return self.config.index_path + '.precompact'
+
+    def _compaction_backups(self) -> List[Tuple[str, str]]:
+        """(snapshot file, backup path) pairs moved aside while a compaction swaps files
+
+        The attribute columns are written before the ID table too, so they are
+        kept aside with the matrix they belong to.
+        """
+        return [(self.config.index_path, self.compaction_backup_path),
+                (self.attributes_path, self.attributes_path + '.precompact')]
+
+    def _restore_compaction_backups(self):
+        """Move the pre-compaction snapshot files back into place"""
+        for path, backup in self._compaction_backups():
+            if os.path.exists(backup):
+                os.replace(backup, path)
+
+    def _discard_compaction_backups(self):
+        """Delete the pre-compaction snapshot files once the new ID table is in place"""
+        for _, backup in reversed(self._compaction_backups()):
+            if os.path.exists(backup):
+                os.remove(backup)
+
+    def _snapshot_files(self) -> List[str]:
+        """Paths of the files that make up a snapshot"""
+        return [self.config.index_path, self.id_table_path, self.attributes_path, self.codes_path]
+
+    @staticmethod
+    def _files_size(paths: List[str]) -> int:
+        """Total size in bytes of the paths that exist"""
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def _recover_compaction(self, metadata: Optional[Dict[str, Any]]):
+        """Roll back or finish a compaction interrupted between its file swaps
+
+        A compacted ID table always has exactly as many rows as the matrix
+        written before it, so a table with more rows than the matrix on disk
+        still belongs to the matrix in the backup.
+        """
+        index_path = self.config.index_path
+        matrix_rows = np.load(index_path, mmap_mode='r').shape[0] if os.path.exists(index_path) else 0
+        if metadata is not None and metadata.get('next_index', 0) > matrix_rows:
+            self._restore_compaction_backups()
+            logger.warning("Rolled back an interrupted vector store compaction")
+        else:
+            self._discard_compaction_backups()
+
+    def compact(self, min_free_ratio: float = 0.0) -> Dict[str, Any]:
+        """
+        Renumber the live rows densely and rewrite the snapshot without freed rows
+
+        The previous matrix and attribute columns are kept aside until the new
+        ID table is in place, so an interrupted compaction is rolled back on
+        the next load.
+
+        Args:
+            min_free_ratio: Skip compaction unless at least this fraction of rows is free
+
+        Returns:
+            Dictionary with the row counts and snapshot bytes before and after
+        """
+        with self._write_lock:
+            rows_before = self.next_index
+            free_rows = rows_before - len(self.id_to_index)
+            bytes_before = self._files_size(self._snapshot_files())
+            report = {
+                'compacted': False,
+                'rows_before': rows_before,
+                'rows_after': rows_before,
+                'rows_reclaimed': 0,
+                'bytes_before': bytes_before,
+                'bytes_after': bytes_before,
+                'bytes_reclaimed': 0
             }
-            
-            os.makedirs(os.path.dirname(self.config.id_map_path), exist_ok=True)
-            with open(self.config.id_map_path, 'w') as f:
-                json.dump(data, f)
-            
-            # Save vectors as numpy array
-            if self.vectors:
-                vectors_list = []
-                for i in range(self.next_index):
-                    if str(i) in self.index_to_id:
-                        vector_id = self.index_to_id[str(i)]
-                        if vector_id in self.vectors:
-                            vectors_list.append(self.vectors[vector_id])
-                        else:
-                            # Placeholder for deleted vectors
-                            vectors_list.append(np.zeros(self.dimension, dtype=np.float32))
-                    else:
-                        vectors_list.append(np.zeros(self.dimension, dtype=np.float32))
-                
-                if vectors_list:
-                    vectors_array = np.array(vectors_list)
-                    os.makedirs(os.path.dirname(self.config.index_path), exist_ok=True)
-                    np.save(self.config.index_path, vectors_array)
-                    
+            if not free_rows or free_rows < min_free_ratio * rows_before:
+                return report
+
+            try:
+                live_rows = np.flatnonzero(self._live[:rows_before])
+                vectors = self._take_rows(live_rows, self._current_state())
+                vector_ids = self._ids[live_rows]
+                days, flags = self._row_days[live_rows], self._row_flags[live_rows]
+                codes = self._codes[live_rows] if self._codes is not None else None
+
+                self._base, self._base_rows, self._matrix = None, 0, None
+                self._ids = np.empty(0, dtype=object)
+                self._freed_at = np.zeros(0, dtype=np.int64)
+                self._row_namespace = np.zeros(0, dtype=np.int32)
+                self._row_days = np.zeros(0, dtype=np.int32)
+                self._row_flags = np.zeros(0, dtype=np.int32)
+                self._codes = None
+                self._namespace_codes, self._partitions, self._partition_sizes = {}, [], []
+                self.next_index = 0
+
+                rows = live_rows.size
+                self._ensure_capacity(rows)
+                self.next_index = rows
+                self._matrix[:rows] = vectors
+                self._ids[:rows] = vector_ids
+                self._freed_at[:rows] = self.LIVE
+                self._row_days[:rows] = days
+                self._row_flags[:rows] = flags
+                if codes is not None:
+                    self._codes[:rows] = codes
+                self.id_to_index = {vector_id: row for row, vector_id in enumerate(vector_ids)}
+                self._partition_rows(np.arange(rows), vector_ids)
+
+                if self._ivf is not None and self._ivf.is_trained:
+                    self._ivf.reset(self._ivf.centroids)
+                    self._post_all_rows()
+                    self._ivf.record_baseline()
+                self._publish()
+
+                for path, backup in self._compaction_backups():
+                    if os.path.exists(path):
+                        os.replace(path, backup)
+                if not self.checkpoint():
+                    # Keep the old snapshot; the log still replays onto it by ID
+                    self._restore_compaction_backups()
+                    return report
+                self._discard_compaction_backups()
+
+                bytes_after = self._files_size(self._snapshot_files())
+                report.update({
+                    'compacted': True,
+                    'rows_after': rows,
+                    'rows_reclaimed': rows_before - rows,
+                    'bytes_after': bytes_after,
+                    'bytes_reclaimed': bytes_before - bytes_after
+                })
+                logger.info(f"Compacted vector store: reclaimed {rows_before - rows} rows "
+                            f"and {bytes_before - bytes_after} bytes")
+                return report
+
+            except Exception as e:
+                logger.error(f"Error compacting vector store: {e}")
+                return report
+
+    def checkpoint(self) -> bool:
+        """Fold logged mutations into the snapshot and truncate the log"""
+        try:
+            with self._write_lock:
+                self._save_index()
+                if self._wal is not None:
+                    self._wal.truncate()
+                if self.mmap_index:
+                    self._remap_base()
+                self._publish()
+            return True
+
         except Exception as e:
             logger.error(f"Could not save index: {e}")
-    
-    def add_vector(self, vector_id: str, vector: np.ndarray) -> bool:
+            return False
+
+    def _persist_adds(self, vector_ids: List[str], vectors: np.ndarray,
+                      attributes: Optional[np.ndarray] = None):
+        """Record added vectors (and their filter attributes) durably before they are applied"""
+        if self._wal is None:
+            return
+        self._wal.append_adds(vector_ids, vectors, attributes)
+
+    def _persist_removes(self, vector_ids: List[str]):
+        """Record tombstones durably before they are applied"""
+        if self._wal is None:
+            return
+        self._wal.append_removes(vector_ids)
+
+    def _after_mutation(self):
+        """Retrain the IVF index and checkpoint when they are due"""
+        if self._ivf is not None:
+            if self._ivf.is_trained:
+                if self._ivf.needs_retrain():
+                    self._train_ivf()
+            elif len(self.id_to_index) >= self.config.ivf_min_train_size:
+                self._train_ivf()
+
+        if self._wal is None or self._wal.pending_records >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def _validate_dimension(self, dimension: int) -> bool:
+        """Check a vector dimension against the store, fixing it on first use"""
+        if self.dimension is None:
+            self.dimension = dimension
+        elif dimension != self.dimension:
+            logger.error(f"Vector dimension {dimension} doesn't match expected {self.dimension}")
+            return False
+        return True
+
+    def _apply_adds(self, vector_ids: List[str], vectors: np.ndarray):
+        """Insert or overwrite a batch of vectors in memory"""
+        rows = np.empty(len(vector_ids), dtype=np.int64)
+        new_ids = []
+        retired = []
+        moved = []  # (old row, new row) pairs whose attributes carry over
+        for i, vector_id in enumerate(vector_ids):
+            row = self.id_to_index.get(vector_id)
+            if row is not None and row < self.next_index:
+                # Published rows are never overwritten (and the base is read-only):
+                # retire the old row and append a new one
+                self._freed_at[row] = self._epoch
+                retired.append(row)
+                moved.append((row, self.next_index + len(new_ids)))
+                row = None
+            if row is None:
+                # New vector
+                row = self.next_index + len(new_ids)
+                self.id_to_index[vector_id] = row
+                new_ids.append(vector_id)
+            rows[i] = row
+
+        if new_ids:
+            start = self.next_index
+            self._ensure_capacity(start + len(new_ids))
+            self._ids[start:start + len(new_ids)] = new_ids
+            self._freed_at[start:start + len(new_ids)] = self.LIVE
+            self.next_index += len(new_ids)
+            self._partition_rows(np.arange(start, self.next_index), new_ids)
+            for old_row, new_row in moved:
+                self._row_days[new_row] = self._row_days[old_row]
+                self._row_flags[new_row] = self._row_flags[old_row]
+
+        vectors = self._normalize_rows(vectors)
+        self._matrix[rows - self._base_rows] = vectors
+        if self._quantizer is not None:
+            self._codes[rows] = self._quantizer.encode(vectors)
+
+        if self._ivf is not None and self._ivf.is_trained:
+            self._ivf.remove(retired)
+            self._ivf.add(rows, vectors)
+
+    def _apply_removes(self, vector_ids: List[str]) -> int:
+        """Free the rows of a batch of vectors in memory"""
+        rows = np.array(
+            [self.id_to_index.pop(vector_id) for vector_id in vector_ids if vector_id in self.id_to_index],
+            dtype=np.int64
+        )
+        if rows.size:
+            # Freed rows keep their columns, are masked by _live and are
+            # zeroed on the next checkpoint
+            self._freed_at[rows] = self._epoch
+            if self._ivf is not None and self._ivf.is_trained:
+                self._ivf.remove(rows)
+        return int(rows.size)
+
+    def _apply_attributes(self, vector_ids: List[str], attributes: np.ndarray):
+        """Set the date and flag columns of stored vectors"""
+        updates = [
+            (self.id_to_index[vector_id], days, flags)
+            for vector_id, (days, flags) in zip(vector_ids, attributes.tolist())
+            if vector_id in self.id_to_index
+        ]
+        # Rows past the published snapshot are invisible to searches, so only
+        # rewriting a published row needs private copies of the columns
+        published_rows = self._snapshot.next_index if self._snapshot is not None else 0
+        if any(row < published_rows for row, _, _ in updates):
+            self._unshare_columns()
+        for row, days, flags in updates:
+            self._row_days[row] = days
+            self._row_flags[row] = flags
+
+    @classmethod
+    def _date_ordinal(cls, days_date: Optional[str]) -> int:
+        """Convert a YYYY-MM-DD days_date to a date ordinal, NO_DATE if missing or invalid"""
+        if not days_date:
+            return cls.NO_DATE
+        try:
+            return date.fromisoformat(str(days_date)[:10]).toordinal()
+        except ValueError:
+            return cls.NO_DATE
+
+    @classmethod
+    def _encode_attributes(cls, attributes: List[Optional[Dict[str, Any]]]) -> np.ndarray:
+        """Pack per-vector attribute dicts into (days_date ordinal, flag bits) rows"""
+        encoded = np.empty((len(attributes), 2), dtype=np.int32)
+        for i, item in enumerate(attributes):
+            item = item or {}
+            flags = 0
+            for bit, name in enumerate(cls.FLAG_ATTRIBUTES):
+                if item.get(name):
+                    flags |= 1 << bit
+            encoded[i] = (cls._date_ordinal(item.get('days_date')), flags)
+        return encoded
+
+    @classmethod
+    def _attribute_mask(cls, row_days: np.ndarray, row_flags: np.ndarray,
+                        date_range: Optional[Tuple[Optional[str], Optional[str]]],
+                        metadata_filter: Optional[Dict[str, bool]]) -> np.ndarray:
+        """Rows whose date falls in an inclusive range and whose flags match"""
+        mask = np.ones(row_days.shape[0], dtype=bool)
+        if date_range:
+            start, end = date_range
+            if start:
+                mask &= row_days >= cls._date_ordinal(start)
+            if end:
+                mask &= (row_days <= cls._date_ordinal(end)) & (row_days != cls.NO_DATE)
+
+        for name, wanted in (metadata_filter or {}).items():
+            if name not in cls.FLAG_ATTRIBUTES:
+                raise ValueError(f"Cannot filter on metadata '{name}'; supported: {cls.FLAG_ATTRIBUTES}")
+            has_flag = (row_flags & (1 << cls.FLAG_ATTRIBUTES.index(name))) != 0
+            mask &= has_flag if wanted else ~has_flag
+        return mask
+
+    def add_vector(self, vector_id: str, vector: np.ndarray,
+                   attributes: Optional[Dict[str, Any]] = None) -> bool:
         """Add a vector to the store"""
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        return self.add_vectors([vector_id], vector, None if attributes is None else [attributes])
+
+    def add_vectors(self, vector_ids: List[str], vectors: np.ndarray,
+                    attributes: Optional[List[Optional[Dict[str, Any]]]] = None) -> bool:
+        """Add a batch of vectors to the store with a single persistence write
+
+        Args:
+            vector_ids: IDs for each row of vectors
+            vectors: (len(vector_ids), dimension) matrix of vectors
+            attributes: Optional per-vector filter attributes: a 'days_date'
+                (YYYY-MM-DD) and boolean FLAG_ATTRIBUTES such as 'is_starred'
+
+        Returns:
+            True if the whole batch was stored, False if it was rejected
+        """
         try:
-            vector = np.array(vector, dtype=np.float32)
-            
-            # Set dimension on first vector
-            if self.dimension is None:
-                self.dimension = vector.shape[0]
-            elif vector.shape[0] != self.dimension:
-                logger.error(f"Vector dimension {vector.shape[0]} doesn't match expected {self.dimension}")
+            vector_ids = list(vector_ids)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if not vector_ids:
+                return True
+
+            if vectors.ndim != 2 or vectors.shape[0] != len(vector_ids):
+                logger.error(f"Expected a ({len(vector_ids)}, dimension) matrix, got shape {vectors.shape}")
                 return False
-            
-            # Add or update vector
-            if vector_id not in self.id_to_index:
-                # New vector
-                index = self.next_index
-                self.id_to_index[vector_id] = index
-                self.index_to_id[str(index)] = vector_id
-                self.next_index += 1
-            
-            self.vectors[vector_id] = vector
-            self._save_index()
+
+            if not self._validate_dimension(vectors.shape[1]):
+                return False
+
+            if attributes is not None and len(attributes) != len(vector_ids):
+                logger.error(f"Expected {len(vector_ids)} attribute entries, got {len(attributes)}")
+                return False
+            encoded = None if attributes is None else self._encode_attributes(attributes)
+
+            vectors = self._normalize_rows(vectors)
+            with self._write_lock:
+                self._persist_adds(vector_ids, vectors, encoded)
+                self._apply_adds(vector_ids, vectors)
+                if encoded is not None:
+                    self._apply_attributes(vector_ids, encoded)
+                self._after_mutation()
+                self._publish()
             return True
-            
+
         except Exception as e:
-            logger.error(f"Error adding vector {vector_id}: {e}")
+            logger.error(f"Error adding {len(vector_ids)} vectors: {e}")
             return False
-    
+
     def remove_vector(self, vector_id: str) -> bool:
         """Remove a vector from the store"""
+        return self.remove_vectors([vector_id]) == 1
+
+    def remove_vectors(self, vector_ids: List[str]) -> int:
+        """Remove a batch of vectors with a single persistence write
+
+        Returns:
+            Number of vectors that were present and removed
+        """
         try:
-            if vector_id in self.vectors:
-                index = self.id_to_index[vector_id]
-                del self.vectors[vector_id]
-                del self.id_to_index[vector_id]
-                del self.index_to_id[str(index)]
-                self._save_index()
-                return True
-            return False
-            
+            with self._write_lock:
+                present = [vector_id for vector_id in dict.fromkeys(vector_ids) if vector_id in self.id_to_index]
+                if not present:
+                    return 0
+
+                self._persist_removes(present)
+                removed = self._apply_removes(present)
+                self._after_mutation()
+                self._publish()
+                return removed
+
         except Exception as e:
-            logger.error(f"Error removing vector {vector_id}: {e}")
-            return False
-    
-    def search(self, query_vector: np.ndarray, k: int = 10, 
-               namespace_filter: Optional[List[str]] = None) -> List[Tuple[str, float]]:
-        """Search for similar vectors"""
+            logger.error(f"Error removing vectors: {e}")
+            return 0
+
+    def _score_all(self, query_vector: np.ndarray, snapshot: Optional[_Snapshot] = None) -> np.ndarray:
+        """Dot product of the query with every row, across both segments"""
+        snapshot = snapshot or self._snapshot
+        scores = np.empty(snapshot.next_index, dtype=np.float32)
+        if snapshot.base_rows:
+            scores[:snapshot.base_rows] = snapshot.base @ query_vector
+        if snapshot.next_index > snapshot.base_rows:
+            scores[snapshot.base_rows:] = snapshot.matrix[:snapshot.next_index - snapshot.base_rows] @ query_vector
+        return scores
+
+    def _score_all_batch(self, query_matrix: np.ndarray, snapshot: Optional[_Snapshot] = None) -> np.ndarray:
+        """Dot product of each query row with every row, as a (queries, rows) matrix"""
+        snapshot = snapshot or self._snapshot
+        scores = np.empty((query_matrix.shape[0], snapshot.next_index), dtype=np.float32)
+        if snapshot.base_rows:
+            scores[:, :snapshot.base_rows] = query_matrix @ snapshot.base.T
+        if snapshot.next_index > snapshot.base_rows:
+            delta = snapshot.matrix[:snapshot.next_index - snapshot.base_rows]
+            scores[:, snapshot.base_rows:] = query_matrix @ delta.T
+        return scores
+
+    def _take_rows(self, rows: np.ndarray, snapshot: Optional[_Snapshot] = None) -> np.ndarray:
+        """Gather an arbitrary set of rows from both segments, in order"""
+        snapshot = snapshot or self._snapshot
+        rows = np.asarray(rows, dtype=np.int64)
+        if not snapshot.base_rows:
+            return snapshot.matrix[rows]
+
+        taken = np.empty((rows.size, self.dimension), dtype=np.float32)
+        in_base = rows < snapshot.base_rows
+        taken[in_base] = snapshot.base[rows[in_base]]
+        taken[~in_base] = snapshot.matrix[rows[~in_base] - snapshot.base_rows]
+        return taken
+
+    @staticmethod
+    def _namespace_of(vector_id: str) -> str:
+        """Namespace prefix of a namespaced ID"""
+        return vector_id.split(':', 1)[0] if ':' in vector_id else vector_id
+
+    def _partition_rows(self, rows: np.ndarray, vector_ids):
+        """Record the namespace of newly occupied rows and append them to their partitions"""
+        if not len(rows):
+            return
+
+        codes = np.empty(len(rows), dtype=np.int32)
+        for i, vector_id in enumerate(vector_ids):
+            namespace = self._namespace_of(vector_id)
+            code = self._namespace_codes.get(namespace)
+            if code is None:
+                code = self._namespace_codes[namespace] = len(self._partitions)
+                self._partitions.append(np.empty(0, dtype=np.int64))
+                self._partition_sizes.append(0)
+            codes[i] = code
+        self._row_namespace[rows] = codes
+
+        order = np.argsort(codes, kind='stable')
+        boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+        for group in np.split(order, boundaries):
+            code = int(codes[group[0]])
+            size = self._partition_sizes[code]
+            self._partitions[code] = self._grown(self._partitions[code], size, size + group.size, 0)
+            self._partitions[code][size:size + group.size] = rows[group]
+            self._partition_sizes[code] = size + group.size
+
+    @staticmethod
+    def _namespace_filter_codes(namespace_filter: List[str], snapshot: _Snapshot) -> np.ndarray:
+        """Partition codes of the requested namespaces that exist in the store"""
+        return np.array(
+            [snapshot.namespace_codes[n] for n in set(namespace_filter) if n in snapshot.namespace_codes],
+            dtype=np.int32
+        )
+
+    def _namespace_rows(self, namespace_filter: List[str], snapshot: _Snapshot) -> np.ndarray:
+        """Live rows of the requested partitions, in row order"""
+        parts = [
+            snapshot.partitions[code][:snapshot.partition_sizes[code]]
+            for code in self._namespace_filter_codes(namespace_filter, snapshot)
+        ]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        rows = np.sort(np.concatenate(parts))
+        return rows[snapshot.live[rows]]
+
+    def _filter_namespaces(self, rows: np.ndarray, namespace_filter: Optional[List[str]],
+                           snapshot: _Snapshot) -> np.ndarray:
+        """Keep only rows whose id belongs to one of the namespaces"""
+        if not namespace_filter:
+            return rows
+        codes = self._namespace_filter_codes(namespace_filter, snapshot)
+        return rows[np.isin(snapshot.row_namespace[rows], codes)]
+
+    def _filter_attributes(self, rows: np.ndarray,
+                           date_range: Optional[Tuple[Optional[str], Optional[str]]],
+                           metadata_filter: Optional[Dict[str, bool]],
+                           snapshot: _Snapshot) -> np.ndarray:
+        """Keep only rows matching the date range and metadata predicates"""
+        if not date_range and not metadata_filter:
+            return rows
+        mask = self._attribute_mask(snapshot.row_days[rows], snapshot.row_flags[rows], date_range, metadata_filter)
+        return rows[mask]
+
+    def search(self, query_vector: np.ndarray, k: int = 10,
+               namespace_filter: Optional[List[str]] = None,
+               nprobe: Optional[int] = None,
+               date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+               metadata_filter: Optional[Dict[str, bool]] = None) -> List[Tuple[str, float]]:
+        """Search for similar vectors
+
+        With the IVF index trained, only the rows of the nprobe closest lists
+        are scored (defaults to the configured ivf_nprobe).
+
+        date_range is an inclusive (start, end) pair of YYYY-MM-DD days_dates
+        (either may be None) and metadata_filter maps FLAG_ATTRIBUTES to the
+        required value, e.g. {'is_starred': True}. Both are applied before
+        scoring.
+        """
         try:
-            if not self.vectors:
+            # Everything below reads this one snapshot, never the writer's state
+            snapshot = self._snapshot
+            if not snapshot.size or k <= 0:
+                return []
+
+            query_vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+            query_norm = np.linalg.norm(query_vector)
+            if query_norm == 0:
+                logger.warning("Zero query vector provided for search")
                 return []
-            
-            query_vector = np.array(query_vector, dtype=np.float32)
-            
-            results = []
-            for vector_id, vector in self.vectors.items():
-                # Apply namespace filter if provided
+            query_vector = query_vector / query_norm
+
+            if snapshot.ivf is not None:
+                rows = snapshot.ivf.probe(query_vector, nprobe)
+                rows = self._filter_namespaces(rows[snapshot.live[rows]], namespace_filter, snapshot)
+                rows = self._filter_attributes(rows, date_range, metadata_filter, snapshot)
+                return self._top_k(rows, self._take_rows(rows, snapshot) @ query_vector, k, snapshot)
+
+            if namespace_filter or date_range or metadata_filter:
+                # Only the requested partitions and matching rows are gathered and scored
                 if namespace_filter:
-                    namespace = vector_id.split(':', 1)[0] if ':' in vector_id else vector_id
-                    if namespace not in namespace_filter:
-                        continue
-                
-                # Calculate cosine similarity
-                similarity = np.dot(query_vector, vector) / (
-                    np.linalg.norm(query_vector) * np.linalg.norm(vector)
-                )
-                results.append((vector_id, float(similarity)))
-            
-            # Sort by similarity and return top k
-            results.sort(key=lambda x: x[1], reverse=True)
-            return results[:k]
-            
+                    rows = self._namespace_rows(namespace_filter, snapshot)
+                else:
+                    rows = np.flatnonzero(snapshot.live[:snapshot.next_index])
+                rows = self._filter_attributes(rows, date_range, metadata_filter, snapshot)
+                if snapshot.quantizer is not None:
+                    return self._search_quantized(query_vector, rows, k, snapshot, partial=True)
+                if self._parallel_scan(rows.size):
+                    return self._parallel_top_k(query_vector, k, snapshot, rows)
+                return self._top_k(rows, self._take_rows(rows, snapshot) @ query_vector, k, snapshot)
+
+            if snapshot.quantizer is None and self._parallel_scan(snapshot.next_index):
+                return self._parallel_top_k(query_vector, k, snapshot)
+
+            rows = np.flatnonzero(snapshot.live[:snapshot.next_index])
+            if snapshot.quantizer is not None:
+                return self._search_quantized(query_vector, rows, k, snapshot)
+
+            # Rows are pre-normalized, so cosine similarity is a single mat-vec product
+            scores = self._score_all(query_vector, snapshot)
+            return self._top_k(rows, scores[rows], k, snapshot)
+
         except Exception as e:
             logger.error(f"Error searching vectors: {e}")
             return []
-    
+
+    def _parallel_scan(self, rows_to_score: int) -> bool:
+        """Whether a scan is large enough to split across the search threads"""
+        return self._search_pool is not None and rows_to_score >= 2 * self.PARALLEL_SCAN_MIN_ROWS
+
+    def _scan_blocks(self, start: int, stop: int, total: int) -> List[Tuple[int, int]]:
+        """Split [start, stop) into blocks sized to give each search thread one"""
+        size = max(self.PARALLEL_SCAN_MIN_ROWS, -(-total // self.search_threads))
+        return [(block, min(block + size, stop)) for block in range(start, stop, size)]
+
+    def _parallel_top_k(self, query_vector: np.ndarray, k: int, snapshot: _Snapshot,
+                        rows: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Exact top-k with blocks scored on the search pool, merging each block's top k
+
+        Without rows every live row is scanned, as contiguous slices of the
+        base and delta segments; otherwise the given rows are gathered block
+        by block.
+        """
+        if rows is None:
+            total = snapshot.next_index
+            blocks = (self._scan_blocks(0, snapshot.base_rows, total) +
+                      self._scan_blocks(snapshot.base_rows, total, total))
+        else:
+            blocks = self._scan_blocks(0, rows.size, rows.size)
+
+        def scan(block):
+            start, stop = block
+            if rows is None:
+                block_rows = start + np.flatnonzero(snapshot.live[start:stop])
+                if stop <= snapshot.base_rows:
+                    segment = snapshot.base[start:stop]
+                else:
+                    segment = snapshot.matrix[start - snapshot.base_rows:stop - snapshot.base_rows]
+                scores = (segment @ query_vector)[block_rows - start]
+            else:
+                block_rows = rows[start:stop]
+                scores = self._take_rows(block_rows, snapshot) @ query_vector
+            if block_rows.size > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                block_rows, scores = block_rows[top], scores[top]
+            return block_rows, scores
+
+        parts = list(self._search_pool.map(scan, blocks))
+        if not parts:
+            return []
+        merged_rows = np.concatenate([part[0] for part in parts])
+        merged_scores = np.concatenate([part[1] for part in parts])
+        return self._top_k(merged_rows, merged_scores, k, snapshot)
+
+    def search_batch(self, query_matrix: np.ndarray, k: int = 10,
+                     namespace_filter: Optional[List[str]] = None,
+                     nprobe: Optional[int] = None,
+                     date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                     metadata_filter: Optional[Dict[str, bool]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Search for the vectors most similar to each row of a query matrix
+
+        The flat scan scores every query with one matrix-matrix product per
+        block of queries. With the IVF index trained or quantization enabled
+        the candidate rows differ per query, so each query is searched in turn.
+
+        Args:
+            query_matrix: (num_queries, dimension) array of query vectors
+            k: Number of results per query
+            namespace_filter, nprobe, date_range, metadata_filter: As for search
+
+        Returns:
+            One list of (id, score) pairs per query, in query order
+        """
+        try:
+            snapshot = self._snapshot
+            queries = np.asarray(query_matrix, dtype=np.float32)
+            if queries.ndim == 1:
+                queries = queries.reshape(1, -1)
+            results: List[List[Tuple[str, float]]] = [[] for _ in range(queries.shape[0])]
+            if not snapshot.size or k <= 0 or not queries.shape[0]:
+                return results
+
+            norms = np.linalg.norm(queries, axis=1)
+            valid = np.flatnonzero(norms > 0)
+            if valid.size < queries.shape[0]:
+                logger.warning(f"{queries.shape[0] - valid.size} zero query vectors provided for batch search")
+            queries = queries[valid] / norms[valid, None]
+
+            if snapshot.ivf is not None or snapshot.quantizer is not None:
+                for i, query_vector in zip(valid, queries):
+                    results[i] = self.search(query_vector, k, namespace_filter, nprobe, date_range, metadata_filter)
+                return results
+
+            filtered = bool(namespace_filter or date_range or metadata_filter)
+            if namespace_filter:
+                rows = self._namespace_rows(namespace_filter, snapshot)
+            else:
+                rows = np.flatnonzero(snapshot.live[:snapshot.next_index])
+            rows = self._filter_attributes(rows, date_range, metadata_filter, snapshot)
+            vectors = self._take_rows(rows, snapshot) if filtered else None
+
+            # Bound the (queries, rows) score block held in memory at once
+            step = max(1, self.BATCH_SCORE_ELEMENTS // max(1, snapshot.next_index))
+            for start in range(0, valid.size, step):
+                block = queries[start:start + step]
+                scores = block @ vectors.T if filtered else self._score_all_batch(block, snapshot)[:, rows]
+                results_block = self._top_k_batch(rows, scores, k, snapshot)
+                for i, query_results in zip(valid[start:start + step], results_block):
+                    results[i] = query_results
+            return results
+
+        except Exception as e:
+            logger.error(f"Error batch searching vectors: {e}")
+            return [[] for _ in range(len(query_matrix))]
+
+    def search_range(self, query_vector: np.ndarray, threshold: float, max_results: int,
+                     namespace_filter: Optional[List[str]] = None,
+                     nprobe: Optional[int] = None,
+                     date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                     metadata_filter: Optional[Dict[str, bool]] = None) -> List[Tuple[str, float]]:
+        """
+        Search for every vector scoring at least threshold, best first
+
+        Rows are scored in blocks of RANGE_SCAN_ROWS. Once max_results hits
+        are held, the cut-off rises to the weakest of them, so later blocks
+        only keep rows that would make the final list.
+
+        Args:
+            query_vector: Query vector
+            threshold: Minimum cosine similarity of a result
+            max_results: Cap on the number of results
+            namespace_filter, nprobe, date_range, metadata_filter: As for search
+
+        Returns:
+            (id, score) pairs with score >= threshold, by descending score
+        """
+        try:
+            snapshot = self._snapshot
+            if not snapshot.size or max_results <= 0:
+                return []
+
+            query_vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+            query_norm = np.linalg.norm(query_vector)
+            if query_norm == 0:
+                logger.warning("Zero query vector provided for range search")
+                return []
+            query_vector = query_vector / query_norm
+
+            if snapshot.ivf is not None:
+                rows = snapshot.ivf.probe(query_vector, nprobe)
+                rows = self._filter_namespaces(rows[snapshot.live[rows]], namespace_filter, snapshot)
+            elif namespace_filter:
+                rows = self._namespace_rows(namespace_filter, snapshot)
+            else:
+                rows = np.flatnonzero(snapshot.live[:snapshot.next_index])
+            rows = self._filter_attributes(rows, date_range, metadata_filter, snapshot)
+
+            if snapshot.ivf is None and snapshot.quantizer is not None:
+                # The codes only give approximate scores, so the threshold is
+                # applied to the rescored shortlist
+                partial = bool(namespace_filter or date_range or metadata_filter)
+                results = self._search_quantized(query_vector, rows, max_results, snapshot, partial=partial)
+                return [(vector_id, score) for vector_id, score in results if score >= threshold]
+
+            return self._range_scan(query_vector, rows, threshold, max_results, snapshot)
+
+        except Exception as e:
+            logger.error(f"Error range searching vectors: {e}")
+            return []
+
+    def _range_scan(self, query_vector: np.ndarray, rows: np.ndarray, threshold: float,
+                    max_results: int, snapshot: _Snapshot) -> List[Tuple[str, float]]:
+        """Score rows block by block, keeping at most max_results rows above a rising cut-off"""
+        hit_rows = np.empty(0, dtype=np.int64)
+        hit_scores = np.empty(0, dtype=np.float32)
+        cutoff = np.float32(threshold)
+
+        for start in range(0, rows.size, self.RANGE_SCAN_ROWS):
+            block = rows[start:start + self.RANGE_SCAN_ROWS]
+            scores = self._take_rows(block, snapshot) @ query_vector
+            keep = scores >= cutoff
+            if not keep.any():
+                continue
+
+            hit_rows = np.concatenate([hit_rows, block[keep]])
+            hit_scores = np.concatenate([hit_scores, scores[keep]])
+            if hit_rows.size >= max_results:
+                top = np.argpartition(-hit_scores, max_results - 1)[:max_results]
+                hit_rows, hit_scores = hit_rows[top], hit_scores[top]
+                cutoff = hit_scores.min()
+
+        return self._top_k(hit_rows, hit_scores, max_results, snapshot)
+
+    def _search_quantized(self, query_vector: np.ndarray, rows: np.ndarray, k: int,
+                          snapshot: _Snapshot, partial: bool = False) -> List[Tuple[str, float]]:
+        """Scan the codes, then rescore the best candidates with the float32 rows
+
+        partial scores only the codes of the given rows instead of scanning all of them.
+        """
+        if partial:
+            approximate = snapshot.quantizer.score(snapshot.codes[rows], query_vector)
+        else:
+            approximate = snapshot.quantizer.score(snapshot.codes[:snapshot.next_index], query_vector)[rows]
+
+        rescore = self.config.quantization_rescore
+        if not rescore:
+            return self._top_k(rows, approximate, k, snapshot)
+
+        shortlist_size = min(rows.size, k * rescore)
+        if shortlist_size < rows.size:
+            rows = rows[np.argpartition(-approximate, shortlist_size - 1)[:shortlist_size]]
+        return self._top_k(rows, self._take_rows(rows, snapshot) @ query_vector, k, snapshot)
+
+    def evaluate_quantization(self, num_queries: int = 100, k: int = 10) -> Dict[str, Any]:
+        """Measure recall@k of the quantized search against exact search
+
+        Queries are sampled from the stored vectors. Returns the memory
+        statistics of the codes along with the mean recall.
+        """
+        snapshot = self._snapshot
+        if snapshot.quantizer is None:
+            return {'mode': 'none', 'recall_at_k': 1.0}
+
+        live_rows = np.flatnonzero(snapshot.live[:snapshot.next_index])
+        stats = snapshot.quantizer.memory_stats(snapshot.next_index, self.dimension or 0)
+        if live_rows.size == 0:
+            return {**stats, 'k': k, 'queries': 0, 'recall_at_k': 1.0}
+
+        rng = np.random.default_rng(0)
+        queries = rng.choice(live_rows, min(num_queries, live_rows.size), replace=False)
+        recall = []
+        for query_vector in self._take_rows(queries, snapshot):
+            exact_scores = self._score_all(query_vector, snapshot)[live_rows]
+            exact = {snapshot.ids[row] for row in self._top_rows(live_rows, exact_scores, k)}
+            approximate = {vector_id for vector_id, _ in self._search_quantized(query_vector, live_rows, k, snapshot)}
+            recall.append(len(exact & approximate) / len(exact))
+
+        return {**stats, 'k': k, 'queries': len(recall), 'recall_at_k': float(np.mean(recall))}
+
+    @staticmethod
+    def _top_rows(rows: np.ndarray, row_scores: np.ndarray, k: int) -> np.ndarray:
+        """The k best-scoring rows, unordered"""
+        if rows.size <= k:
+            return rows
+        return rows[np.argpartition(-row_scores, k - 1)[:k]]
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, row_scores: np.ndarray, k: int, snapshot: _Snapshot) -> List[Tuple[str, float]]:
+        """Select the k best-scoring rows, ordered by descending score"""
+        if rows.size == 0:
+            return []
+
+        if rows.size > k:
+            top = np.argpartition(-row_scores, k - 1)[:k]
+        else:
+            top = np.arange(rows.size)
+        top = top[np.argsort(-row_scores[top], kind='stable')]
+
+        return [(snapshot.ids[rows[i]], float(row_scores[i])) for i in top]
+
+    @staticmethod
+    def _top_k_batch(rows: np.ndarray, scores: np.ndarray, k: int,
+                     snapshot: _Snapshot) -> List[List[Tuple[str, float]]]:
+        """_top_k for each row of a (queries, rows) score matrix"""
+        if rows.size == 0:
+            return [[] for _ in range(scores.shape[0])]
+
+        if rows.size > k:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(rows.size), (scores.shape[0], rows.size))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top_ids = snapshot.ids[rows[np.take_along_axis(top, order, axis=1)]]
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [(vector_id, float(score)) for vector_id, score in zip(query_ids, query_scores)]
+            for query_ids, query_scores in zip(top_ids, top_scores)
+        ]
+
+    def get_vectors(self, vector_ids: List[str]) -> np.ndarray:
+        """Stored (normalized) vectors of the given ids, with zero rows for unknown ids"""
+        snapshot = self._snapshot
+        rows = np.array([self.id_to_index.get(vector_id, -1) for vector_id in vector_ids], dtype=np.int64)
+        # A row written after the snapshot was published isn't visible in it yet
+        found = (rows >= 0) & (rows < snapshot.next_index)
+        found[found] = snapshot.ids[rows[found]] == np.array(vector_ids, dtype=object)[found]
+
+        vectors = np.zeros((len(vector_ids), self.dimension or 0), dtype=np.float32)
+        vectors[found] = self._take_rows(rows[found], snapshot)
+        return vectors
+
+    def get_namespace_counts(self) -> Dict[str, int]:
+        """Number of stored vectors in each namespace partition"""
+        snapshot = self._snapshot
+        counts = np.bincount(
+            snapshot.row_namespace[:snapshot.next_index][snapshot.live[:snapshot.next_index]],
+            minlength=len(snapshot.partitions)
+        )
+        return {namespace: int(counts[code]) for namespace, code in snapshot.namespace_codes.items() if counts[code]}
+
     def get_stats(self) -> Dict[str, Any]:
         """Get vector store statistics"""
         return {
-            'total_vectors': len(self.vectors),
+            'total_vectors': len(self.id_to_index),
             'dimension': self.dimension,
+            'model_name': self.model_name,
             'index_path': self.config.index_path,
-            'id_map_path': self.config.id_map_path
+            'id_table_path': self.id_table_path,
+            'wal_enabled': self._wal is not None,
+            'wal_pending_records': self._wal.pending_records if self._wal else 0,
+            'wal_size_bytes': self._wal.size_bytes() if self._wal else 0,
+            'mmap_index': self.mmap_index,
+            'base_rows': self._base_rows,
+            'delta_rows': self.next_index - self._base_rows,
+            'namespaces': self.get_namespace_counts(),
+            'index_type': self.config.index_type,
+            'ivf': self._ivf.get_stats() if self._ivf else None,
+            'quantization': (self._quantizer.memory_stats(self.next_index, self.dimension or 0)
+                             if self._quantizer else None)
         }
-    
+
     def cleanup(self):
-        """Clean up resources"""
-        pass
\ No newline at end of file
+        """Checkpoint outstanding mutations and release file handles"""
+        with self._write_lock:
+            if self._search_pool is not None:
+                self._search_pool.shutdown(wait=False)
+                self._search_pool = None
+            if self._wal is not None:
+                if self._wal.pending_records:
+                    self.checkpoint()
+                self._wal.close()
@@ -0,0 +1,152 @@
+"""
+Append-only write-ahead log for the vector store
+
+Mutations are appended to the log as small binary records instead of
+rewriting the whole index snapshot on every change. The snapshot is only
+rewritten on checkpoint, after which the log is truncated.
+
+Record layout (little-endian):
+    op:uint8 | id_len:uint32 | dim:uint32 | crc32:uint32 | id bytes | dim 4-byte values
+
+Add records carry float32 vector values, attribute records carry int32
+(days_date ordinal, flag bits) pairs and remove records carry no values.
+
+The CRC covers the id bytes and vector payload, so a torn write at the tail
+of the log (e.g. a crash mid-batch) is detected and discarded on replay.
+"""
+
+import os
+import struct
+import zlib
+import logging
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorWriteAheadLog:
+    """Append-only log of vector store add/remove operations"""
+
+    OP_ADD = 1
+    OP_REMOVE = 2
+    OP_ATTRIBUTES = 3
+
+    _HEADER = struct.Struct('<BIII')
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+        self.pending_records = 0  # records appended since the last truncate
+
+    def _open(self):
+        """Open the log for appending, creating it if necessary"""
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    @classmethod
+    def _encode(cls, op: int, vector_id: str, vector: Optional[np.ndarray]) -> bytes:
+        """Encode a single record"""
+        id_bytes = vector_id.encode('utf-8')
+        if vector is None:
+            payload = b''
+        else:
+            dtype = '<i4' if op == cls.OP_ATTRIBUTES else '<f4'
+            payload = np.asarray(vector, dtype=dtype).tobytes()
+        dim = 0 if vector is None else len(payload) // 4
+        crc = zlib.crc32(payload, zlib.crc32(id_bytes))
+        return cls._HEADER.pack(op, len(id_bytes), dim, crc) + id_bytes + payload
+
+    def _write(self, data: bytes):
+        """Append raw bytes and make them durable"""
+        f = self._open()
+        f.write(data)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def append_adds(self, vector_ids: Sequence[str], vectors: np.ndarray,
+                    attributes: Optional[np.ndarray] = None):
+        """Append add records for a batch of vectors in a single write
+
+        attributes is an optional (len(vector_ids), 2) int32 array of
+        (days_date ordinal, flag bits), logged in the same write.
+        """
+        records = [
+            self._encode(self.OP_ADD, vector_id, vector)
+            for vector_id, vector in zip(vector_ids, vectors)
+        ]
+        if attributes is not None:
+            records.extend(
+                self._encode(self.OP_ATTRIBUTES, vector_id, values)
+                for vector_id, values in zip(vector_ids, attributes)
+            )
+        self._write(b''.join(records))
+        self.pending_records += len(records)
+
+    def append_removes(self, vector_ids: Sequence[str]):
+        """Append tombstone records for a batch of IDs in a single write"""
+        data = b''.join(self._encode(self.OP_REMOVE, vector_id, None) for vector_id in vector_ids)
+        self._write(data)
+        self.pending_records += len(vector_ids)
+
+    def replay(self) -> Iterator[Tuple[int, str, Optional[np.ndarray]]]:
+        """Yield (op, vector_id, vector) records, dropping any torn tail"""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        records = 0
+        header_size = self._HEADER.size
+        while offset + header_size <= len(data):
+            op, id_len, dim, crc = self._HEADER.unpack_from(data, offset)
+            body_start = offset + header_size
+            body_end = body_start + id_len + dim * 4
+            if op not in (self.OP_ADD, self.OP_REMOVE, self.OP_ATTRIBUTES) or body_end > len(data):
+                break
+
+            id_bytes = data[body_start:body_start + id_len]
+            payload = data[body_start + id_len:body_end]
+            if zlib.crc32(payload, zlib.crc32(id_bytes)) != crc:
+                break
+
+            if op == self.OP_ADD:
+                vector = np.frombuffer(payload, dtype='<f4').astype(np.float32)
+            elif op == self.OP_ATTRIBUTES:
+                vector = np.frombuffer(payload, dtype='<i4').astype(np.int32)
+            else:
+                vector = None
+            yield op, id_bytes.decode('utf-8'), vector
+            offset = body_end
+            records += 1
+
+        self.pending_records = records
+        if offset < len(data):
+            logger.warning(f"Discarding {len(data) - offset} bytes of incomplete records from {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+
+    def truncate(self):
+        """Discard all records (called once they are captured in a snapshot)"""
+        self.close()
+        with open(self.path, 'wb') as f:
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.pending_records = 0
+
+    def size_bytes(self) -> int:
+        """Current size of the log on disk"""
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def close(self):
+        """Close the underlying file handle"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
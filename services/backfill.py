@@ -0,0 +1,232 @@
+"""
+Bulk re-embedding of the whole corpus on a pool of worker processes
+
+Data items, then conversation segments, are streamed from SQLite in id-ordered
+pages. The parent process chunks each page and hands its texts to one of N
+spawned workers, each holding its own copy of the model with its torch threads
+pinned, so the workers encode in parallel without oversubscribing the CPUs.
+Encoded pages are written back in order through the batch vector store API
+and the cursor is stored after every page, so an interrupted backfill resumes
+where it stopped.
+
+After a model change the backfill fills the index being rebuilt (sharing its
+cursor with ``VectorIndexManager.rebuild``) and adopts it; otherwise every
+record is re-embedded into the serving index.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from config.models import AppConfig
+from core.database import DatabaseService
+from core.embeddings import EmbeddingCache, EmbeddingService, _encode_in_worker, _load_worker_model
+from core.ids import NamespacedIDManager
+from services.ingestion import remove_stale_chunks, vector_rows
+from services.vector_index import REBUILD_PROGRESS_SETTING, VectorIndexManager
+
+logger = logging.getLogger(__name__)
+
+# Database setting holding the cursor of a backfill into the serving index
+BACKFILL_PROGRESS_SETTING = "embedding_backfill"
+
+PHASES = ['items', 'segments']
+
+
+class _Page(NamedTuple):
+    """A page of records whose chunks are being encoded by a worker"""
+    phase: str
+    after_id: str
+    records: List[Dict[str, Any]]
+    chunked: List[List[str]]
+    vectors: Optional[asyncio.Future]
+
+
+class EmbeddingBackfill:
+    """Re-embeds every data item and segment with the configured model on worker processes"""
+
+    def __init__(self, config: AppConfig, database: DatabaseService,
+                 vector_store, embedding_service: EmbeddingService):
+        self.config = config
+        self.database = database
+        self.vector_store = vector_store
+        self.embedding_service = embedding_service
+        self.model_name = config.embeddings.model_name
+        self.status_updaters = {
+            'items': database.update_embedding_status_batch,
+            'segments': database.update_segment_embedding_status_batch
+        }
+        self.page_readers = {
+            'items': database.get_data_items_page,
+            'segments': database.get_segments_page
+        }
+
+    @property
+    def rebuilding(self) -> bool:
+        """Whether the backfill fills the index being rebuilt for a new model"""
+        return isinstance(self.vector_store, VectorIndexManager) and self.vector_store.needs_rebuild
+
+    @property
+    def progress_setting(self) -> str:
+        """Setting the cursor is stored in"""
+        return REBUILD_PROGRESS_SETTING if self.rebuilding else BACKFILL_PROGRESS_SETTING
+
+    def get_progress(self) -> Dict[str, Any]:
+        """Stored cursor of an unfinished backfill, empty when none is pending"""
+        return self.database.get_setting(self.progress_setting) or {}
+
+    async def run(self, workers: Optional[int] = None, page_size: Optional[int] = None,
+                  restart: bool = False) -> Dict[str, Any]:
+        """
+        Embed the whole corpus, resuming after the stored cursor
+
+        Args:
+            workers: Worker processes (defaults to backfill_workers)
+            page_size: Records read and encoded per task (defaults to backfill_page_size)
+            restart: Ignore the stored cursor and start from the first item
+
+        Returns:
+            Dictionary with the records and vectors written, the elapsed time and items per second
+        """
+        embedding_config = self.config.embeddings
+        workers = workers or embedding_config.backfill_workers
+        page_size = page_size or embedding_config.backfill_page_size
+        threads = embedding_config.backfill_threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+        if not self.embedding_service.is_initialized:
+            await self.embedding_service.initialize()
+        rebuilding = self.rebuilding
+        store = self.vector_store.write_store if isinstance(self.vector_store, VectorIndexManager) else self.vector_store
+
+        phase, after_id = 'items', None
+        progress = self.get_progress()
+        if not restart and progress.get('model_name') == self.model_name:
+            phase, after_id = progress.get('phase', 'items'), progress.get('after_id')
+            logger.info(f"Resuming {self.model_name} embedding backfill of {phase} after {after_id}")
+
+        result = {'model_name': self.model_name, 'rebuilt': rebuilding, 'workers': workers,
+                  'threads_per_worker': threads, 'items_embedded': 0, 'segments_embedded': 0,
+                  'vectors_written': 0, 'seconds': 0.0, 'items_per_second': 0.0}
+        logger.info(f"Starting {self.model_name} embedding backfill on {workers} workers "
+                    f"with {threads} threads each, {page_size} records per page")
+
+        started = time.perf_counter()
+        executor = self._create_executor(workers, threads)
+        # Two pages per worker keep every worker busy while the parent writes
+        in_flight: Deque[_Page] = deque()
+        try:
+            for current in PHASES[PHASES.index(phase):]:
+                cursor = after_id if current == phase else None
+                while True:
+                    page = self.page_readers[current](cursor, page_size)
+                    if not page:
+                        break
+                    cursor = page[-1]['id']
+                    in_flight.append(await self._submit(executor, current, cursor, page))
+                    if len(in_flight) >= workers * 2:
+                        await self._write(store, in_flight.popleft(), result, started, rebuilding)
+            while in_flight:
+                await self._write(store, in_flight.popleft(), result, started, rebuilding)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if rebuilding:
+            self.vector_store.complete_rebuild()
+        else:
+            if not store.checkpoint():
+                raise RuntimeError(f"Failed to checkpoint the {self.model_name} vector index")
+            self.database.set_setting(BACKFILL_PROGRESS_SETTING, {})
+
+        self._update_rate(result, started)
+        logger.info(f"Embedding backfill finished: {result['items_embedded']} items and "
+                    f"{result['segments_embedded']} segments in {result['seconds']:.1f}s "
+                    f"({result['items_per_second']:.1f} items/s)")
+        return result
+
+    def _create_executor(self, workers: int, threads: int) -> ProcessPoolExecutor:
+        """Spawned worker processes, each loading its own model pinned to the given threads"""
+        onnx_options = None
+        if self.embedding_service.onnx is not None:
+            onnx_options = {'cache_dir': self.config.embeddings.onnx_cache_dir,
+                            'quantize': self.config.embeddings.onnx_quantize, 'threads': threads}
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_load_worker_model,
+            initargs=(self.model_name, self.config.embeddings.device, onnx_options, threads)
+        )
+
+    async def _submit(self, executor: ProcessPoolExecutor, phase: str, after_id: str,
+                      page: List[Dict[str, Any]]) -> _Page:
+        """Chunk a page's content and start encoding its chunks on a worker"""
+        records = [record for record in page if record['content']]
+        chunked = await self.embedding_service.chunk_texts([record['content'] for record in records])
+        texts = [chunk for chunks in chunked for chunk in chunks]
+
+        vectors = None
+        if texts:
+            encode_kwargs = {'convert_to_numpy': True, 'normalize_embeddings': True,
+                             'batch_size': self.config.embeddings.batch_size, 'show_progress_bar': False}
+            vectors = asyncio.get_running_loop().run_in_executor(executor, _encode_in_worker, texts, encode_kwargs)
+        return _Page(phase, after_id, records, chunked, vectors)
+
+    async def _write(self, store, page: _Page, result: Dict[str, Any], started: float, rebuilding: bool):
+        """Store an encoded page's vectors, mark its records embedded and advance the cursor"""
+        vectors = np.asarray(await page.vectors, dtype=np.float32) if page.records else None
+        # Index, database and cache writes block, so they run off the event loop
+        vectors_written = await asyncio.to_thread(self._store_page, store, page, vectors, rebuilding)
+        result[f"{page.phase}_embedded"] += len(page.records)
+        result['vectors_written'] += vectors_written
+        self._update_rate(result, started)
+        logger.info(f"Embedding backfill: {result['items_embedded']} items, {result['segments_embedded']} "
+                    f"segments through {page.after_id} ({result['items_per_second']:.1f} items/s)")
+
+    def _store_page(self, store, page: _Page, vectors: Optional[np.ndarray], rebuilding: bool) -> int:
+        """Write a page's vectors, then its status, cache entries and cursor; returns the vectors written"""
+        vector_ids: List[str] = []
+        if page.records:
+            vector_ids, matrix, attributes = vector_rows(
+                page.records, page.chunked, vectors, self.config.embeddings.chunk_parent_vector
+            )
+            if not store.add_vectors(vector_ids, matrix, attributes):
+                raise RuntimeError(f"Failed to add {len(page.records)} vectors to the {self.model_name} index")
+
+            ids = [record['id'] for record in page.records]
+            if not rebuilding:
+                # Re-embedding in place may change how many chunks a record has
+                record_vector_ids: Dict[str, List[str]] = {record_id: [] for record_id in ids}
+                for vector_id in vector_ids:
+                    record_vector_ids[NamespacedIDManager.get_parent_id(vector_id)].append(vector_id)
+                for record_id, own_ids in record_vector_ids.items():
+                    remove_stale_chunks(store, record_id, own_ids)
+            self.status_updaters[page.phase](ids, 'completed')
+            self._cache_vectors(page.chunked, vectors)
+
+        # The cursor only moves past a page once its vectors are stored
+        self.database.set_setting(self.progress_setting,
+                                  {'model_name': self.model_name, 'phase': page.phase, 'after_id': page.after_id})
+        return len(vector_ids)
+
+    def _cache_vectors(self, chunked: List[List[str]], vectors: np.ndarray):
+        """Keep the new vectors in the embedding cache so unchanged content isn't encoded again"""
+        cache = self.embedding_service.cache
+        if cache is None:
+            return
+        texts = [chunk for chunks in chunked for chunk in chunks]
+        cache.put_many({EmbeddingCache.content_hash(text): vector for text, vector in zip(texts, vectors)},
+                       self.embedding_service.cache_model_key)
+
+    @staticmethod
+    def _update_rate(result: Dict[str, Any], started: float):
+        """Refresh the elapsed time and throughput, counting items and segments alike"""
+        seconds = time.perf_counter() - started
+        records = result['items_embedded'] + result['segments_embedded']
+        result['seconds'] = seconds
+        result['items_per_second'] = records / seconds if seconds else 0.0
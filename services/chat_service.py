@@ -6,12 +6,16 @@ for the minimal chat interface.
 """
 
 import logging
-from typing import Dict, Any, List, Optional
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 
 from core.database import DatabaseService
 from core.vector_store import VectorStoreService
 from core.embeddings import EmbeddingService
+from core.mmr import maximal_marginal_relevance
+from core.ids import NamespacedIDManager
+from services.vector_index import VectorIndexManager
 from llm.factory import create_llm_provider
 from llm.base import LLMResponse, LLMError
 from config.models import AppConfig
@@ -69,10 +73,15 @@ class ChatService:
         service_name="ChatService",
         default_return="I'm sorry, I encountered an error processing your message. Please try again."
     )
-    async def process_chat_message(self, user_message: str) -> str:
-        """Process a chat message and return assistant response"""
+    async def process_chat_message(self, user_message: str,
+                                   date_range: Optional[Tuple[Optional[str], Optional[str]]] = None) -> str:
+        """Process a chat message and return assistant response
+
+        date_range optionally restricts vector context to an inclusive
+        (start, end) pair of YYYY-MM-DD days_dates.
+        """
         # Step 1: Get relevant context data
-        context = await self._get_chat_context(user_message)
+        context = await self._get_chat_context(user_message, date_range=date_range)
         
         # Step 2: Generate LLM response with context
         response = await self._generate_response(user_message, context)
@@ -88,7 +97,8 @@ class ChatService:
         with safe_operation("store_error_message", log_errors=False):
             self.database.store_chat_message(user_message, error_msg)
     
-    async def _get_chat_context(self, query: str, max_results: int = 10) -> ChatContext:
+    async def _get_chat_context(self, query: str, max_results: int = 10,
+                                date_range: Optional[Tuple[Optional[str], Optional[str]]] = None) -> ChatContext:
         """Get relevant context using hybrid approach (vector + SQL)"""
         vector_results = []
         sql_results = []
@@ -96,7 +106,7 @@ class ChatService:
         try:
             # Vector search for semantic similarity
             if self.vector_store and self.embeddings:
-                vector_results = await self._vector_search(query, max_results // 2)
+                vector_results = await self._vector_search(query, max_results // 2, date_range=date_range)
         except Exception as e:
             logger.warning(f"Vector search failed: {e}")
         
@@ -112,25 +122,77 @@ class ChatService:
             total_results=len(vector_results) + len(sql_results)
         )
     
+    def _search_target(self) -> Tuple[Any, EmbeddingService]:
+        """The index to search and the embedding service its vectors came from
+
+        While the index is rebuilt for a new embedding model, searches keep
+        reading the old index with queries embedded by the old model.
+        """
+        if isinstance(self.vector_store, VectorIndexManager):
+            return self.vector_store.serving
+        return self.vector_store, self.embeddings
+
     @handle_service_exceptions(
         service_name="ChatService-VectorSearch",
         default_return=[]
     )
-    async def _vector_search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+    async def _vector_search(self, query: str, max_results: int,
+                             date_range: Optional[Tuple[Optional[str], Optional[str]]] = None) -> List[Dict[str, Any]]:
         """Perform vector similarity search"""
-        # Generate embedding for query
-        query_embedding = await self.embeddings.embed_text(query)
+        # Generate embedding for query with the model of the index being searched
+        vector_store, embeddings = self._search_target()
+        query_embedding = await embeddings.embed_text(query)
         
-        # Search vector store
-        similar_ids = self.vector_store.search(query_embedding, k=max_results)
+        # Range search, so items below the similarity threshold never reach the
+        # prompt; a date range is filtered inside the store before scoring
+        search_config = self.config.search
+        limit = min(max_results, search_config.max_top_k)
+        pool_size = max(limit, search_config.mmr_candidate_pool) if search_config.mmr_enabled else limit
+        similar_ids = vector_store.search_range(
+            query_embedding,
+            threshold=search_config.similarity_threshold,
+            max_results=pool_size,
+            date_range=date_range
+        )
+        # Chunks of a long item count once, through their best-scoring vector
+        similar_ids = self._best_per_item(similar_ids)
+        if len(similar_ids) > limit:
+            similar_ids = self._diversify(vector_store, query_embedding, similar_ids, limit)
         
-        # Get full data items from database
+        # Get full data items (or conversation segments) from database
         if similar_ids:
-            ids = [item_id for item_id, _ in similar_ids]
-            return self.database.get_data_items_by_ids(ids)
+            return self._fetch_records([NamespacedIDManager.get_parent_id(vector_id) for vector_id, _ in similar_ids])
         
         return []
-    
+
+    def _fetch_records(self, ids: List[str]) -> List[Dict[str, Any]]:
+        """Data items and conversation segments for search hits"""
+        segment_ids = [record_id for record_id in ids if NamespacedIDManager.is_segment_id(record_id)]
+        if not segment_ids:
+            return self.database.get_data_items_by_ids(ids)
+
+        segments = self.database.get_segments_by_ids(segment_ids)
+        # A conversation with matching segments is represented by those segments alone
+        covered = {segment['parent_id'] for segment in segments}
+        item_ids = [record_id for record_id in ids if record_id not in segment_ids and record_id not in covered]
+        records = {record['id']: record for record in segments + self.database.get_data_items_by_ids(item_ids)}
+        return [records[record_id] for record_id in ids if record_id in records]
+
+    @staticmethod
+    def _best_per_item(results: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        """Keep the best-scoring vector of each item among score-ordered results"""
+        best: Dict[str, Tuple[str, float]] = {}
+        for vector_id, score in results:
+            best.setdefault(NamespacedIDManager.get_parent_id(vector_id), (vector_id, score))
+        return list(best.values())
+
+    def _diversify(self, vector_store, query_embedding: np.ndarray,
+                   candidates: List[Tuple[str, float]], limit: int) -> List[Tuple[str, float]]:
+        """Rerank candidates with maximal marginal relevance, keeping limit of them"""
+        vectors = vector_store.get_vectors([item_id for item_id, _ in candidates])
+        order = maximal_marginal_relevance(query_embedding, vectors, limit, self.config.search.mmr_lambda)
+        return [candidates[i] for i in order]
+
     @handle_service_exceptions(
         service_name="ChatService-SQLSearch",
         default_return=[]
@@ -181,11 +243,16 @@ If the context doesn't contain relevant information to answer the question, plea
         if context.vector_results:
             context_parts.append("=== Relevant Information (Semantic Search) ===")
             for i, item in enumerate(context.vector_results[:5], 1):
-                content = item.get('content', '')[:500]  # Limit content length
-                context_parts.append(f"{i}. {content}")
+                if 'parent_id' in item:
+                    # Conversation segments are short enough to include whole
+                    context_parts.append(f"{i}. {self._segment_label(item)}{item.get('content', '')}")
+                else:
+                    content = item.get('content', '')[:500]  # Limit content length
+                    context_parts.append(f"{i}. {content}")
         
-        # Add SQL search results (avoiding duplicates)
-        vector_ids = {item.get('id') for item in context.vector_results}
+        # Add SQL search results (avoiding duplicates, including conversations
+        # represented by their segments)
+        vector_ids = {item.get('parent_id', item.get('id')) for item in context.vector_results}
         unique_sql_results = [
             item for item in context.sql_results 
             if item.get('id') not in vector_ids
@@ -202,6 +269,12 @@ If the context doesn't contain relevant information to answer the question, plea
         
         return "\n\n".join(context_parts)
     
+    @staticmethod
+    def _segment_label(segment: Dict[str, Any]) -> str:
+        """Time and speaker prefix for a conversation segment"""
+        parts = [part for part in (segment.get('start_time'), segment.get('speaker')) if part]
+        return f"[{' '.join(parts)}] " if parts else ""
+    
     def get_chat_history(self, limit: int = 20) -> List[Dict[str, Any]]:
         """Get recent chat history"""
         return self.database.get_chat_history(limit)
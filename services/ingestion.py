@@ -1,6 +1,7 @@
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional, AsyncIterator
+import numpy as np
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple, Callable
 from datetime import datetime, timezone
 
 from core.base_service import BaseService
@@ -17,6 +18,101 @@ from config.models import AppConfig
 logger = logging.getLogger(__name__)
 
 
+def vector_attributes(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-row vector store attributes that date and metadata filters are pushed down to"""
+    return {
+        'days_date': item.get('days_date'),
+        'is_starred': bool((item.get('metadata') or {}).get('is_starred'))
+    }
+
+
+def segment_records(parent_id: str, metadata: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Take the conversation segments out of an item's metadata as records to store"""
+    segmentation = (metadata or {}).get('segmentation') or {}
+    segments = segmentation.pop('segments', None) or []
+    return [
+        {
+            'id': NamespacedIDManager.create_segment_id(parent_id, segment['segment_index']),
+            'segment_index': segment['segment_index'],
+            'content': segment['content'],
+            'speaker': segment.get('speaker'),
+            'start_time': segment.get('start_time'),
+            'end_time': segment.get('end_time')
+        }
+        for segment in segments
+        if segment.get('content')
+    ]
+
+
+async def embed_items(embedding_service: EmbeddingService, items: List[Dict[str, Any]],
+                      parent_vectors: bool = True) -> Tuple[List[str], np.ndarray, List[Dict[str, Any]]]:
+    """
+    Embed items' content in one batched pass, returning vector store rows
+    
+    Content longer than the model's sequence length is split into chunks
+    stored as ``<item id>_chunk_<n>``; with parent_vectors the normalized mean
+    of an item's chunk vectors is also stored under the item id.
+    
+    Args:
+        embedding_service: Service that chunks and encodes the content
+        items: Data items with id, content and the fields of vector_attributes
+        parent_vectors: Whether chunked items also get a pooled vector
+        
+    Returns:
+        Tuple of vector ids, the vector matrix and per-row attributes
+    """
+    chunked = await embedding_service.chunk_texts([item['content'] for item in items])
+    vectors = np.vstack(await embedding_service.embed_texts([chunk for chunks in chunked for chunk in chunks]))
+    return vector_rows(items, chunked, vectors, parent_vectors)
+
+
+def vector_rows(items: List[Dict[str, Any]], chunked: List[List[str]], vectors: np.ndarray,
+                parent_vectors: bool = True) -> Tuple[List[str], np.ndarray, List[Dict[str, Any]]]:
+    """Vector store rows for items given their chunks and the chunk vectors, in order"""
+    ids, rows, attributes = [], [], []
+    offset = 0
+    for item, chunks in zip(items, chunked):
+        item_vectors = vectors[offset:offset + len(chunks)]
+        offset += len(chunks)
+        item_attributes = vector_attributes(item)
+        
+        if len(chunks) == 1:
+            ids.append(item['id'])
+            rows.append(item_vectors[0])
+            attributes.append(item_attributes)
+            continue
+        
+        for n, vector in enumerate(item_vectors):
+            ids.append(NamespacedIDManager.create_chunk_id(item['id'], n))
+            rows.append(vector)
+            attributes.append(item_attributes)
+        if parent_vectors:
+            parent = item_vectors.mean(axis=0)
+            ids.append(item['id'])
+            rows.append(parent / max(float(np.linalg.norm(parent)), 1e-12))
+            attributes.append(item_attributes)
+    
+    return ids, np.vstack(rows), attributes
+
+
+def remove_stale_chunks(vector_store, item_id: str, vector_ids: List[str], probe: int = 8) -> int:
+    """Remove an item's vectors left over from a previous embedding of different length"""
+    removed = 0
+    if item_id not in vector_ids:
+        removed += vector_store.remove_vectors([item_id])
+    
+    # Chunks are numbered contiguously, so probe past the current ones until a gap
+    start = sum(1 for vector_id in vector_ids if vector_id != item_id)
+    while True:
+        stale = vector_store.remove_vectors(
+            [NamespacedIDManager.create_chunk_id(item_id, n) for n in range(start, start + probe)]
+        )
+        removed += stale
+        if stale < probe:
+            return removed
+        start += probe
+
+
 class IngestionResult:
     """Result of an ingestion operation"""
     
@@ -159,6 +255,10 @@ class IngestionService(BaseService):
             # Extract days_date for calendar support
             days_date = self._extract_days_date(processed_item)
             
+            # Conversation segments are stored as their own searchable records
+            # rather than serialized into the item's metadata
+            segments = segment_records(namespaced_id, processed_item.metadata)
+            
             # Store in database
             self.database.store_data_item(
                 id=namespaced_id,
@@ -168,6 +268,8 @@ class IngestionService(BaseService):
                 metadata=processed_item.metadata,
                 days_date=days_date
             )
+            for segment_id in self.database.store_segments(namespaced_id, segments, days_date):
+                remove_stale_chunks(self.vector_store, segment_id, [])
             
             result.items_stored += 1
             logger.debug(f"Stored item: {namespaced_id}")
@@ -187,19 +289,24 @@ class IngestionService(BaseService):
         }
         
         try:
-            # Get items needing embeddings
+            # Get items and conversation segments needing embeddings
             pending_items = self.database.get_pending_embeddings(limit=batch_size * 2)
+            pending_segments = self.database.get_pending_segment_embeddings(limit=batch_size * 2)
             
-            if not pending_items:
+            if not pending_items and not pending_segments:
                 logger.info("No pending embeddings")
                 return result
             
-            logger.info(f"Processing {len(pending_items)} pending embeddings")
+            logger.info(f"Processing {len(pending_items)} pending item and "
+                        f"{len(pending_segments)} pending segment embeddings")
             
             # Process in batches
             for i in range(0, len(pending_items), batch_size):
                 batch = pending_items[i:i + batch_size]
                 await self._process_embedding_batch(batch, result)
+            for i in range(0, len(pending_segments), batch_size):
+                batch = pending_segments[i:i + batch_size]
+                await self._process_embedding_batch(batch, result, self.database.update_segment_embedding_status_batch)
         
         except Exception as e:
             error_msg = f"Error processing embeddings: {str(e)}"
@@ -208,8 +315,10 @@ class IngestionService(BaseService):
         
         return result
     
-    async def _process_embedding_batch(self, batch: List[Dict], result: Dict[str, Any]):
-        """Process a batch of items for embedding generation"""
+    async def _process_embedding_batch(self, batch: List[Dict], result: Dict[str, Any],
+                                       update_status: Optional[Callable[[List[str], str], None]] = None):
+        """Process a batch of items (or segments, with their status updater) for embedding generation"""
+        update_status = update_status or self.database.update_embedding_status_batch
         try:
             # Prepare content for embedding
             texts = []
@@ -223,31 +332,33 @@ class IngestionService(BaseService):
             if not texts:
                 return
             
-            # Generate embeddings
-            embeddings = await self.embedding_service.embed_texts(texts)
+            # Generate embeddings, chunking long content, in one batched pass
+            vector_ids, matrix, attributes = await embed_items(
+                self.embedding_service, items, self.config.embeddings.chunk_parent_vector
+            )
             
-            # Store embeddings and update status
-            for item, embedding in zip(items, embeddings):
-                try:
-                    # Add to vector store
-                    success = self.vector_store.add_vector(item['id'], embedding)
-                    
-                    if success:
-                        # Update embedding status
-                        self.database.update_embedding_status(item['id'], 'completed')
-                        result["successful"] += 1
-                        logger.debug(f"Generated embedding for: {item['id']}")
-                    else:
-                        self.database.update_embedding_status(item['id'], 'failed')
-                        result["failed"] += 1
-                        result["errors"].append(f"Failed to add vector for {item['id']}")
-                
-                except Exception as e:
-                    self.database.update_embedding_status(item['id'], 'failed')
-                    result["failed"] += 1
-                    result["errors"].append(f"Error processing {item['id']}: {str(e)}")
+            # Store the whole batch with a single vector store write, along with
+            # the attributes date and metadata filters are pushed down to
+            ids = [item['id'] for item in items]
+            success = self.vector_store.add_vectors(vector_ids, matrix, attributes)
+            
+            if success:
+                # Drop chunks (or a parent vector) from an earlier, different-length embedding
+                item_vector_ids: Dict[str, List[str]] = {item_id: [] for item_id in ids}
+                for vector_id in vector_ids:
+                    item_vector_ids[NamespacedIDManager.get_parent_id(vector_id)].append(vector_id)
+                for item_id, own_ids in item_vector_ids.items():
+                    remove_stale_chunks(self.vector_store, item_id, own_ids)
                 
-                result["processed"] += 1
+                update_status(ids, 'completed')
+                result["successful"] += len(ids)
+                logger.debug(f"Generated embeddings for {len(ids)} items")
+            else:
+                update_status(ids, 'failed')
+                result["failed"] += len(ids)
+                result["errors"].append(f"Failed to add vectors for batch of {len(ids)} items")
+            
+            result["processed"] += len(ids)
         
         except Exception as e:
             error_msg = f"Batch embedding failed: {str(e)}"
@@ -255,10 +366,9 @@ class IngestionService(BaseService):
             result["errors"].append(error_msg)
             
             # Mark all items in batch as failed
-            for item in batch:
-                self.database.update_embedding_status(item['id'], 'failed')
-                result["failed"] += 1
-                result["processed"] += 1
+            update_status([item['id'] for item in batch], 'failed')
+            result["failed"] += len(batch)
+            result["processed"] += len(batch)
     
     async def manual_ingest_item(self, 
                                 namespace: str,
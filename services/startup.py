@@ -12,7 +12,10 @@ from sources.news import NewsSource
 from sources.twitter import TwitterSource
 from core.database import DatabaseService
 from core.vector_store import VectorStoreService
+from core.hnsw_store import HNSWVectorStore
 from core.embeddings import EmbeddingService
+from services.vector_index import VectorIndexManager
+from services.backfill import EmbeddingBackfill
 from core.logging_config import setup_application_logging
 from config.models import AppConfig
 
@@ -25,12 +28,14 @@ class StartupService:
     def __init__(self, config: AppConfig):
         self.config = config
         self.database: Optional[DatabaseService] = None
-        self.vector_store: Optional[VectorStoreService] = None
+        self.vector_store: Optional[VectorIndexManager] = None
         self.embedding_service: Optional[EmbeddingService] = None
         self.ingestion_service: Optional[IngestionService] = None
         self.scheduler: Optional[AsyncScheduler] = None
         self.sync_manager: Optional[SyncManagerService] = None
         self.chat_service: Optional[ChatService] = None
+        self.backfill_task: Optional[asyncio.Task] = None
+        self.vector_rebuild_job_id: Optional[str] = None
         self.startup_complete = False
         self.logging_setup_result: Optional[Dict[str, Any]] = None
         
@@ -147,9 +152,12 @@ class StartupService:
             self.embedding_service = EmbeddingService(self.config.embeddings)
             startup_result["services_initialized"].append("embeddings")
             
-            # Vector store service
+            # Vector store service; the manager serves the index version that
+            # matches the embedding model, rebuilding it when the model changes
             logger.info("Initializing vector store service...")
-            self.vector_store = VectorStoreService(self.config.vector_store)
+            self.vector_store = VectorIndexManager(
+                self.config, self.database, self.embedding_service, self._open_vector_store
+            )
             startup_result["services_initialized"].append("vector_store")
             
             logger.info("Core services initialized successfully")
@@ -159,6 +167,12 @@ class StartupService:
             logger.error(error_msg)
             raise Exception(error_msg)
     
+    def _open_vector_store(self, store_config):
+        """Open the configured vector store backend over one index version"""
+        if store_config.index_type == "hnsw":
+            return HNSWVectorStore(store_config)
+        return VectorStoreService(store_config)
+    
     async def _initialize_ingestion_service(self, startup_result: Dict[str, Any]):
         """Initialize the ingestion service"""
         try:
@@ -293,6 +307,8 @@ class StartupService:
             )
             
             startup_result["services_initialized"].extend(["scheduler", "sync_manager"])
+            self._schedule_vector_compaction()
+            self._schedule_vector_rebuild()
             logger.info("Sync services initialized successfully")
             
         except Exception as e:
@@ -300,6 +316,49 @@ class StartupService:
             logger.error(error_msg)
             raise Exception(error_msg)
     
+    def _schedule_vector_compaction(self):
+        """Register the periodic vector store compaction job"""
+        interval_hours = self.config.vector_store.compaction_interval_hours
+        if not interval_hours or not self.vector_store:
+            return
+
+        async def compact_vector_store():
+            # Runs off the event loop (compact takes the store's write lock itself);
+            # the report (rows and bytes reclaimed) becomes the job's last_result
+            return await asyncio.to_thread(
+                self.vector_store.compact, self.config.vector_store.compaction_min_free_ratio
+            )
+
+        self.scheduler.add_job(
+            name="vector_store_compaction",
+            namespace="vector_store",
+            func=compact_vector_store,
+            interval_seconds=interval_hours * 3600,
+            max_retries=1,
+            timeout_seconds=self.config.scheduler.job_timeout_minutes * 60
+        )
+
+    def _schedule_vector_rebuild(self):
+        """Register the background rebuild of an index built with another embedding model"""
+        if not self.vector_store or not self.vector_store.needs_rebuild:
+            return
+
+        async def rebuild_vector_index():
+            if self.backfill_running:
+                # A bulk backfill is filling (and will adopt) the same index
+                return {'rebuilt': False, 'skipped': "embedding backfill running"}
+            # Resumes from the stored cursor if a previous run timed out
+            return await self.vector_store.rebuild()
+
+        self.vector_rebuild_job_id = self.scheduler.add_job(
+            name="vector_index_rebuild",
+            namespace="vector_store",
+            func=rebuild_vector_index,
+            interval_seconds=3600,
+            max_retries=1,
+            timeout_seconds=self.config.scheduler.job_timeout_minutes * 60
+        )
+
     async def _start_auto_sync(self, startup_result: Dict[str, Any]):
         """Start automatic synchronization"""
         try:
@@ -435,6 +494,10 @@ class StartupService:
             if self.chat_service:
                 await self.chat_service.close()
             
+            # Stop a running backfill; it resumes from its cursor next time
+            if self.backfill_running:
+                self.backfill_task.cancel()
+            
             # Close other services
             if self.vector_store:
                 self.vector_store.cleanup()
@@ -486,6 +549,59 @@ class StartupService:
             raise Exception("Ingestion service not initialized")
         
         return await self.ingestion_service.process_pending_embeddings(batch_size)
+    
+    @property
+    def backfill_running(self) -> bool:
+        """Whether a bulk embedding backfill is in progress"""
+        return self.backfill_task is not None and not self.backfill_task.done()
+    
+    @property
+    def vector_rebuild_running(self) -> bool:
+        """Whether the scheduled vector index rebuild job is in progress"""
+        if self.scheduler is None or self.vector_rebuild_job_id is None:
+            return False
+        task = self.scheduler.running_jobs.get(self.vector_rebuild_job_id)
+        return task is not None and not task.done()
+    
+    def start_embedding_backfill(self, workers: Optional[int] = None, page_size: Optional[int] = None,
+                                 restart: bool = False) -> asyncio.Task:
+        """Start re-embedding the whole corpus on worker processes in the background"""
+        if not self.vector_store or not self.embedding_service:
+            raise Exception("Vector store not initialized")
+        if self.backfill_running:
+            raise Exception("Embedding backfill already running")
+        if self.vector_rebuild_running:
+            # Both would fill the same index and store the same cursor
+            raise Exception("Vector index rebuild running; start the backfill once it finishes")
+        
+        backfill = EmbeddingBackfill(self.config, self.database, self.vector_store, self.embedding_service)
+        self.backfill_task = asyncio.create_task(backfill.run(workers, page_size, restart))
+        self.backfill_task.add_done_callback(self._log_backfill_failure)
+        return self.backfill_task
+    
+    @staticmethod
+    def _log_backfill_failure(task: asyncio.Task):
+        """Log why a backfill stopped; its cursor lets the next run resume"""
+        if task.cancelled():
+            logger.info("Embedding backfill cancelled")
+        elif task.exception():
+            logger.error(f"Embedding backfill failed: {task.exception()}")
+    
+    def get_embedding_backfill_status(self) -> Dict[str, Any]:
+        """State of the bulk embedding backfill: running, stored cursor and last result"""
+        if not self.vector_store or not self.embedding_service:
+            raise Exception("Vector store not initialized")
+        
+        backfill = EmbeddingBackfill(self.config, self.database, self.vector_store, self.embedding_service)
+        status = {"running": self.backfill_running, "progress": backfill.get_progress(),
+                  "result": None, "error": None}
+        task = self.backfill_task
+        if task is not None and task.done() and not task.cancelled():
+            if task.exception():
+                status["error"] = str(task.exception())
+            else:
+                status["result"] = task.result()
+        return status
 
 
 # Global startup service instance
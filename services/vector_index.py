@@ -0,0 +1,266 @@
+"""
+Vector index versioning tied to the embedding model
+
+Every index records the embedding model (and dimension) its vectors came
+from. When ``EmbeddingConfig.model_name`` changes, the old index keeps
+serving searches, with queries embedded by the old model, while a second
+index for the new model is backfilled from the database in the background.
+Once the backfill completes the new index is adopted with a single swap.
+"""
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from config.models import AppConfig, VectorStoreConfig
+from core.database import DatabaseService
+from core.embeddings import EmbeddingService
+from services.ingestion import embed_items
+
+logger = logging.getLogger(__name__)
+
+# Database settings holding the paths of the serving index and the backfill cursor
+ACTIVE_INDEX_SETTING = "vector_index_active"
+REBUILD_PROGRESS_SETTING = "vector_index_rebuild"
+
+
+class ServingIndex(NamedTuple):
+    """The index searches read and the embedding service its vectors came from"""
+    store: Any
+    embeddings: EmbeddingService
+
+
+class VectorIndexManager:
+    """Vector store facade that serves one index version while the next is built
+
+    Searches and statistics go to the serving index. While a rebuild is
+    pending, new vectors (embedded with the configured model) are written to
+    the index being built, and removals go to both.
+    """
+
+    def __init__(self, config: AppConfig, database: DatabaseService,
+                 embedding_service: EmbeddingService,
+                 open_store: Callable[[VectorStoreConfig], Any]):
+        self.config = config
+        self.database = database
+        self.embedding_service = embedding_service
+        self.open_store = open_store
+        self.model_name = config.embeddings.model_name
+        self.dimension = embedding_service.dimension
+
+        self.serving: Optional[ServingIndex] = None
+        self._building = None
+        self._load()
+
+    def _store_config(self, paths: Dict[str, str]) -> VectorStoreConfig:
+        """Vector store configuration pointing at an index version"""
+        return self.config.vector_store.model_copy(update={
+            'index_path': paths['index_path'],
+            'id_map_path': paths['id_map_path'],
+            'dimension': paths.get('dimension', self.config.vector_store.dimension)
+        })
+
+    def _version_paths(self, model_name: str) -> Dict[str, Any]:
+        """Index paths for a model, next to the configured ones"""
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', model_name)
+        paths = {}
+        for key in ('index_path', 'id_map_path'):
+            root, dot, extension = getattr(self.config.vector_store, key).rpartition('.')
+            paths[key] = f"{root}.{slug}.{extension}" if dot else f"{extension}.{slug}"
+        return {**paths, 'model_name': model_name, 'dimension': self.dimension}
+
+    def _load(self):
+        """Open the serving index and, when it belongs to another model, the next version"""
+        active = self.database.get_setting(ACTIVE_INDEX_SETTING)
+        store = self.open_store(self._store_config(active) if active else self.config.vector_store)
+
+        if store.model_name is None:
+            if not store.get_stats()['total_vectors']:
+                # A new index
+                store.model_name = self.model_name
+            elif self.config.vector_store.unversioned_index_model:
+                # Written before the model was recorded; a matching dimension
+                # alone doesn't tell which model, so only trust the setting, and
+                # record it so the setting is no longer needed
+                store.model_name = self.config.vector_store.unversioned_index_model
+                store.checkpoint()
+
+        if store.model_name == self.model_name:
+            self.serving = ServingIndex(store, self.embedding_service)
+            return
+
+        self._building = self._open_version()
+        if store.model_name is None:
+            # Queries can't be embedded for an index of unknown origin, so the
+            # new index serves as it fills
+            logger.warning(f"Vector index of dimension {store.dimension} has no recorded model; "
+                           f"serving the {self.model_name} index while it is rebuilt "
+                           f"(set VECTOR_UNVERSIONED_INDEX_MODEL to name the model it was built with)")
+            store.cleanup()
+            self.serving = ServingIndex(self._building, self.embedding_service)
+            return
+
+        logger.warning(f"Vector index was built with {store.model_name}, not {self.model_name}; "
+                       f"serving it until the {self.model_name} index is rebuilt")
+        legacy_config = self.config.embeddings.model_copy(update={'model_name': store.model_name})
+        self.serving = ServingIndex(store, EmbeddingService(legacy_config))
+
+    def _open_version(self):
+        """Open (or resume) the index for the configured model"""
+        store = self.open_store(self._store_config(self._version_paths(self.model_name)))
+        store.model_name = self.model_name
+        return store
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """Whether the serving index belongs to a different embedding model"""
+        return self._building is not None
+
+    @property
+    def write_store(self):
+        """Index that new vectors, embedded with the configured model, belong in"""
+        return self._building if self._building is not None else self.serving.store
+
+    async def rebuild(self, batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Backfill the index for the configured model and adopt it
+
+        Items, then conversation segments, are embedded page by page in id
+        order. The cursor is stored after every page, so an interrupted
+        rebuild resumes where it stopped.
+
+        Args:
+            batch_size: Items embedded per page (defaults to the embedding batch size)
+
+        Returns:
+            Dictionary with the number of items and segments embedded and whether the index was adopted
+        """
+        building = self._building
+        if building is None:
+            return {'rebuilt': False, 'model_name': self.serving.store.model_name,
+                    'items_embedded': 0, 'segments_embedded': 0}
+
+        batch_size = batch_size or self.config.embeddings.batch_size
+        phases = [('items', self.database.get_data_items_page), ('segments', self.database.get_segments_page)]
+        progress = self.database.get_setting(REBUILD_PROGRESS_SETTING) or {}
+        resume_phase, resume_after = 'items', None
+        if progress.get('model_name') == self.model_name and building.get_stats()['total_vectors']:
+            resume_phase, resume_after = progress.get('phase', 'items'), progress.get('after_id')
+            logger.info(f"Resuming {self.model_name} vector index rebuild of {resume_phase} after {resume_after}")
+
+        embedded = {'items': 0, 'segments': 0}
+        phase_names = [name for name, _ in phases]
+        for phase, get_page in phases[phase_names.index(resume_phase):]:
+            after_id = resume_after if phase == resume_phase else None
+            while True:
+                page = get_page(after_id, batch_size)
+                if not page:
+                    break
+                after_id = page[-1]['id']
+
+                records = [record for record in page if record['content']]
+                if records:
+                    vector_ids, vectors, attributes = await embed_items(
+                        self.embedding_service, records, self.config.embeddings.chunk_parent_vector
+                    )
+                    if not building.add_vectors(vector_ids, vectors, attributes):
+                        raise RuntimeError(f"Failed to add {len(records)} vectors to the {self.model_name} index")
+                    embedded[phase] += len(records)
+                self.database.set_setting(REBUILD_PROGRESS_SETTING,
+                                          {'model_name': self.model_name, 'phase': phase, 'after_id': after_id})
+
+        self._adopt(building)
+        return {'rebuilt': True, 'model_name': self.model_name,
+                'items_embedded': embedded['items'], 'segments_embedded': embedded['segments']}
+
+    def complete_rebuild(self):
+        """Adopt the index for the configured model once every record has been written to it"""
+        if self._building is not None:
+            self._adopt(self._building)
+
+    def _adopt(self, building):
+        """Make a fully built index the serving one"""
+        if not building.checkpoint():
+            raise RuntimeError(f"Failed to checkpoint the {self.model_name} vector index")
+        self.database.set_setting(ACTIVE_INDEX_SETTING, self._version_paths(self.model_name))
+        self.database.set_setting(REBUILD_PROGRESS_SETTING, {})
+
+        retired, retired_embeddings = self.serving
+        # Searches pick up the new index and its query embedder together
+        self.serving = ServingIndex(building, self.embedding_service)
+        self._building = None
+        if retired_embeddings is not self.embedding_service:
+            # Release the old model and its encode executor
+            retired_embeddings.cleanup()
+        if retired is not building:
+            retired.cleanup()
+            logger.info(f"Adopted the {self.model_name} vector index; the {retired.model_name} index "
+                        f"at {retired.config.index_path} is no longer used")
+
+    def add_vector(self, vector_id: str, vector: np.ndarray,
+                   attributes: Optional[Dict[str, Any]] = None) -> bool:
+        """Add a vector embedded with the configured model"""
+        return self.write_store.add_vector(vector_id, vector, attributes)
+
+    def add_vectors(self, vector_ids: List[str], vectors: np.ndarray,
+                    attributes: Optional[List[Optional[Dict[str, Any]]]] = None) -> bool:
+        """Add vectors embedded with the configured model"""
+        return self.write_store.add_vectors(vector_ids, vectors, attributes)
+
+    def remove_vector(self, vector_id: str) -> bool:
+        """Remove a vector from every open index"""
+        return self.remove_vectors([vector_id]) > 0
+
+    def remove_vectors(self, vector_ids: List[str]) -> int:
+        """Remove vectors from every open index"""
+        removed = self.serving.store.remove_vectors(vector_ids)
+        if self._building is not None:
+            removed = max(removed, self._building.remove_vectors(vector_ids))
+        return removed
+
+    def search(self, query_vector: np.ndarray, k: int = 10, *args, **kwargs) -> List[Tuple[str, float]]:
+        """Search the serving index"""
+        return self.serving.store.search(query_vector, k, *args, **kwargs)
+
+    def search_batch(self, query_matrix: np.ndarray, k: int = 10, *args, **kwargs) -> List[List[Tuple[str, float]]]:
+        """Batch search the serving index"""
+        return self.serving.store.search_batch(query_matrix, k, *args, **kwargs)
+
+    def search_range(self, query_vector: np.ndarray, threshold: float, max_results: int,
+                     *args, **kwargs) -> List[Tuple[str, float]]:
+        """Range search the serving index"""
+        return self.serving.store.search_range(query_vector, threshold, max_results, *args, **kwargs)
+
+    def get_vectors(self, vector_ids: List[str]) -> np.ndarray:
+        """Stored vectors of the given ids in the serving index"""
+        return self.serving.store.get_vectors(vector_ids)
+
+    def checkpoint(self) -> bool:
+        """Checkpoint every open index"""
+        success = self.serving.store.checkpoint()
+        if self._building is not None:
+            success = self._building.checkpoint() and success
+        return success
+
+    def compact(self, min_free_ratio: float = 0.0) -> Dict[str, Any]:
+        """Compact the serving index"""
+        return self.serving.store.compact(min_free_ratio)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistics of the serving index, with the rebuild state"""
+        stats = self.serving.store.get_stats()
+        stats['rebuild'] = None
+        if self._building is not None:
+            stats['rebuild'] = {
+                'model_name': self.model_name,
+                'total_vectors': self._building.get_stats()['total_vectors']
+            }
+        return stats
+
+    def cleanup(self):
+        """Checkpoint and close every open index"""
+        self.serving.store.cleanup()
+        if self._building is not None and self._building is not self.serving.store:
+            self._building.cleanup()
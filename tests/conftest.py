@@ -0,0 +1,32 @@
+"""
+Shared fixtures for the test suite
+"""
+
+import pytest
+import numpy as np
+from unittest.mock import AsyncMock, Mock
+
+
+def encode_lengths(texts, **kwargs):
+    """Stand-in for model.encode whose vectors hold each text's character count"""
+    return np.array([[float(len(text))] * 384 for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def make_embedding_service():
+    """Factory for an initialized EmbeddingService over a mock model
+
+    Keyword arguments override EmbeddingConfig fields; model replaces the
+    default Mock and encode becomes its encode side effect.
+    """
+    from core.embeddings import EmbeddingService
+    from config.models import EmbeddingConfig
+
+    def make(model=None, encode=encode_lengths, **config):
+        service = EmbeddingService(EmbeddingConfig(**config))
+        service.model = model if model is not None else Mock()
+        service.model.encode.side_effect = encode
+        service.initialize = AsyncMock(return_value=True)
+        return service
+
+    return make
@@ -0,0 +1,186 @@
+"""
+Tests for the process-pool bulk embedding backfill
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from config.models import AppConfig, DatabaseConfig, EmbeddingConfig, VectorStoreConfig
+from core.database import DatabaseService
+from core.embeddings import EmbeddingService
+from core.vector_store import VectorStoreService
+from services.backfill import BACKFILL_PROGRESS_SETTING, EmbeddingBackfill
+from services.startup import StartupService
+from services.vector_index import ACTIVE_INDEX_SETTING, VectorIndexManager
+
+
+@pytest.fixture
+def temp_dir():
+    """Create temporary directory for the model, database and index files"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def model_path(temp_dir):
+    """Small randomly initialized BERT sentence-transformer saved where spawned workers can load it"""
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+
+    bert_dir = os.path.join(temp_dir, "tiny-bert")
+    os.makedirs(bert_dir)
+    letters = list("abcdefghijklmnopqrstuvwxyz")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + letters + [f"##{letter}" for letter in letters]
+    with open(os.path.join(bert_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(vocab))
+    BertTokenizerFast(os.path.join(bert_dir, "vocab.txt")).save_pretrained(bert_dir)
+    BertModel(BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2,
+                         num_attention_heads=2, intermediate_size=64)).save_pretrained(bert_dir)
+
+    transformer = models.Transformer(bert_dir)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    model_dir = os.path.join(temp_dir, "tiny-sentence-model")
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu").save(model_dir)
+    return model_dir
+
+
+def make_config(temp_dir, model_name, dimension=32):
+    """Application config with small backfill pages and short chunks"""
+    return AppConfig(
+        database=DatabaseConfig(path=os.path.join(temp_dir, "lifeboard.db")),
+        embeddings=EmbeddingConfig(model_name=model_name, batch_size=4, chunk_max_tokens=16,
+                                   chunk_overlap_tokens=4, backfill_workers=2, backfill_page_size=2),
+        vector_store=VectorStoreConfig(
+            index_path=os.path.join(temp_dir, "vector_index.faiss"),
+            id_map_path=os.path.join(temp_dir, "vector_ids.json"),
+            dimension=dimension
+        )
+    )
+
+
+@pytest.fixture
+def config(temp_dir, model_path):
+    """Config for the tiny model"""
+    return make_config(temp_dir, model_path)
+
+
+@pytest.fixture
+def database(config):
+    """Database with short items, a long item, an empty item and two segments"""
+    db = DatabaseService(config.database.path)
+    for source_id, content in [("a", "alpha beta"), ("b", "gamma delta"), ("c", "epsilon"),
+                               ("d", " ".join(["lorem ipsum dolor"] * 8)), ("e", "")]:
+        db.store_data_item(f"test:{source_id}", "test", source_id, content, days_date="2024-01-15")
+    db.store_segments("test:a", [
+        {'id': "test:a_segment_0", 'segment_index': 0, 'content': "alpha"},
+        {'id': "test:a_segment_1", 'segment_index': 1, 'content': "beta"}
+    ], days_date="2024-01-15")
+    return db
+
+
+@pytest_asyncio.fixture
+async def embedding_service(config):
+    """Embedding service over the tiny model, loaded in the test process"""
+    service = EmbeddingService(config.embeddings)
+    await service.initialize()
+    return service
+
+
+class TestEmbeddingBackfill:
+    """Test suite for EmbeddingBackfill"""
+
+    @pytest.mark.asyncio
+    async def test_backfill_embeds_corpus(self, config, database, embedding_service):
+        """Test that worker-encoded vectors for every record reach the store and statuses complete"""
+        store = VectorStoreService(config.vector_store)
+        writer_threads = set()
+        add_vectors = store.add_vectors
+
+        def add_vectors_on_thread(*args):
+            writer_threads.add(threading.get_ident())
+            return add_vectors(*args)
+
+        store.add_vectors = add_vectors_on_thread
+        result = await EmbeddingBackfill(config, database, store, embedding_service).run()
+
+        # Pages are written off the event loop
+        assert writer_threads and threading.get_ident() not in writer_threads
+        assert result['items_embedded'] == 4
+        assert result['segments_embedded'] == 2
+        assert result['workers'] == 2
+        assert result['items_per_second'] > 0
+        long_ids = {vector_id for vector_id in store.id_to_index if vector_id.startswith("test:d_chunk_")}
+        assert len(long_ids) > 1
+        assert set(store.id_to_index) == {"test:a", "test:b", "test:c", "test:d",
+                                          "test:a_segment_0", "test:a_segment_1"} | long_ids
+        assert result['vectors_written'] == len(store.id_to_index)
+
+        # Workers produce the same vectors as the model in this process
+        expected = np.vstack(await embedding_service.embed_texts(["gamma delta", "beta"]))
+        assert np.allclose(store.get_vectors(["test:b", "test:a_segment_1"]), expected, atol=1e-5)
+
+        # Items without content are left pending, as in ingestion
+        assert [item['id'] for item in database.get_pending_embeddings()] == ["test:e"]
+        assert database.get_pending_segment_embeddings() == []
+        assert database.get_setting(BACKFILL_PROGRESS_SETTING) == {}
+        store.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_backfill_resumes_after_cursor(self, config, database, embedding_service):
+        """Test that a backfill continues after the last written page"""
+        database.set_setting(BACKFILL_PROGRESS_SETTING,
+                             {'model_name': config.embeddings.model_name, 'phase': 'items', 'after_id': "test:b"})
+        store = VectorStoreService(config.vector_store)
+        result = await EmbeddingBackfill(config, database, store, embedding_service).run(workers=1)
+
+        assert result['items_embedded'] == 2
+        assert result['segments_embedded'] == 2
+        assert "test:c" in store.id_to_index
+        assert "test:a" not in store.id_to_index
+        assert [item['id'] for item in database.get_pending_embeddings()] == ["test:a", "test:b", "test:e"]
+        store.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_backfill_adopts_rebuilt_index(self, temp_dir, model_path, database, embedding_service):
+        """Test that after a model change the backfill fills and adopts the new model's index"""
+        old = VectorIndexManager(make_config(temp_dir, "old-model"), database,
+                                 EmbeddingService(EmbeddingConfig(model_name="old-model")), VectorStoreService)
+        old.add_vectors(["test:a"], np.ones((1, 32), dtype=np.float32))
+        old.cleanup()
+
+        config = make_config(temp_dir, model_path)
+        manager = VectorIndexManager(config, database, embedding_service, VectorStoreService)
+        assert manager.needs_rebuild
+        result = await EmbeddingBackfill(config, database, manager, embedding_service).run()
+
+        assert result['rebuilt'] is True
+        assert not manager.needs_rebuild
+        assert manager.serving.store.model_name == model_path
+        assert "test:a_segment_0" in manager.serving.store.id_to_index
+        assert database.get_setting(ACTIVE_INDEX_SETTING)['model_name'] == model_path
+        manager.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_backfill_refused_while_rebuild_runs(self, temp_dir):
+        """Test that a backfill isn't started while the scheduled index rebuild is running"""
+        startup = StartupService(make_config(temp_dir, "new-model"))
+        startup.vector_store, startup.embedding_service = Mock(), Mock()
+        startup.scheduler = Mock(running_jobs={})
+        startup.vector_rebuild_job_id = "rebuild"
+
+        rebuild = asyncio.create_task(asyncio.sleep(10))
+        startup.scheduler.running_jobs["rebuild"] = rebuild
+        with pytest.raises(Exception, match="rebuild running"):
+            startup.start_embedding_backfill()
+
+        rebuild.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await rebuild
+        assert not startup.vector_rebuild_running
@@ -63,9 +63,9 @@ class TestChatIntegration:
         """Mock vector store service"""
         vector_store = Mock()
         # Return items in order of relevance (higher scores first)
-        vector_store.search = Mock(return_value=[
-            (1, 0.85),  # High similarity
-            (2, 0.73)   # Lower similarity
+        vector_store.search_range = Mock(return_value=[
+            ("test:test-1", 0.85),  # High similarity
+            ("test:test-2", 0.73)   # Lower similarity
         ])
         return vector_store
 
@@ -104,8 +104,8 @@ class TestChatIntegration:
         response = await chat_service.process_chat_message(query)
         
         # Verify embedding was generated and used for vector search
-        assert mock_vector_store.search.called
-        query_embedding = mock_vector_store.search.call_args[0][0]
+        assert mock_vector_store.search_range.called
+        query_embedding = mock_vector_store.search_range.call_args[0][0]
         
         # Verify embedding has correct dimensions (384 for MiniLM)
         assert len(query_embedding) == 384
@@ -161,7 +161,7 @@ class TestChatIntegration:
     async def test_error_handling_with_real_service(self, chat_service, mock_vector_store):
         """Test error handling when vector search fails"""
         # Make vector search fail
-        mock_vector_store.search.side_effect = Exception("Vector search error")
+        mock_vector_store.search_range.side_effect = Exception("Vector search error")
         
         # Should still work with SQL fallback
         response = await chat_service.process_chat_message("test query")
@@ -34,6 +34,7 @@ class TestChatService:
         """Mock vector store service"""
         mock_vs = Mock(spec=VectorStoreService)
         mock_vs.search = Mock(return_value=[])
+        mock_vs.search_range = Mock(return_value=[])
         return mock_vs
     
     @pytest.fixture
@@ -107,7 +108,7 @@ class TestChatService:
     async def test_vector_search(self, chat_service):
         """Test vector search functionality"""
         # Setup mock data
-        chat_service.vector_store.search.return_value = [("id1", 0.9), ("id2", 0.8)]
+        chat_service.vector_store.search_range.return_value = [("id1", 0.9), ("id2", 0.8)]
         chat_service.database.get_data_items_by_ids.return_value = [
             {"id": "id1", "content": "Test content 1"},
             {"id": "id2", "content": "Test content 2"}
@@ -116,10 +117,18 @@ class TestChatService:
         results = await chat_service._vector_search("test query", 5)
         
         chat_service.embeddings.embed_text.assert_called_once_with("test query")
-        chat_service.vector_store.search.assert_called_once_with([0.1, 0.2, 0.3], k=5)
+        chat_service.vector_store.search_range.assert_called_once_with(
+            [0.1, 0.2, 0.3], threshold=0.5, max_results=5, date_range=None
+        )
         chat_service.database.get_data_items_by_ids.assert_called_once_with(["id1", "id2"])
         assert len(results) == 2
     
+    def test_chunk_hits_count_once_per_item(self):
+        """Test that chunk vectors collapse to their item's best-scoring hit"""
+        results = [("news:1_chunk_2", 0.9), ("news:2", 0.8), ("news:1", 0.7), ("news:1_chunk_0", 0.6)]
+        
+        assert ChatService._best_per_item(results) == [("news:1_chunk_2", 0.9), ("news:2", 0.8)]
+    
     @pytest.mark.asyncio
     async def test_vector_search_error_handling(self, chat_service):
         """Test vector search error handling"""
@@ -182,7 +191,7 @@ class TestChatService:
                 assert len(context.sql_results) == 1
                 assert context.total_results == 2
                 
-                mock_vector.assert_called_once_with("test query", 5)
+                mock_vector.assert_called_once_with("test query", 5, date_range=None)
                 mock_sql.assert_called_once_with("test query", 5)
     
     def test_build_context_text(self, chat_service):
@@ -290,11 +299,32 @@ class TestChatService:
             response = await chat_service.process_chat_message("Test question")
             
             assert response == "Test assistant response"
+            mock_context.assert_called_once_with("Test question", date_range=None)
             chat_service.database.store_chat_message.assert_called_once_with(
                 "Test question", 
                 "Test assistant response"
             )
     
+    @pytest.mark.asyncio
+    async def test_process_chat_message_date_range(self, chat_service):
+        """Test that a chat date range reaches the vector search"""
+        mock_provider = AsyncMock()
+        mock_provider.generate_response.return_value = LLMResponse.create(
+            content="Scoped response",
+            model="test-model",
+            provider="test"
+        )
+        chat_service.llm_provider = mock_provider
+        
+        with patch.object(chat_service, '_vector_search') as mock_vector:
+            with patch.object(chat_service, '_sql_search') as mock_sql:
+                mock_vector.return_value = []
+                mock_sql.return_value = []
+                
+                await chat_service.process_chat_message("What happened?", date_range=("2024-01-01", "2024-01-07"))
+                
+                mock_vector.assert_called_once_with("What happened?", 5, date_range=("2024-01-01", "2024-01-07"))
+    
     @pytest.mark.asyncio
     async def test_process_chat_message_error(self, chat_service):
         """Test chat message processing with error"""
@@ -6,6 +6,7 @@ import pytest
 import numpy as np
 import tempfile
 import asyncio
+import time
 from unittest.mock import Mock, patch
 from core.embeddings import EmbeddingService
 from config.models import EmbeddingConfig
@@ -255,4 +256,275 @@ class TestEmbeddingIntegration:
         # Test dimension lookup
         for model_name in supported_models:
             dim = service.get_model_dimension(model_name)
-            assert dim > 0
\ No newline at end of file
+            assert dim > 0
+
+class TestEmbeddingCache:
+    """Test suite for the content-hash embedding cache"""
+    
+    @pytest.fixture
+    def cache_path(self):
+        """Path of a cache database in a temporary directory"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            yield f"{tmpdir}/embedding_cache.db"
+    
+    @pytest.mark.asyncio
+    async def test_encodes_only_misses(self, cache_path, make_embedding_service):
+        """Test that cached and repeated texts are not re-encoded"""
+        service = make_embedding_service(cache_path=cache_path)
+        
+        first = await service.embed_texts(["a", "bb", "a"])
+        service.model.encode.assert_called_once()
+        assert service.model.encode.call_args[0][0] == ["a", "bb"]
+        assert [r[0] for r in first] == [1.0, 2.0, 1.0]
+        
+        second = await service.embed_texts(["bb", "ccc", ""])
+        assert service.model.encode.call_args[0][0] == ["ccc"]
+        assert [r[0] for r in second] == [2.0, 3.0, 0.0]
+        assert service.cache.hits == 1
+        assert service.cache.hit_rate == pytest.approx(1 / 5)
+        assert service.get_model_info()["cache"]["entries"] == 3
+    
+    @pytest.mark.asyncio
+    async def test_persists_per_model(self, cache_path, make_embedding_service):
+        """Test that vectors survive a restart and are keyed by model name"""
+        await make_embedding_service(cache_path=cache_path).embed_texts(["a", "bb"])
+        
+        reopened = make_embedding_service(cache_path=cache_path)
+        results = await reopened.embed_texts(["a", "bb"])
+        reopened.model.encode.assert_not_called()
+        assert [r[0] for r in results] == [1.0, 2.0]
+        assert reopened.cache.hit_rate == 1.0
+        
+        other_model = make_embedding_service(cache_path=cache_path, model_name="all-MiniLM-L12-v2")
+        await other_model.embed_texts(["a"])
+        other_model.model.encode.assert_called_once()
+    
+    def test_key_follows_encoding_backend(self):
+        """Test that ONNX and int8 vectors are cached apart from PyTorch vectors"""
+        service = EmbeddingService(EmbeddingConfig(backend="onnx", onnx_quantize=True))
+        # Falls back to PyTorch until the ONNX session is loaded
+        assert service.cache_model_key == "all-MiniLM-L6-v2"
+        service.onnx = Mock()
+        assert service.cache_model_key == "all-MiniLM-L6-v2:onnx-int8"
+        
+        float_service = EmbeddingService(EmbeddingConfig(backend="onnx", onnx_quantize=False))
+        float_service.onnx = Mock()
+        assert float_service.cache_model_key == "all-MiniLM-L6-v2:onnx"
+    
+    def test_cache_disabled_by_default(self):
+        """Test that no cache is opened without a cache path"""
+        assert EmbeddingService(EmbeddingConfig()).cache is None
+
+
+class TestEmbeddingExecutor:
+    """Test suite for encoding off the event loop"""
+    
+    @staticmethod
+    def blocking_encode(stats, delay=0.2):
+        """Encoder that blocks its thread, tracking how many encodes overlap in stats"""
+        def encode(texts, **kwargs):
+            stats['in_flight'] += 1
+            stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+            time.sleep(delay)
+            stats['in_flight'] -= 1
+            return np.ones((len(texts), 384), dtype=np.float32)
+        
+        return encode
+    
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive(self, make_embedding_service):
+        """Test that other coroutines run while a batch is encoding"""
+        stats = {'in_flight': 0, 'max_in_flight': 0}
+        service = make_embedding_service(encode=self.blocking_encode(stats))
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        
+        task = asyncio.create_task(ticker())
+        results = await service.embed_texts(["a", "b"])
+        task.cancel()
+        
+        assert len(results) == 2
+        assert ticks >= 5
+        assert service.get_model_info()["encode_executor"] == "thread"
+    
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, make_embedding_service):
+        """Test that no more than encode_workers batches encode at once"""
+        stats = {'in_flight': 0, 'max_in_flight': 0}
+        service = make_embedding_service(encode=self.blocking_encode(stats, delay=0.05), encode_workers=2)
+        
+        results = await asyncio.gather(*(service.embed_texts([f"text {i}"]) for i in range(6)))
+        
+        assert len(results) == 6
+        assert stats['max_in_flight'] == 2
+    
+    def test_invalid_executor(self):
+        """Test that unknown executor kinds are rejected"""
+        with pytest.raises(ValueError):
+            EmbeddingConfig(encode_executor="fiber")
+
+
+class TestMicroBatching:
+    """Test suite for micro-batching concurrent embed_text calls"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_encode(self, make_embedding_service):
+        """Test that concurrent single texts are encoded in one call"""
+        service = make_embedding_service(micro_batch_wait_ms=20)
+        
+        results = await asyncio.gather(*(service.embed_text(text) for text in ["a", "bb", "ccc", "a"]))
+        
+        service.model.encode.assert_called_once()
+        assert service.model.encode.call_args[0][0] == ["a", "bb", "ccc"]
+        assert [r[0] for r in results] == [1.0, 2.0, 3.0, 1.0]
+        assert all(r.shape == (384,) for r in results)
+        assert service.get_model_info()["micro_batching"]["average_size"] == 4.0
+    
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_without_waiting(self, make_embedding_service):
+        """Test that a batch is encoded as soon as it reaches the max size"""
+        service = make_embedding_service(micro_batch_wait_ms=10000, micro_batch_max_size=2)
+        
+        results = await asyncio.wait_for(
+            asyncio.gather(*(service.embed_text(text) for text in ["a", "bb", "ccc", "dddd"])), timeout=5
+        )
+        
+        assert service.model.encode.call_count == 2
+        assert [r[0] for r in results] == [1.0, 2.0, 3.0, 4.0]
+    
+    @pytest.mark.asyncio
+    async def test_disabled_encodes_each_text(self, make_embedding_service):
+        """Test that a zero wait encodes every text on its own"""
+        service = make_embedding_service(micro_batch_wait_ms=0)
+        service.model.encode.side_effect = lambda text, **kwargs: np.full(384, float(len(text)), dtype=np.float32)
+        
+        results = await asyncio.gather(service.embed_text("a"), service.embed_text("bb"))
+        
+        assert service.model.encode.call_count == 2
+        assert [r[0] for r in results] == [1.0, 2.0]
+    
+    @pytest.mark.asyncio
+    async def test_batch_failure_returns_zero_vectors(self, make_embedding_service):
+        """Test that every caller of a failed batch gets a zero vector"""
+        service = make_embedding_service()
+        service.model.encode.side_effect = RuntimeError("model crashed")
+        
+        results = await asyncio.gather(service.embed_text("a"), service.embed_text("bb"))
+        
+        assert all(not r.any() and r.shape == (384,) for r in results)
+
+
+class TestLengthBucketing:
+    """Test suite for length-bucketed batching in embed_texts"""
+    
+    @staticmethod
+    def encode_words(texts, **kwargs):
+        """Stand-in encoder whose vectors hold each text's word count"""
+        return np.array([[float(len(text.split()))] * 384 for text in texts], dtype=np.float32)
+    
+    def test_plan_batches_fits_budget(self, make_embedding_service):
+        """Test that sorted batches keep their padded size within the budget"""
+        # A model without a tokenizer, so tokens are counted as words
+        service = make_embedding_service(model=Mock(spec=["encode"]), encode=self.encode_words,
+                                         batch_size=4, token_budget=100)
+        lengths = [50, 5, 10, 50, 5, 90]
+        
+        batches = service._plan_batches(lengths)
+        
+        assert sorted(i for batch in batches for i in batch) == list(range(6))
+        assert batches[0] == [1, 4, 2]
+        assert all(len(batch) * max(lengths[i] for i in batch) <= 100 for batch in batches)
+    
+    @pytest.mark.asyncio
+    async def test_original_order_restored(self, make_embedding_service):
+        """Test that vectors come back in input order after bucketing"""
+        # A model without a tokenizer, so tokens are counted as words
+        service = make_embedding_service(model=Mock(spec=["encode"]), encode=self.encode_words,
+                                         batch_size=4, token_budget=200)
+        texts = ["word " * 120, "short", "word " * 30, "two words", "word " * 120]
+        
+        results = await service.embed_texts(texts)
+        
+        assert [r[0] for r in results] == [120.0, 1.0, 30.0, 2.0, 120.0]
+        assert service.model.encode.call_count == 3
+        assert service.model.encode.call_args_list[0][0][0] == [texts[1], texts[3], texts[2]]
+        
+        stats = service.get_throughput_stats()
+        assert stats["texts"] == 5
+        assert stats["padding_efficiency"] > stats["arrival_order_padding_efficiency"]
+    
+    @pytest.mark.asyncio
+    async def test_zero_budget_uses_one_encode(self, make_embedding_service):
+        """Test that a zero token budget encodes in arrival order"""
+        # A model without a tokenizer, so tokens are counted as words
+        service = make_embedding_service(model=Mock(spec=["encode"]), encode=self.encode_words,
+                                         batch_size=4, token_budget=0)
+        
+        results = await service.embed_texts(["word " * 120, "short"])
+        
+        service.model.encode.assert_called_once()
+        assert [r[0] for r in results] == [120.0, 1.0]
+
+
+class TestChunking:
+    """Test suite for token-aware chunking of long texts"""
+    
+    @pytest.fixture
+    def tokenizer(self):
+        """Fast WordPiece tokenizer over a small vocabulary"""
+        from transformers import BertTokenizerFast
+        with tempfile.TemporaryDirectory() as tmpdir:
+            vocab_path = f"{tmpdir}/vocab.txt"
+            with open(vocab_path, "w") as f:
+                f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + [f"w{i}" for i in range(50)]))
+            yield BertTokenizerFast(vocab_path)
+    
+    @staticmethod
+    def short_model(*attributes):
+        """Mock model with a 12-token sequence length"""
+        model = Mock(spec=["encode", "max_seq_length", *attributes])
+        model.max_seq_length = 12
+        return model
+    
+    @pytest.mark.asyncio
+    async def test_long_text_split_into_overlapping_windows(self, tokenizer, make_embedding_service):
+        """Test that windows fit the sequence length and overlap by the configured tokens"""
+        model = self.short_model("tokenizer")
+        model.tokenizer = tokenizer
+        service = make_embedding_service(model=model, chunk_overlap_tokens=4)
+        long_text = " ".join(f"w{i}" for i in range(40))
+        
+        chunked = await service.chunk_texts(["w1 w2", long_text])
+        
+        assert chunked[0] == ["w1 w2"]
+        chunks = chunked[1]
+        assert len(chunks) == 6
+        assert chunks[0] == " ".join(f"w{i}" for i in range(10))
+        assert chunks[1] == " ".join(f"w{i}" for i in range(6, 16))
+        assert chunks[-1] == " ".join(f"w{i}" for i in range(30, 40))
+    
+    @pytest.mark.asyncio
+    async def test_word_windows_without_tokenizer(self, make_embedding_service):
+        """Test that words stand in for tokens when the model has no tokenizer"""
+        service = make_embedding_service(model=self.short_model(), chunk_overlap_tokens=4)
+        words = [f"word{i}" for i in range(20)]
+        
+        chunks = (await service.chunk_texts([" ".join(words)]))[0]
+        
+        # Ten tokens per window, about seven words
+        assert chunks[0] == " ".join(words[:7])
+        assert chunks[1] == " ".join(words[4:11])
+        assert chunks[-1].endswith("word19")
+    
+    @pytest.mark.asyncio
+    async def test_chunking_disabled(self, make_embedding_service):
+        """Test that disabled chunking keeps every text whole"""
+        service = make_embedding_service(model=self.short_model(), chunking_enabled=False)
+        long_text = " ".join(f"word{i}" for i in range(100))
+        
+        assert await service.chunk_texts([long_text]) == [[long_text]]
@@ -0,0 +1,214 @@
+"""
+Tests for the HNSW graph vector store backend
+"""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from config.models import VectorStoreConfig
+from core.hnsw_store import HNSWVectorStore
+
+
+@pytest.fixture
+def temp_dir():
+    """Create temporary directory for index files"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def hnsw_config(temp_dir):
+    """Create HNSW vector store configuration pointing at the temp directory"""
+    return VectorStoreConfig(
+        index_path=os.path.join(temp_dir, "vector_index.faiss"),
+        id_map_path=os.path.join(temp_dir, "vector_ids.json"),
+        dimension=16,
+        index_type="hnsw",
+        hnsw_m=8,
+        hnsw_ef_construction=64,
+        hnsw_ef_search=32
+    )
+
+
+@pytest.fixture
+def vectors():
+    """Reproducible random vectors"""
+    return np.random.default_rng(0).standard_normal((1000, 16)).astype(np.float32)
+
+
+@pytest.fixture
+def hnsw_store(hnsw_config, vectors):
+    """HNSW store holding 1000 random vectors"""
+    store = HNSWVectorStore(hnsw_config)
+    store.add_vectors([f"limitless:{i}" for i in range(len(vectors))], vectors)
+    yield store
+    store.cleanup()
+
+
+def exact_top_k(vectors, query, k):
+    """Reference cosine top-k over raw vectors, as row numbers"""
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k])
+
+
+class TestHNSWVectorStore:
+    """Test suite for HNSWVectorStore"""
+
+    def test_recall_against_exact_search(self, hnsw_store, vectors):
+        """Test that the graph search finds nearly all true neighbours"""
+        queries = np.random.default_rng(1).standard_normal((20, 16)).astype(np.float32)
+        recall = []
+        for query in queries:
+            expected = {f"limitless:{row}" for row in exact_top_k(vectors, query, 10)}
+            results = hnsw_store.search(query, k=10)
+            assert len(results) == 10
+            assert results[0][1] >= results[-1][1]
+            recall.append(len(expected & {r[0] for r in results}) / 10)
+
+        assert np.mean(recall) >= 0.95
+
+    def test_empty_store(self, hnsw_config):
+        """Test searching an empty store"""
+        store = HNSWVectorStore(hnsw_config)
+        assert store.search(np.ones(16, dtype=np.float32), k=5) == []
+
+    def test_removed_vectors_are_tombstoned(self, hnsw_store, vectors):
+        """Test that removed vectors are never returned but stay in the graph"""
+        assert hnsw_store.remove_vector("limitless:0")
+        assert not hnsw_store.remove_vector("limitless:0")
+
+        results = hnsw_store.search(vectors[0], k=5)
+        assert "limitless:0" not in [r[0] for r in results]
+        assert len(results) == 5
+        assert hnsw_store.get_stats()['hnsw']['tombstones'] == 1
+
+    def test_update_replaces_vector(self, hnsw_store, vectors):
+        """Test that re-adding an id makes the new vector the one that is found"""
+        hnsw_store.add_vector("limitless:0", vectors[1])
+
+        results = hnsw_store.search(vectors[1], k=2)
+        assert {r[0] for r in results} == {"limitless:0", "limitless:1"}
+        assert hnsw_store.get_stats()['total_vectors'] == 1000
+
+    def test_namespace_filter(self, hnsw_config, vectors):
+        """Test that filtering still returns k results from the requested namespace"""
+        store = HNSWVectorStore(hnsw_config)
+        ids = [f"{'news' if i % 10 == 0 else 'limitless'}:{i}" for i in range(len(vectors))]
+        store.add_vectors(ids, vectors)
+
+        results = store.search(vectors[5], k=5, namespace_filter=["news"])
+        assert len(results) == 5
+        assert all(r[0].startswith("news:") for r in results)
+
+    def test_date_and_metadata_filters(self, hnsw_config, vectors):
+        """Test that date-range and metadata predicates restrict the results"""
+        store = HNSWVectorStore(hnsw_config)
+        attributes = [{'days_date': f"2024-01-{i % 28 + 1:02d}", 'is_starred': i % 2 == 0}
+                      for i in range(len(vectors))]
+        store.add_vectors([f"limitless:{i}" for i in range(len(vectors))], vectors, attributes)
+
+        results = store.search(vectors[0], k=5, date_range=("2024-01-01", "2024-01-01"),
+                               metadata_filter={'is_starred': True})
+        assert len(results) == 5
+        assert results[0][0] == "limitless:0"
+        for vector_id, _ in results:
+            i = int(vector_id.split(':')[1])
+            assert i % 28 == 0 and i % 2 == 0
+
+    def test_selective_filter_scans_matching_nodes(self, hnsw_config, vectors):
+        """Test that a filter matching few nodes is answered exactly without walking the graph"""
+        store = HNSWVectorStore(hnsw_config)
+        attributes = [{'days_date': "2024-02-01" if i % 100 == 7 else "2024-01-01"} for i in range(len(vectors))]
+        store.add_vectors([f"limitless:{i}" for i in range(len(vectors))], vectors, attributes)
+
+        with patch.object(store, '_search_layer', wraps=store._search_layer) as mock_search_layer:
+            results = store.search(vectors[0], k=20, date_range=("2024-02-01", None))
+        mock_search_layer.assert_not_called()
+
+        matching = np.arange(7, 1000, 100)
+        expected = [f"limitless:{matching[row]}" for row in exact_top_k(vectors[matching], vectors[0], 20)]
+        assert [r[0] for r in results] == expected
+
+    def test_search_reads_published_graph_during_writes(self, hnsw_store, vectors):
+        """Test that searches neither wait for nor see a write that is in progress"""
+        hnsw_store.remove_vectors(["limitless:0"])
+        before = hnsw_store.search(vectors[0], k=5)
+        seen = []
+        insert = HNSWVectorStore._insert
+
+        def insert_and_search(store, node):
+            insert(store, node)
+            # Search from another thread while this one holds the write lock
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                seen.append(executor.submit(store.search, vectors[0], 5).result(timeout=5))
+
+        with patch.object(HNSWVectorStore, '_insert', insert_and_search):
+            hnsw_store.add_vectors(["limitless:new"], vectors[:1])
+
+        assert seen == [before]
+        assert "limitless:0" not in [r[0] for r in before]
+        assert hnsw_store.search(vectors[0], k=5)[0][0] == "limitless:new"
+
+    def test_graph_loads_without_rebuilding(self, hnsw_store, hnsw_config, vectors):
+        """Test that a reloaded store reads the persisted graph instead of re-inserting"""
+        hnsw_store.remove_vector("limitless:3")
+        assert hnsw_store.checkpoint()
+
+        with patch.object(HNSWVectorStore, '_insert') as mock_insert:
+            reloaded = HNSWVectorStore(hnsw_config)
+        mock_insert.assert_not_called()
+
+        assert reloaded.id_to_index == hnsw_store.id_to_index
+        assert reloaded.search(vectors[7], k=10) == hnsw_store.search(vectors[7], k=10)
+
+    def test_log_replay_after_checkpoint(self, hnsw_store, hnsw_config, vectors):
+        """Test that mutations since the last checkpoint are replayed from the log"""
+        hnsw_store.checkpoint()
+        hnsw_store.add_vector("news:new", vectors[0] + 1.0)
+        hnsw_store.remove_vector("limitless:9")
+        hnsw_store._wal.close()
+
+        reloaded = HNSWVectorStore(hnsw_config)
+        assert "news:new" in reloaded.id_to_index
+        assert "limitless:9" not in reloaded.id_to_index
+        assert reloaded.search(vectors[0] + 1.0, k=1)[0][0] == "news:new"
+
+    def test_checkpoint_rebuilds_when_mostly_tombstones(self, hnsw_store, vectors):
+        """Test that tombstones are dropped once they outnumber live nodes"""
+        hnsw_store.remove_vectors([f"limitless:{i}" for i in range(600)])
+        assert hnsw_store.checkpoint()
+
+        stats = hnsw_store.get_stats()['hnsw']
+        assert stats['tombstones'] == 0
+        assert stats['nodes'] == 400
+        assert hnsw_store.search(vectors[700], k=1)[0][0] == "limitless:700"
+
+    def test_compaction_drops_tombstones(self, hnsw_store, hnsw_config, vectors):
+        """Test that compact rebuilds the graph even below the checkpoint threshold"""
+        hnsw_store.remove_vectors([f"limitless:{i}" for i in range(200)])
+        assert hnsw_store.compact(min_free_ratio=0.5)['compacted'] is False
+
+        report = hnsw_store.compact()
+        assert report['compacted']
+        assert report['rows_reclaimed'] == 200
+        assert hnsw_store.get_stats()['hnsw']['tombstones'] == 0
+        assert hnsw_store.search(vectors[500], k=1)[0][0] == "limitless:500"
+
+    def test_range_search_applies_threshold(self, hnsw_store, vectors):
+        """Test that range search drops hits below the threshold"""
+        results = hnsw_store.search_range(vectors[0], threshold=0.5, max_results=50)
+        assert results[0][0] == "limitless:0"
+        assert all(score >= 0.5 for _, score in results)
+        assert len(results) < 50
+        assert hnsw_store.search_range(vectors[0], threshold=1.01, max_results=50) == []
+
+    def test_index_type_selects_backend(self):
+        """Test that hnsw is an accepted backend and unknown ones are rejected"""
+        assert VectorStoreConfig(index_type="hnsw").index_type == "hnsw"
+        with pytest.raises(ValueError):
+            VectorStoreConfig(index_type="annoy")
@@ -5,6 +5,7 @@ Integration tests for end-to-end Limitless sync flow
 import pytest
 import tempfile
 import os
+import numpy as np
 from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime, timezone
 
@@ -62,6 +63,7 @@ def mock_embedding_service():
     import numpy as np
     service.embed_text.return_value = np.random.rand(384).astype(np.float32)
     service.embed_texts.return_value = [np.random.rand(384).astype(np.float32) for _ in range(3)]
+    service.chunk_texts.side_effect = lambda texts: [[text] for text in texts]
     service.get_model_info.return_value = {"status": "mock", "dimension": 384}
     
     return service
@@ -259,6 +261,33 @@ class TestIngestionService:
                 pi['id'] for pi in ingestion_service.database.get_pending_embeddings()
             ]
 
+    @pytest.mark.asyncio
+    async def test_long_content_embedded_as_chunks(self, ingestion_service, mock_embedding_service):
+        """Test that chunks and a pooled parent are stored, and stale chunks dropped on re-embedding"""
+        mock_embedding_service.chunk_texts.side_effect = lambda texts: [text.split(" | ") for text in texts]
+        mock_embedding_service.embed_texts.side_effect = lambda texts: list(np.eye(len(texts), 384, dtype=np.float32))
+        await ingestion_service.manual_ingest_item(
+            namespace="test", content="first part | second part | third part", source_id="long"
+        )
+        
+        result = await ingestion_service.process_pending_embeddings()
+        
+        assert result["successful"] == 1
+        mock_embedding_service.embed_texts.assert_called_once_with(["first part", "second part", "third part"])
+        vector_store = ingestion_service.vector_store
+        assert set(vector_store.id_to_index) == {
+            "test:long", "test:long_chunk_0", "test:long_chunk_1", "test:long_chunk_2"
+        }
+        parent = vector_store.get_vectors(["test:long"])[0]
+        assert np.allclose(parent[:3], 1 / np.sqrt(3))
+        
+        # Re-ingested content that now fits in one chunk replaces the chunk vectors
+        await ingestion_service.manual_ingest_item(namespace="test", content="now short", source_id="long")
+        result = await ingestion_service.process_pending_embeddings()
+        
+        assert result["successful"] == 1
+        assert set(vector_store.id_to_index) == {"test:long"}
+
 
 class TestLimitlessIntegration:
     """Test end-to-end Limitless integration"""
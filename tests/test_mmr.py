@@ -0,0 +1,58 @@
+"""
+Tests for maximal marginal relevance reranking
+"""
+
+import numpy as np
+
+from core.mmr import maximal_marginal_relevance
+
+
+def reference_mmr(query, candidates, k, lambda_mult):
+    """Pairwise MMR over normalized vectors, one candidate at a time"""
+    candidates = [c / np.linalg.norm(c) for c in candidates]
+    query = query / np.linalg.norm(query)
+    selected = []
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            redundancy = max((float(candidate @ candidates[j]) for j in selected), default=0.0)
+            score = lambda_mult * float(candidate @ query) - (1 - lambda_mult) * redundancy
+            if not selected:
+                score = float(candidate @ query)
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+class TestMaximalMarginalRelevance:
+    """Test suite for maximal_marginal_relevance"""
+
+    def test_skips_near_duplicates(self):
+        """Test that a near-copy of the best match loses to a different relevant vector"""
+        query = np.array([1.0, 0.2, 0.0], dtype=np.float32)
+        candidates = np.array([
+            [1.0, 0.0, 0.0],
+            [1.0, 0.01, 0.0],
+            [0.6, 0.8, 0.0],
+        ], dtype=np.float32)
+
+        assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=0.5) == [1, 2]
+        assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=1.0) == [1, 0]
+
+    def test_matches_pairwise_reference(self):
+        """Test that the vectorized selection equals the pairwise loop"""
+        rng = np.random.default_rng(0)
+        for lambda_mult in (0.0, 0.3, 0.7):
+            query = rng.standard_normal(16).astype(np.float32)
+            candidates = rng.standard_normal((40, 16)).astype(np.float32)
+            assert (maximal_marginal_relevance(query, candidates, 10, lambda_mult) ==
+                    reference_mmr(query, candidates, 10, lambda_mult))
+
+    def test_k_bounds(self):
+        """Test that k is capped at the candidate count and k=0 selects nothing"""
+        candidates = np.eye(3, dtype=np.float32)
+        assert sorted(maximal_marginal_relevance(np.ones(3), candidates, 10)) == [0, 1, 2]
+        assert maximal_marginal_relevance(np.ones(3), candidates, 0) == []
@@ -0,0 +1,110 @@
+"""
+Tests for the ONNX Runtime embedding backend
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+
+from config.models import EmbeddingConfig
+from core.embeddings import EmbeddingService
+from core.onnx_embedder import cosine_agreement, mean_pool
+
+
+@pytest.fixture
+def temp_dir():
+    """Create temporary directory for the model and ONNX artifacts"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def tiny_model(temp_dir):
+    """Small randomly initialized BERT sentence-transformer built without downloads"""
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+
+    model_dir = os.path.join(temp_dir, "tiny-bert")
+    os.makedirs(model_dir)
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list("abcdefghijklmnopqrstuvwxyz")
+    with open(os.path.join(model_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(vocab))
+    BertTokenizerFast(os.path.join(model_dir, "vocab.txt")).save_pretrained(model_dir)
+    BertModel(BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2,
+                         num_attention_heads=2, intermediate_size=64)).save_pretrained(model_dir)
+
+    transformer = models.Transformer(model_dir)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension())
+    return SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu")
+
+
+class TestPooling:
+    """Test suite for the NumPy pooling and agreement helpers"""
+
+    def test_mean_pool_ignores_padding(self):
+        """Test that padded positions don't contribute to the mean"""
+        tokens = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+        pooled = mean_pool(tokens, np.array([[1, 1, 0]]), normalize=False)
+        assert pooled.tolist() == [[2.0, 0.0]]
+        assert np.allclose(mean_pool(tokens, np.array([[1, 1, 0]])), [[1.0, 0.0]])
+
+    def test_cosine_agreement(self):
+        """Test mean and minimum row-wise cosine"""
+        reference = np.array([[1.0, 0.0], [0.0, 2.0]])
+        candidate = np.array([[2.0, 0.0], [1.0, 1.0]])
+        agreement = cosine_agreement(reference, candidate)
+        assert agreement['min'] == pytest.approx(np.sqrt(0.5))
+        assert agreement['mean'] == pytest.approx((1 + np.sqrt(0.5)) / 2)
+
+
+class TestOnnxEmbedder:
+    """Test suite for OnnxEmbedder against the PyTorch pipeline"""
+
+    @pytest.mark.parametrize("quantize", [False, True])
+    def test_matches_pytorch(self, tiny_model, temp_dir, quantize):
+        """Test that ONNX vectors agree with the PyTorch vectors and the artifact is reused"""
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+        from core.onnx_embedder import OnnxEmbedder
+
+        cache_dir = os.path.join(temp_dir, "onnx")
+        embedder = OnnxEmbedder(tiny_model, "tiny/bert", cache_dir, quantize=quantize)
+        assert os.path.exists(os.path.join(cache_dir, "tiny-bert",
+                                           "model.int8.onnx" if quantize else "model.onnx"))
+
+        texts = ["abc def", "a much longer sentence with many words", "x"]
+        vectors = embedder.encode(texts, batch_size=2)
+        assert vectors.shape == (3, 32)
+        assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+        assert embedder.encode("abc def").shape == (32,)
+
+        agreement = embedder.agreement_with(tiny_model, texts)
+        assert agreement['min'] > (0.95 if quantize else 0.9999)
+
+        with patch.object(OnnxEmbedder, '_export') as export:
+            OnnxEmbedder(tiny_model, "tiny/bert", cache_dir, quantize=quantize)
+            export.assert_not_called()
+
+
+class TestEmbeddingServiceBackend:
+    """Test suite for selecting the backend in EmbeddingService"""
+
+    def test_falls_back_to_pytorch(self, temp_dir):
+        """Test that the service keeps encoding with PyTorch when ONNX can't be set up"""
+        service = EmbeddingService(EmbeddingConfig(backend="onnx", onnx_cache_dir=temp_dir))
+        service.model = Mock()
+        with patch('core.onnx_embedder.OnnxEmbedder', side_effect=ImportError("No module named 'onnxruntime'")):
+            service._load_onnx_backend()
+
+        assert service.onnx is None
+        info = service.get_model_info()["backend"]
+        assert info["name"] == "torch"
+        assert info["requested"] == "onnx"
+
+    def test_invalid_backend(self):
+        """Test that unknown backends are rejected"""
+        with pytest.raises(ValueError):
+            EmbeddingConfig(backend="tensorrt")
@@ -0,0 +1,161 @@
+"""
+Tests for conversation segments stored and searched as their own records
+"""
+
+import sqlite3
+import tempfile
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from config.factory import create_test_config
+from core.database import DatabaseService
+from core.embeddings import EmbeddingService
+from core.migrations import MigrationRunner
+from core.vector_store import VectorStoreService
+from services.chat_service import ChatContext, ChatService
+from services.ingestion import IngestionService
+
+
+@pytest.fixture
+def temp_dir():
+    """Create temporary directory for test files"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def test_config(temp_dir):
+    """Create test configuration"""
+    return create_test_config(temp_dir)
+
+
+@pytest.fixture
+def database(test_config):
+    """Create test database service"""
+    return DatabaseService(test_config.database.path)
+
+
+@pytest.fixture
+def embedding_service():
+    """Mock embedding service returning one distinct unit vector per text"""
+    service = AsyncMock(spec=EmbeddingService)
+    service.chunk_texts.side_effect = lambda texts: [[text] for text in texts]
+    service.embed_texts.side_effect = lambda texts: list(np.eye(len(texts), 384, dtype=np.float32))
+    return service
+
+
+@pytest.fixture
+def ingestion_service(database, embedding_service, test_config):
+    """Ingestion service over a real database and vector store"""
+    vector_store = VectorStoreService(test_config.vector_store)
+    yield IngestionService(database=database, vector_store=vector_store,
+                           embedding_service=embedding_service, config=test_config)
+    vector_store.cleanup()
+
+
+def conversation(words: int, start: int = 0) -> str:
+    """Plain-text conversation long enough to be segmented"""
+    return " ".join(f"word{i}" for i in range(start, start + words))
+
+
+class TestSegmentsMigration:
+    """Test suite for the segments table migration"""
+
+    def test_existing_segments_materialized(self, database):
+        """Test that segments serialized in metadata are moved into the segments table"""
+        metadata = {'segmentation': {'is_segmented': True, 'total_segments': 2, 'segments': [
+            {'content': 'first half', 'speaker': 'Alice', 'start_time': '2024-01-15T09:00:00',
+             'end_time': '2024-01-15T09:05:00', 'segment_index': 0, 'word_count': 2},
+            {'content': 'second half', 'speaker': 'Bob', 'start_time': '2024-01-15T09:05:00',
+             'end_time': '2024-01-15T09:10:00', 'segment_index': 1, 'word_count': 2}
+        ]}}
+        database.store_data_item("limitless:1", "limitless", "1", "first half second half",
+                                 metadata=metadata, days_date="2024-01-15")
+        with sqlite3.connect(database.db_path) as conn:
+            conn.execute("DROP TABLE data_item_segments")
+            conn.execute("DELETE FROM schema_migrations WHERE version = '005_data_item_segments'")
+
+        result = MigrationRunner(database.db_path).run_migrations()
+
+        assert result["applied_migrations"] == ["005_data_item_segments"]
+        segments = database.get_segments_by_ids(["limitless:1_segment_0", "limitless:1_segment_1"])
+        assert sorted((s['content'], s['speaker'], s['days_date']) for s in segments) == [
+            ('first half', 'Alice', '2024-01-15'), ('second half', 'Bob', '2024-01-15')
+        ]
+        item = database.get_data_items_by_ids(["limitless:1"])[0]
+        assert 'segments' not in item['metadata']['segmentation']
+        assert item['metadata']['segmentation']['total_segments'] == 2
+        assert len(database.get_pending_segment_embeddings()) == 2
+
+
+class TestSegmentIngestion:
+    """Test suite for materializing and embedding segments during ingestion"""
+
+    @pytest.mark.asyncio
+    async def test_segments_stored_and_embedded(self, ingestion_service, database):
+        """Test that a long conversation's segments become embedded records"""
+        await ingestion_service.manual_ingest_item(namespace="test", content=conversation(450), source_id="talk")
+
+        item = database.get_data_items_by_ids(["test:talk"])[0]
+        assert item['metadata']['segmentation']['is_segmented'] is True
+        assert 'segments' not in item['metadata']['segmentation']
+        segments = database.get_pending_segment_embeddings()
+        assert [s['id'] for s in segments] == ["test:talk_segment_0", "test:talk_segment_1", "test:talk_segment_2"]
+        assert segments[0]['content'] == conversation(200)
+        assert all(s['parent_id'] == "test:talk" and s['start_time'] for s in segments)
+
+        result = await ingestion_service.process_pending_embeddings()
+
+        assert result["successful"] == 4
+        assert database.get_pending_segment_embeddings() == []
+        assert set(ingestion_service.vector_store.id_to_index) == {
+            "test:talk", "test:talk_segment_0", "test:talk_segment_1", "test:talk_segment_2"
+        }
+
+    @pytest.mark.asyncio
+    async def test_removed_segments_leave_the_index(self, ingestion_service, database):
+        """Test that segments dropped by re-ingestion are removed with their vectors"""
+        await ingestion_service.manual_ingest_item(namespace="test", content=conversation(450), source_id="talk")
+        await ingestion_service.process_pending_embeddings()
+
+        await ingestion_service.manual_ingest_item(namespace="test", content=conversation(250), source_id="talk")
+
+        assert [s['id'] for s in database.get_pending_segment_embeddings()] == [
+            "test:talk_segment_0", "test:talk_segment_1"
+        ]
+        assert "test:talk_segment_2" not in ingestion_service.vector_store.id_to_index
+
+
+class TestSegmentSearch:
+    """Test suite for returning segment text from chat search"""
+
+    @pytest.fixture
+    def chat_service(self, test_config, database):
+        """Chat service over a database holding a segmented conversation and a note"""
+        database.store_data_item("test:talk", "test", "talk", conversation(450))
+        database.store_segments("test:talk", [
+            {'id': "test:talk_segment_0", 'segment_index': 0, 'content': "budget review",
+             'speaker': "Alice", 'start_time': "2024-01-15T09:00:00"},
+            {'id': "test:talk_segment_1", 'segment_index': 1, 'content': "holiday plans"}
+        ], days_date="2024-01-15")
+        database.store_data_item("test:note", "test", "note", "a short note")
+        return ChatService(test_config, database, Mock(), Mock())
+
+    def test_segment_hits_return_segment_text(self, chat_service):
+        """Test that a segment hit yields the segment, not the whole conversation"""
+        records = chat_service._fetch_records(["test:talk_segment_0", "test:note", "test:talk"])
+
+        assert [r['id'] for r in records] == ["test:talk_segment_0", "test:note"]
+        assert records[0]['content'] == "budget review"
+        assert records[0]['parent_id'] == "test:talk"
+        assert records[0]['namespace'] == "test"
+
+        context_text = chat_service._build_context_text(ChatContext(
+            vector_results=records,
+            sql_results=[{'id': "test:talk", 'content': conversation(450)}],
+            total_results=3
+        ))
+        assert "1. [2024-01-15T09:00:00 Alice] budget review" in context_text
+        assert "word0" not in context_text
@@ -0,0 +1,201 @@
+"""
+Tests for embedding-model versioning of the vector index
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from config.models import AppConfig, DatabaseConfig, EmbeddingConfig, VectorStoreConfig
+from core.database import DatabaseService
+from core.embeddings import EmbeddingService
+from core.vector_id_table import read_id_table
+from core.vector_store import VectorStoreService
+from services.vector_index import ACTIVE_INDEX_SETTING, REBUILD_PROGRESS_SETTING, VectorIndexManager
+
+
+@pytest.fixture
+def temp_dir():
+    """Create temporary directory for the database and index files"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def database(temp_dir):
+    """Database holding five items with content and one without"""
+    db = DatabaseService(os.path.join(temp_dir, "lifeboard.db"))
+    for i in range(5):
+        db.store_data_item(f"limitless:{i}", "limitless", str(i), f"item {i}", days_date="2024-01-01")
+    db.store_data_item("limitless:empty", "limitless", "empty", "")
+    return db
+
+
+def make_config(temp_dir, model_name):
+    """Application config pointing the vector store at the temp directory"""
+    return AppConfig(
+        database=DatabaseConfig(path=os.path.join(temp_dir, "lifeboard.db")),
+        embeddings=EmbeddingConfig(model_name=model_name, batch_size=2),
+        vector_store=VectorStoreConfig(
+            index_path=os.path.join(temp_dir, "vector_index.faiss"),
+            id_map_path=os.path.join(temp_dir, "vector_ids.json")
+        )
+    )
+
+
+def make_embeddings(model_name, dimension):
+    """Mock embedding service producing random vectors of the model's dimension"""
+    embeddings = Mock(spec=EmbeddingService)
+    embeddings.model_name = model_name
+    embeddings.dimension = dimension
+    rng = np.random.default_rng(dimension)
+    embeddings.embed_texts = AsyncMock(
+        side_effect=lambda texts: list(rng.standard_normal((len(texts), dimension)).astype(np.float32))
+    )
+    embeddings.chunk_texts = AsyncMock(side_effect=lambda texts: [[text] for text in texts])
+    return embeddings
+
+
+def open_manager(temp_dir, database, model_name, dimension):
+    """Manager over flat stores for the given embedding model"""
+    return VectorIndexManager(make_config(temp_dir, model_name), database,
+                              make_embeddings(model_name, dimension), VectorStoreService)
+
+
+class TestVectorIndexManager:
+    """Test suite for VectorIndexManager"""
+
+    def test_index_records_model(self, temp_dir, database):
+        """Test that a new index adopts and persists the configured model"""
+        manager = open_manager(temp_dir, database, "all-MiniLM-L6-v2", 384)
+        assert not manager.needs_rebuild
+        manager.add_vectors(["limitless:0"], np.ones((1, 384), dtype=np.float32))
+        manager.cleanup()
+
+        metadata, _ = read_id_table(manager.serving.store.id_table_path)
+        assert metadata['model_name'] == "all-MiniLM-L6-v2"
+        assert metadata['dimension'] == 384
+
+    @pytest.mark.asyncio
+    async def test_model_change_rebuilds_and_adopts(self, temp_dir, database):
+        """Test that the old index serves until the new one is backfilled and swapped in"""
+        manager = open_manager(temp_dir, database, "all-MiniLM-L6-v2", 384)
+        manager.add_vectors([f"limitless:{i}" for i in range(5)], np.ones((5, 384), dtype=np.float32))
+        manager.cleanup()
+
+        manager = open_manager(temp_dir, database, "all-mpnet-base-v2", 768)
+        assert manager.needs_rebuild
+        old_store = manager.serving.store
+        assert old_store.model_name == "all-MiniLM-L6-v2"
+        assert manager.serving.embeddings.model_name == "all-MiniLM-L6-v2"
+        assert manager.search(np.ones(384, dtype=np.float32), k=10)
+
+        # New vectors come from the configured model and go to the index being built
+        assert manager.add_vectors(["news:new"], np.ones((1, 768), dtype=np.float32))
+        assert "news:new" not in old_store.id_to_index
+
+        legacy_embeddings = manager.serving.embeddings
+        with patch.object(legacy_embeddings, 'cleanup') as mock_cleanup:
+            result = await manager.rebuild()
+        assert result == {'rebuilt': True, 'model_name': "all-mpnet-base-v2",
+                          'items_embedded': 5, 'segments_embedded': 0}
+        mock_cleanup.assert_called_once()
+        manager.embedding_service.cleanup.assert_not_called()
+        assert not manager.needs_rebuild
+        assert manager.serving.store.model_name == "all-mpnet-base-v2"
+        assert manager.serving.embeddings is manager.embedding_service
+        assert manager.get_stats()['total_vectors'] == 6
+        assert database.get_setting(ACTIVE_INDEX_SETTING)['model_name'] == "all-mpnet-base-v2"
+        manager.cleanup()
+
+        reopened = open_manager(temp_dir, database, "all-mpnet-base-v2", 768)
+        assert not reopened.needs_rebuild
+        assert reopened.get_stats()['total_vectors'] == 6
+        assert reopened.serving.store.config.index_path.endswith("vector_index.all-mpnet-base-v2.faiss")
+        reopened.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_interrupted_rebuild_resumes(self, temp_dir, database):
+        """Test that a rebuild continues after the last completed page"""
+        manager = open_manager(temp_dir, database, "all-MiniLM-L6-v2", 384)
+        manager.add_vectors(["limitless:0"], np.ones((1, 384), dtype=np.float32))
+        manager.cleanup()
+
+        manager = open_manager(temp_dir, database, "all-mpnet-base-v2", 768)
+        embed_texts = manager.embedding_service.embed_texts.side_effect
+        manager.embedding_service.embed_texts.side_effect = [embed_texts(["a", "b"]), RuntimeError("model crashed")]
+        with pytest.raises(RuntimeError):
+            await manager.rebuild()
+        assert manager.needs_rebuild
+        assert database.get_setting(REBUILD_PROGRESS_SETTING)['after_id'] == "limitless:1"
+        manager.cleanup()
+
+        manager = open_manager(temp_dir, database, "all-mpnet-base-v2", 768)
+        result = await manager.rebuild()
+        assert result['items_embedded'] == 3
+        assert manager.get_stats()['total_vectors'] == 5
+        assert database.get_setting(REBUILD_PROGRESS_SETTING) == {}
+        manager.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_rebuild_includes_segments(self, temp_dir, database):
+        """Test that conversation segments are backfilled after the items"""
+        database.store_segments("limitless:0", [
+            {'id': f"limitless:0_segment_{n}", 'segment_index': n, 'content': f"segment {n}"} for n in range(3)
+        ])
+        manager = open_manager(temp_dir, database, "all-MiniLM-L6-v2", 384)
+        manager.add_vectors(["limitless:0"], np.ones((1, 384), dtype=np.float32))
+        manager.cleanup()
+
+        manager = open_manager(temp_dir, database, "all-mpnet-base-v2", 768)
+        result = await manager.rebuild(batch_size=2)
+
+        assert result['items_embedded'] == 5
+        assert result['segments_embedded'] == 3
+        assert "limitless:0_segment_2" in manager.serving.store.id_to_index
+        manager.cleanup()
+
+    def test_unrecorded_model_with_other_dimension(self, temp_dir, database):
+        """Test that an index of unknown origin is replaced by the new index straight away"""
+        config = make_config(temp_dir, "all-MiniLM-L6-v2")
+        store = VectorStoreService(config.vector_store)
+        store.add_vectors(["limitless:0"], np.ones((1, 768), dtype=np.float32))
+        store.cleanup()
+
+        manager = open_manager(temp_dir, database, "all-MiniLM-L6-v2", 384)
+        assert manager.needs_rebuild
+        assert manager.serving.store is manager.write_store
+        assert manager.get_stats()['total_vectors'] == 0
+        manager.cleanup()
+
+    def test_unrecorded_model_with_matching_dimension(self, temp_dir, database):
+        """Test that a matching dimension alone doesn't vouch for an index of unknown origin"""
+        config = make_config(temp_dir, "all-MiniLM-L6-v2")
+        store = VectorStoreService(config.vector_store)
+        store.add_vectors(["limitless:0"], np.ones((1, 384), dtype=np.float32))
+        store.cleanup()
+
+        manager = open_manager(temp_dir, database, "all-MiniLM-L6-v2", 384)
+        assert manager.needs_rebuild
+        assert manager.get_stats()['total_vectors'] == 0
+        manager.cleanup()
+
+    def test_unrecorded_model_named_by_setting(self, temp_dir, database):
+        """Test that an index of unknown origin is kept when the setting names its model"""
+        config = make_config(temp_dir, "all-MiniLM-L6-v2")
+        store = VectorStoreService(config.vector_store)
+        store.add_vectors(["limitless:0"], np.ones((1, 384), dtype=np.float32))
+        store.cleanup()
+
+        config.vector_store.unversioned_index_model = "all-MiniLM-L6-v2"
+        manager = VectorIndexManager(config, database, make_embeddings("all-MiniLM-L6-v2", 384),
+                                     VectorStoreService)
+        assert not manager.needs_rebuild
+        assert manager.get_stats()['total_vectors'] == 1
+        manager.cleanup()
+
+        metadata, _ = read_id_table(manager.serving.store.id_table_path)
+        assert metadata['model_name'] == "all-MiniLM-L6-v2"
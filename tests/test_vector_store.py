@@ -0,0 +1,1052 @@
+"""
+Tests for the VectorStoreService implementation
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from config.models import VectorStoreConfig
+from core.vector_id_table import read_id_table
+from core.vector_store import VectorStoreService
+
+
+@pytest.fixture
+def temp_dir():
+    """Create temporary directory for index files"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def store_config(temp_dir):
+    """Create vector store configuration pointing at the temp directory"""
+    return VectorStoreConfig(
+        index_path=os.path.join(temp_dir, "vector_index.faiss"),
+        id_map_path=os.path.join(temp_dir, "vector_ids.json"),
+        dimension=8
+    )
+
+
+@pytest.fixture
+def vector_store(store_config):
+    """Create VectorStoreService instance"""
+    store = VectorStoreService(store_config)
+    yield store
+    store.cleanup()
+
+
+def random_vectors(count, dimension=8, seed=0):
+    """Generate reproducible random float32 vectors"""
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((count, dimension)).astype(np.float32)
+
+
+def brute_force_search(vectors, ids, query, k):
+    """Reference cosine search over a dict of raw vectors"""
+    results = []
+    for vector_id, vector in zip(ids, vectors):
+        similarity = np.dot(query, vector) / (np.linalg.norm(query) * np.linalg.norm(vector))
+        results.append((vector_id, float(similarity)))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results[:k]
+
+
+class TestVectorStoreService:
+    """Test suite for VectorStoreService"""
+
+    def test_add_and_search_matches_brute_force(self, vector_store):
+        """Test that matrix search returns the same ranking as a pairwise scan"""
+        vectors = random_vectors(50)
+        ids = [f"limitless:item_{i}" for i in range(50)]
+        for vector_id, vector in zip(ids, vectors):
+            assert vector_store.add_vector(vector_id, vector)
+
+        query = random_vectors(1, seed=1)[0]
+        results = vector_store.search(query, k=5)
+        expected = brute_force_search(vectors, ids, query, 5)
+
+        assert [r[0] for r in results] == [e[0] for e in expected]
+        for (_, score), (_, expected_score) in zip(results, expected):
+            assert score == pytest.approx(expected_score, abs=1e-5)
+
+    def test_search_k_larger_than_store(self, vector_store):
+        """Test that k larger than the store returns every vector"""
+        for i, vector in enumerate(random_vectors(3)):
+            vector_store.add_vector(f"news:{i}", vector)
+
+        results = vector_store.search(random_vectors(1, seed=2)[0], k=10)
+        assert len(results) == 3
+        assert results[0][1] >= results[1][1] >= results[2][1]
+
+    def test_search_empty_store(self, vector_store):
+        """Test searching an empty store"""
+        assert vector_store.search(random_vectors(1)[0], k=5) == []
+
+    def test_dimension_mismatch_rejected(self, vector_store):
+        """Test that vectors of the wrong dimension are rejected"""
+        assert vector_store.add_vector("news:a", np.ones(8, dtype=np.float32))
+        assert not vector_store.add_vector("news:b", np.ones(4, dtype=np.float32))
+        assert vector_store.get_stats()['total_vectors'] == 1
+
+    def test_update_existing_vector(self, vector_store):
+        """Test that re-adding an ID replaces its vector"""
+        vector_store.add_vector("news:a", np.eye(8, dtype=np.float32)[0])
+        vector_store.add_vector("news:a", np.eye(8, dtype=np.float32)[1])
+
+        results = vector_store.search(np.eye(8, dtype=np.float32)[1], k=1)
+        assert [r[0] for r in results] == ["news:a"]
+        assert results[0][1] == pytest.approx(1.0)
+        assert vector_store.get_stats()['total_vectors'] == 1
+
+    def test_remove_vector(self, vector_store):
+        """Test that removed vectors no longer appear in results"""
+        vectors = random_vectors(3)
+        for i, vector in enumerate(vectors):
+            vector_store.add_vector(f"news:{i}", vector)
+
+        assert vector_store.remove_vector("news:0")
+        assert not vector_store.remove_vector("news:0")
+
+        results = vector_store.search(vectors[0], k=10)
+        assert "news:0" not in [r[0] for r in results]
+        assert len(results) == 2
+
+    def test_namespace_filter(self, vector_store):
+        """Test filtering results by namespace"""
+        vectors = random_vectors(6)
+        for i, vector in enumerate(vectors):
+            namespace = "limitless" if i % 2 else "news"
+            vector_store.add_vector(f"{namespace}:{i}", vector)
+
+        results = vector_store.search(vectors[0], k=10, namespace_filter=["limitless"])
+        assert len(results) == 3
+        assert all(r[0].startswith("limitless:") for r in results)
+
+    def test_persistence_round_trip(self, store_config):
+        """Test that a reloaded store returns identical results"""
+        vectors = random_vectors(20)
+        store = VectorStoreService(store_config)
+        for i, vector in enumerate(vectors):
+            store.add_vector(f"limitless:{i}", vector)
+        store.remove_vector("limitless:3")
+        store.cleanup()
+
+        query = random_vectors(1, seed=3)[0]
+        reloaded = VectorStoreService(store_config)
+
+        assert reloaded.get_stats()['total_vectors'] == 19
+        expected = store.search(query, k=5)
+        results = reloaded.search(query, k=5)
+        assert [r[0] for r in results] == [e[0] for e in expected]
+        assert [r[1] for r in results] == pytest.approx([e[1] for e in expected])
+
+    def test_add_vectors_batch(self, vector_store):
+        """Test bulk insertion matches one-at-a-time insertion"""
+        vectors = random_vectors(32)
+        ids = [f"limitless:{i}" for i in range(32)]
+
+        assert vector_store.add_vectors(ids, vectors)
+        assert vector_store.get_stats()['total_vectors'] == 32
+
+        results = vector_store.search(vectors[7], k=1)
+        assert results[0][0] == "limitless:7"
+        assert results[0][1] == pytest.approx(1.0)
+
+    def test_add_vectors_rejects_bad_shapes(self, vector_store):
+        """Test that a batch is validated once and rejected as a whole"""
+        assert not vector_store.add_vectors(["news:a", "news:b"], random_vectors(3))
+        assert vector_store.add_vectors(["news:a"], random_vectors(1))
+        assert not vector_store.add_vectors(["news:b", "news:c"], random_vectors(2, dimension=4))
+        assert vector_store.get_stats()['total_vectors'] == 1
+
+    def test_remove_vectors_batch(self, vector_store):
+        """Test bulk removal reports how many vectors were removed"""
+        vector_store.add_vectors([f"news:{i}" for i in range(5)], random_vectors(5))
+
+        assert vector_store.remove_vectors(["news:0", "news:1", "news:missing"]) == 2
+        assert vector_store.get_stats()['total_vectors'] == 3
+
+    def test_get_vectors(self, vector_store):
+        """Test that stored vectors come back normalized, with zero rows for unknown ids"""
+        vectors = random_vectors(4)
+        vector_store.add_vectors([f"news:{i}" for i in range(4)], vectors)
+        vector_store.remove_vector("news:1")
+
+        stored = vector_store.get_vectors(["news:2", "news:1", "news:missing", "news:0"])
+        assert stored.shape == (4, 8)
+        np.testing.assert_allclose(stored[0], vectors[2] / np.linalg.norm(vectors[2]), rtol=1e-5)
+        assert not stored[1].any() and not stored[2].any()
+        np.testing.assert_allclose(stored[3], vectors[0] / np.linalg.norm(vectors[0]), rtol=1e-5)
+
+    def test_snapshot_uses_binary_id_table(self, vector_store, store_config):
+        """Test that checkpoints write the binary ID table instead of JSON"""
+        vector_store.add_vectors([f"news:{i}" for i in range(4)], random_vectors(4))
+        vector_store.remove_vector("news:2")
+        assert vector_store.checkpoint()
+
+        assert os.path.exists(vector_store.id_table_path)
+        assert not os.path.exists(store_config.id_map_path)
+
+        metadata, row_ids = read_id_table(vector_store.id_table_path)
+        assert metadata['next_index'] == 4
+        assert metadata['dimension'] == 8
+        assert row_ids == ["news:0", "news:1", None, "news:3"]
+
+    def test_legacy_json_id_map_is_migrated(self, store_config):
+        """Test that a snapshot with the old JSON ID map loads and is converted"""
+        vectors = random_vectors(3)
+        np.save(store_config.index_path + '.npy', vectors)
+        with open(store_config.id_map_path, 'w') as f:
+            json.dump({
+                'id_to_index': {"news:a": 0, "news:c": 2},
+                'index_to_id': {"0": "news:a", "2": "news:c"},
+                'next_index': 3,
+                'dimension': 8
+            }, f)
+
+        store = VectorStoreService(store_config)
+        assert set(store.id_to_index) == {"news:a", "news:c"}
+        assert store.search(vectors[2], k=1)[0][0] == "news:c"
+
+        assert store.checkpoint()
+        assert not os.path.exists(store_config.id_map_path)
+        reloaded = VectorStoreService(store_config)
+        assert reloaded.id_to_index == store.id_to_index
+
+
+class TestVectorStoreNamespacePartitions:
+    """Test suite for namespace-partitioned search"""
+
+    @pytest.fixture
+    def mixed_store(self, vector_store):
+        """Store where news items outnumber conversation items"""
+        vectors = random_vectors(60)
+        ids = [f"limitless:{i}" if i % 6 == 0 else f"news:{i}" for i in range(50)]
+        ids += [f"twitter:{i}" for i in range(50, 60)]
+        vector_store.add_vectors(ids, vectors)
+        return vector_store
+
+    def test_stats_report_namespace_counts(self, mixed_store):
+        """Test that per-namespace counts come from get_stats"""
+        assert mixed_store.get_stats()['namespaces'] == {"limitless": 9, "news": 41, "twitter": 10}
+
+        mixed_store.remove_vectors(["limitless:0", "news:1"])
+        assert mixed_store.get_namespace_counts() == {"limitless": 8, "news": 40, "twitter": 10}
+
+    def test_filtered_search_scans_only_matching_partitions(self, mixed_store):
+        """Test that a filtered query gathers the partition rows instead of scanning everything"""
+        with patch.object(mixed_store, '_score_all') as mock_score_all, \
+                patch.object(mixed_store, '_take_rows', wraps=mixed_store._take_rows) as mock_take:
+            results = mixed_store.search(random_vectors(1, seed=1)[0], k=20, namespace_filter=["limitless"])
+
+        mock_score_all.assert_not_called()
+        assert mock_take.call_args[0][0].size == 9
+        assert len(results) == 9
+        assert all(r[0].startswith("limitless:") for r in results)
+
+    def test_filtered_search_matches_unfiltered_ranking(self, mixed_store):
+        """Test that partition results are the filtered global ranking"""
+        query = random_vectors(1, seed=2)[0]
+        expected = [r for r in mixed_store.search(query, k=60) if not r[0].startswith("news:")][:5]
+        results = mixed_store.search(query, k=5, namespace_filter=["limitless", "twitter"])
+
+        assert [r[0] for r in results] == [e[0] for e in expected]
+        assert mixed_store.search(query, k=5, namespace_filter=["unknown"]) == []
+
+    def test_partitions_rebuilt_on_reload(self, mixed_store, store_config):
+        """Test that partitions are restored from a checkpoint"""
+        mixed_store.remove_vector("twitter:50")
+        mixed_store.checkpoint()
+        reloaded = VectorStoreService(store_config)
+
+        assert reloaded.get_namespace_counts() == mixed_store.get_namespace_counts()
+        results = reloaded.search(random_vectors(1, seed=3)[0], k=20, namespace_filter=["twitter"])
+        assert len(results) == 9
+
+
+class TestVectorStoreAttributeFilters:
+    """Test suite for date-range and metadata pre-filtering"""
+
+    @pytest.fixture
+    def dated_store(self, vector_store):
+        """Store with one item per day in January 2024, every third one starred"""
+        attributes = [
+            {'days_date': f"2024-01-{day:02d}", 'is_starred': day % 3 == 0} for day in range(1, 32)
+        ]
+        vector_store.add_vectors([f"limitless:{day}" for day in range(1, 32)], random_vectors(31), attributes)
+        vector_store.add_vector("news:undated", random_vectors(1, seed=5)[0])
+        return vector_store
+
+    def test_date_range_filters_before_scoring(self, dated_store):
+        """Test that only rows inside the range are gathered and scored"""
+        with patch.object(dated_store, '_score_all') as mock_score_all, \
+                patch.object(dated_store, '_take_rows', wraps=dated_store._take_rows) as mock_take:
+            results = dated_store.search(random_vectors(1, seed=1)[0], k=10,
+                                         date_range=("2024-01-08", "2024-01-14"))
+
+        mock_score_all.assert_not_called()
+        assert mock_take.call_args[0][0].size == 7
+        assert {r[0] for r in results} == {f"limitless:{day}" for day in range(8, 15)}
+
+    def test_open_ended_ranges_and_undated_rows(self, dated_store):
+        """Test that either bound may be omitted and undated rows never match a range"""
+        query = random_vectors(1, seed=2)[0]
+
+        since = dated_store.search(query, k=50, date_range=("2024-01-29", None))
+        assert {r[0] for r in since} == {"limitless:29", "limitless:30", "limitless:31"}
+
+        until = dated_store.search(query, k=50, date_range=(None, "2024-01-02"))
+        assert {r[0] for r in until} == {"limitless:1", "limitless:2"}
+
+    def test_metadata_predicate(self, dated_store):
+        """Test filtering on is_starred, alone and combined with a date range"""
+        query = random_vectors(1, seed=3)[0]
+
+        starred = dated_store.search(query, k=50, metadata_filter={'is_starred': True})
+        assert {r[0] for r in starred} == {f"limitless:{day}" for day in range(3, 32, 3)}
+
+        combined = dated_store.search(query, k=50, date_range=("2024-01-01", "2024-01-10"),
+                                      metadata_filter={'is_starred': True})
+        assert {r[0] for r in combined} == {"limitless:3", "limitless:6", "limitless:9"}
+
+        assert dated_store.search(query, k=5, metadata_filter={'unknown_flag': True}) == []
+
+    def test_attributes_survive_replay_and_checkpoint(self, dated_store, store_config):
+        """Test that attributes are logged and saved with the snapshot"""
+        query = random_vectors(1, seed=4)[0]
+        expected = dated_store.search(query, k=50, date_range=("2024-01-10", "2024-01-20"))
+        dated_store._wal.close()
+
+        replayed = VectorStoreService(store_config)
+        assert replayed.search(query, k=50, date_range=("2024-01-10", "2024-01-20")) == expected
+
+        replayed.checkpoint()
+        reloaded = VectorStoreService(store_config)
+        assert reloaded.search(query, k=50, date_range=("2024-01-10", "2024-01-20")) == expected
+
+    def test_crash_before_id_table_keeps_attributes(self, dated_store, store_config):
+        """Test that a checkpoint interrupted before the ID table swap keeps every row's attributes"""
+        assert dated_store.checkpoint()
+        dated_store.add_vectors([f"limitless:{day}" for day in range(32, 37)], random_vectors(5, seed=7),
+                                [{'days_date': "2024-02-01"}] * 5)
+
+        with patch('core.vector_store.write_id_table', side_effect=OSError("disk full")):
+            assert not dated_store.checkpoint()
+        dated_store._wal.close()
+
+        reloaded = VectorStoreService(store_config)
+        query = random_vectors(1, seed=8)[0]
+        assert {r[0] for r in reloaded.search(query, k=50, date_range=("2024-01-01", "2024-01-10"))} == {
+            f"limitless:{day}" for day in range(1, 11)
+        }
+        assert len(reloaded.search(query, k=50, date_range=("2024-02-01", "2024-02-01"))) == 5
+
+    def test_update_without_attributes_keeps_them(self, dated_store):
+        """Test that re-adding a vector without attributes keeps its date"""
+        dated_store.add_vector("limitless:15", random_vectors(1, seed=6)[0])
+
+        results = dated_store.search(random_vectors(1, seed=6)[0], k=1, date_range=("2024-01-15", "2024-01-15"))
+        assert results[0] == ("limitless:15", pytest.approx(1.0))
+
+
+class TestVectorStoreBatchSearch:
+    """Test suite for multi-query search"""
+
+    @pytest.fixture
+    def populated_store(self, vector_store):
+        """Store with 200 vectors, a few of them removed"""
+        vector_store.add_vectors([f"ns{i % 3}:{i}" for i in range(200)], random_vectors(200))
+        vector_store.remove_vectors([f"ns{i % 3}:{i}" for i in range(0, 200, 7)])
+        return vector_store
+
+    def test_matches_single_query_search(self, populated_store):
+        """Test that each batch result equals the corresponding single search"""
+        queries = random_vectors(12, seed=1)
+        batch = populated_store.search_batch(queries, k=5)
+
+        assert len(batch) == 12
+        for query, results in zip(queries, batch):
+            expected = populated_store.search(query, k=5)
+            assert [r[0] for r in results] == [r[0] for r in expected]
+            assert [r[1] for r in results] == pytest.approx([r[1] for r in expected], abs=1e-5)
+
+    def test_scores_all_queries_with_one_product(self, populated_store):
+        """Test that the flat scan scores the whole batch at once"""
+        with patch.object(populated_store, '_score_all') as mock_score_all, \
+                patch.object(populated_store, '_score_all_batch',
+                             wraps=populated_store._score_all_batch) as mock_batch:
+            populated_store.search_batch(random_vectors(20, seed=2), k=3)
+
+        mock_score_all.assert_not_called()
+        mock_batch.assert_called_once()
+
+    def test_blocks_of_queries_bound_memory(self, populated_store):
+        """Test that the batch is split when the score block would be too large"""
+        queries = random_vectors(10, seed=3)
+        expected = populated_store.search_batch(queries, k=4)
+
+        populated_store.BATCH_SCORE_ELEMENTS = populated_store.next_index * 3
+        with patch.object(populated_store, '_score_all_batch',
+                          wraps=populated_store._score_all_batch) as mock_batch:
+            blocked = populated_store.search_batch(queries, k=4)
+        assert mock_batch.call_count == 4
+        assert [[r[0] for r in results] for results in blocked] == [[r[0] for r in results] for results in expected]
+
+    def test_filters_and_zero_queries(self, populated_store):
+        """Test namespace filtering and that zero or missing queries yield empty lists"""
+        queries = random_vectors(3, seed=4)
+        queries[1] = 0.0
+
+        batch = populated_store.search_batch(queries, k=50, namespace_filter=["ns1"])
+        assert batch[1] == []
+        assert batch[0] and all(r[0].startswith("ns1:") for r in batch[0])
+        expected = populated_store.search(queries[2], k=50, namespace_filter=["ns1"])
+        assert [r[0] for r in batch[2]] == [r[0] for r in expected]
+
+        assert populated_store.search_batch(np.zeros((0, 8), dtype=np.float32), k=5) == []
+
+    def test_k_larger_than_store(self, vector_store):
+        """Test that every live vector is returned when k exceeds the store size"""
+        vector_store.add_vectors(["a", "b", "c"], random_vectors(3))
+        batch = vector_store.search_batch(random_vectors(2, seed=5), k=10)
+        assert [len(results) for results in batch] == [3, 3]
+
+
+class TestVectorStoreRangeSearch:
+    """Test suite for similarity-threshold search"""
+
+    @pytest.fixture
+    def populated_store(self, vector_store):
+        """Store with 500 vectors across two namespaces"""
+        vector_store.add_vectors([f"ns{i % 2}:{i}" for i in range(500)], random_vectors(500))
+        return vector_store
+
+    def test_returns_everything_above_threshold(self, populated_store):
+        """Test that exactly the rows at or above the threshold are returned, best first"""
+        query = random_vectors(1, seed=1)[0]
+        expected = [r for r in populated_store.search(query, k=500) if r[1] >= 0.6]
+
+        results = populated_store.search_range(query, threshold=0.6, max_results=500)
+        assert [r[0] for r in results] == [r[0] for r in expected]
+        assert all(score >= 0.6 for _, score in results)
+
+    def test_capped_at_max_results(self, populated_store):
+        """Test that the cap keeps the best hits even when they span several blocks"""
+        query = random_vectors(1, seed=2)[0]
+        expected = populated_store.search(query, k=7)
+
+        populated_store.RANGE_SCAN_ROWS = 64
+        results = populated_store.search_range(query, threshold=-1.0, max_results=7)
+        assert [r[0] for r in results] == [r[0] for r in expected]
+
+    def test_nothing_above_threshold(self, populated_store):
+        """Test that weak matches are not returned just to fill the list"""
+        assert populated_store.search_range(random_vectors(1, seed=3)[0], threshold=1.01, max_results=10) == []
+
+    def test_filters(self, populated_store):
+        """Test that namespace filtering applies before the threshold"""
+        query = random_vectors(1, seed=4)[0]
+        results = populated_store.search_range(query, threshold=0.3, max_results=50, namespace_filter=["ns1"])
+        expected = [r for r in populated_store.search(query, k=50, namespace_filter=["ns1"]) if r[1] >= 0.3]
+        assert results and [r[0] for r in results] == [r[0] for r in expected]
+
+    def test_quantized_store(self, store_config):
+        """Test that a quantized store applies the threshold to rescored scores"""
+        store_config.quantization = "int8"
+        store = VectorStoreService(store_config)
+        store.add_vectors([f"limitless:{i}" for i in range(300)], random_vectors(300))
+        query = random_vectors(1, seed=5)[0]
+
+        results = store.search_range(query, threshold=0.5, max_results=20)
+        expected = [r for r in store.search(query, k=20) if r[1] >= 0.5]
+        assert results == expected
+        store.cleanup()
+
+
+class TestVectorStoreParallelScan:
+    """Test suite for the multi-threaded exact scan"""
+
+    @pytest.fixture
+    def threaded_config(self, store_config):
+        """Configuration scanning with four threads"""
+        store_config.search_threads = 4
+        return store_config
+
+    @pytest.fixture
+    def threaded_store(self, threaded_config):
+        """Threaded store with blocks small enough to split a test-sized scan"""
+        store = VectorStoreService(threaded_config)
+        store.PARALLEL_SCAN_MIN_ROWS = 16
+        yield store
+        store.cleanup()
+
+    def test_matches_serial_scan(self, threaded_store):
+        """Test that merging per-block top k gives the serial ranking"""
+        vectors = random_vectors(300)
+        ids = [f"limitless:{i}" for i in range(300)]
+        threaded_store.add_vectors(ids, vectors)
+        threaded_store.remove_vectors(ids[::5])
+
+        with patch.object(threaded_store, '_score_all') as mock_score_all:
+            for seed in range(5):
+                query = random_vectors(1, seed=seed + 10)[0]
+                expected = brute_force_search(np.delete(vectors, np.s_[::5], axis=0),
+                                              np.delete(ids, np.s_[::5]), query, 10)
+                results = threaded_store.search(query, k=10)
+                assert [r[0] for r in results] == [e[0] for e in expected]
+                assert [r[1] for r in results] == pytest.approx([e[1] for e in expected], abs=1e-5)
+        mock_score_all.assert_not_called()
+
+    def test_filtered_scan(self, threaded_store):
+        """Test that the gathered rows of a filtered search are split as well"""
+        threaded_store.add_vectors([f"ns{i % 2}:{i}" for i in range(300)], random_vectors(300))
+        query = random_vectors(1, seed=1)[0]
+
+        with patch.object(threaded_store, '_parallel_top_k', wraps=threaded_store._parallel_top_k) as mock_scan:
+            results = threaded_store.search(query, k=20, namespace_filter=["ns1"])
+        mock_scan.assert_called_once()
+
+        threaded_store._search_pool = None
+        assert threaded_store.search(query, k=20, namespace_filter=["ns1"]) == results
+
+    def test_blocks_split_at_segment_boundary(self, threaded_config):
+        """Test that blocks never straddle the memory-mapped base and the delta"""
+        threaded_config.mmap_index = True
+        vectors = random_vectors(150)
+        store = VectorStoreService(threaded_config)
+        store.add_vectors([f"limitless:{i}" for i in range(100)], vectors[:100])
+        store.cleanup()
+
+        store = VectorStoreService(threaded_config)
+        store.PARALLEL_SCAN_MIN_ROWS = 16
+        store.add_vectors([f"limitless:{i}" for i in range(100, 150)], vectors[100:])
+        assert all(stop <= 100 or start >= 100
+                   for start, stop in store._scan_blocks(0, 100, 150) + store._scan_blocks(100, 150, 150))
+
+        query = random_vectors(1, seed=2)[0]
+        expected = brute_force_search(vectors, [f"limitless:{i}" for i in range(150)], query, 8)
+        assert [r[0] for r in store.search(query, k=8)] == [e[0] for e in expected]
+        store.cleanup()
+
+    def test_single_thread_has_no_pool(self, vector_store):
+        """Test that the default configuration keeps the serial scan"""
+        assert vector_store.search_threads == 1
+        assert vector_store._search_pool is None
+
+
+class TestVectorStoreWriteAheadLog:
+    """Test suite for the append-only persistence log"""
+
+    def test_adds_do_not_rewrite_snapshot(self, vector_store, store_config):
+        """Test that individual adds only append to the log"""
+        for i, vector in enumerate(random_vectors(5)):
+            vector_store.add_vector(f"news:{i}", vector)
+
+        assert not os.path.exists(store_config.index_path)
+        assert vector_store.get_stats()['wal_pending_records'] == 5
+
+    def test_replay_produces_identical_index(self, store_config):
+        """Test that replaying the log without a checkpoint restores the index"""
+        vectors = random_vectors(10)
+        store = VectorStoreService(store_config)
+        for i, vector in enumerate(vectors):
+            store.add_vector(f"limitless:{i}", vector)
+        store.remove_vector("limitless:4")
+
+        # Simulate a crash: no checkpoint, just drop the instance
+        store._wal.close()
+        replayed = VectorStoreService(store_config)
+
+        assert replayed.id_to_index == store.id_to_index
+        np.testing.assert_array_equal(
+            replayed._matrix[:replayed.next_index], store._matrix[:store.next_index]
+        )
+
+    def test_torn_tail_is_discarded(self, store_config):
+        """Test that a partially written record does not corrupt the index"""
+        store = VectorStoreService(store_config)
+        store.add_vector("news:a", random_vectors(1)[0])
+        store.checkpoint()
+        store.add_vector("news:b", random_vectors(1, seed=1)[0])
+        store.add_vector("news:c", random_vectors(1, seed=2)[0])
+        store._wal.close()
+
+        # Chop the last record in half
+        size = os.path.getsize(store.wal_path)
+        with open(store.wal_path, 'r+b') as f:
+            f.truncate(size - 10)
+
+        replayed = VectorStoreService(store_config)
+        assert set(replayed.id_to_index) == {"news:a", "news:b"}
+
+    def test_checkpoint_interval(self, store_config):
+        """Test that the log is folded into the snapshot periodically"""
+        store_config.checkpoint_interval = 3
+        store = VectorStoreService(store_config)
+        for i, vector in enumerate(random_vectors(4)):
+            store.add_vector(f"news:{i}", vector)
+
+        assert os.path.exists(store_config.index_path)
+        assert store.get_stats()['wal_pending_records'] == 1
+
+    def test_batch_is_a_single_log_write(self, vector_store):
+        """Test that a batch costs one log append, not one per vector"""
+        with patch.object(vector_store._wal, '_write', wraps=vector_store._wal._write) as mock_write:
+            vector_store.add_vectors([f"news:{i}" for i in range(32)], random_vectors(32))
+            vector_store.remove_vectors([f"news:{i}" for i in range(4)])
+
+        assert mock_write.call_count == 2
+        assert vector_store.get_stats()['wal_pending_records'] == 36
+
+
+class TestVectorStoreMemoryMap:
+    """Test suite for the memory-mapped snapshot mode"""
+
+    @pytest.fixture
+    def mmap_config(self, store_config):
+        """Configuration with the snapshot memory-mapped"""
+        store_config.mmap_index = True
+        return store_config
+
+    def _checkpointed_store(self, config, vectors):
+        """Build, checkpoint and reopen a store over the given vectors"""
+        store = VectorStoreService(config)
+        store.add_vectors([f"limitless:{i}" for i in range(len(vectors))], vectors)
+        store.cleanup()
+        return VectorStoreService(config)
+
+    def test_reload_maps_snapshot(self, mmap_config):
+        """Test that a reloaded store maps the snapshot instead of copying it"""
+        store = self._checkpointed_store(mmap_config, random_vectors(20))
+
+        assert isinstance(store._base, np.memmap)
+        stats = store.get_stats()
+        assert stats['base_rows'] == 20
+        assert stats['delta_rows'] == 0
+
+    def test_search_spans_base_and_delta(self, mmap_config):
+        """Test that rows added after the snapshot are searched alongside it"""
+        vectors = random_vectors(30)
+        store = self._checkpointed_store(mmap_config, vectors[:20])
+        store.add_vectors([f"limitless:{i}" for i in range(20, 30)], vectors[20:])
+
+        assert store.get_stats()['delta_rows'] == 10
+        query = random_vectors(1, seed=4)[0]
+        expected = brute_force_search(vectors, [f"limitless:{i}" for i in range(30)], query, 8)
+        results = store.search(query, k=8)
+
+        assert [r[0] for r in results] == [e[0] for e in expected]
+        assert [r[1] for r in results] == pytest.approx([e[1] for e in expected], abs=1e-5)
+
+    def test_update_and_remove_base_rows(self, mmap_config):
+        """Test that base rows can be replaced and removed without writing to the map"""
+        vectors = random_vectors(5)
+        store = self._checkpointed_store(mmap_config, vectors)
+
+        store.add_vector("limitless:0", np.eye(8, dtype=np.float32)[0])
+        assert store.remove_vector("limitless:1")
+
+        results = store.search(np.eye(8, dtype=np.float32)[0], k=10)
+        assert results[0] == ("limitless:0", pytest.approx(1.0))
+        assert "limitless:1" not in [r[0] for r in results]
+        assert len(results) == 4
+
+    def test_checkpoint_remaps_identical_results(self, mmap_config):
+        """Test that folding the delta into a new snapshot keeps search results"""
+        vectors = random_vectors(30)
+        store = self._checkpointed_store(mmap_config, vectors[:20])
+        store.add_vectors([f"limitless:{i}" for i in range(20, 30)], vectors[20:])
+        store.remove_vector("limitless:2")
+
+        query = random_vectors(1, seed=5)[0]
+        before = store.search(query, k=10)
+        assert store.checkpoint()
+
+        assert store.get_stats()['base_rows'] == 30
+        assert store.get_stats()['delta_rows'] == 0
+        after = store.search(query, k=10)
+        assert [r[0] for r in after] == [r[0] for r in before]
+        assert [r[1] for r in after] == pytest.approx([r[1] for r in before])
+
+        reloaded = VectorStoreService(mmap_config)
+        assert reloaded.search(query, k=10) == store.search(query, k=10)
+
+
+class TestVectorStoreConcurrency:
+    """Test suite for searches running alongside writers"""
+
+    def _search_with_concurrent_write(self, store, query, write):
+        """Run a search whose scoring is interleaved with a write"""
+        score_all = store._score_all
+
+        def score_then_write(query_vector, snapshot=None):
+            write()
+            return score_all(query_vector, snapshot)
+
+        with patch.object(store, '_score_all', side_effect=score_then_write):
+            return store.search(query, k=10)
+
+    def test_search_reads_one_snapshot(self, vector_store):
+        """Test that a write landing mid-search is invisible to that search"""
+        vectors = random_vectors(10)
+        vector_store.add_vectors([f"news:{i}" for i in range(10)], vectors)
+
+        results = self._search_with_concurrent_write(
+            vector_store, vectors[3], lambda: vector_store.remove_vector("news:3")
+        )
+        assert results[0] == ("news:3", pytest.approx(1.0))
+        assert len(results) == 10
+
+        assert "news:3" not in [r[0] for r in vector_store.search(vectors[3], k=10)]
+
+    def test_update_appends_instead_of_overwriting(self, vector_store):
+        """Test that an update leaves the published row intact for running searches"""
+        vectors = random_vectors(5)
+        vector_store.add_vectors([f"news:{i}" for i in range(5)], vectors)
+
+        results = self._search_with_concurrent_write(
+            vector_store, vectors[1], lambda: vector_store.add_vector("news:1", vectors[4])
+        )
+        assert results[0] == ("news:1", pytest.approx(1.0))
+
+        assert vector_store.next_index == 6
+        assert vector_store.get_stats()['total_vectors'] == 5
+        results = vector_store.search(vectors[4], k=2)
+        assert {r[0] for r in results} == {"news:1", "news:4"}
+        assert all(r[1] == pytest.approx(1.0) for r in results)
+
+    def test_new_rows_keep_columns_shared(self, vector_store):
+        """Test that attributes for rows past the published snapshot do not copy the columns"""
+        vectors = random_vectors(6)
+        vector_store.add_vectors([f"news:{i}" for i in range(3)], vectors[:3],
+                                 [{'days_date': '2024-01-01'}] * 3)
+
+        with patch.object(vector_store, '_unshare_columns') as unshare:
+            vector_store.add_vectors([f"news:{i}" for i in range(3, 6)], vectors[3:],
+                                     [{'days_date': '2024-01-02'}] * 3)
+        unshare.assert_not_called()
+
+        results = vector_store.search(vectors[4], k=6, date_range=("2024-01-02", "2024-01-02"))
+        assert {r[0] for r in results} == {"news:3", "news:4", "news:5"}
+
+    def test_removes_and_updates_publish_without_copying(self, vector_store):
+        """Test that freeing published rows stamps them instead of copying the per-row columns"""
+        vectors = random_vectors(10)
+        vector_store.add_vectors([f"news:{i}" for i in range(10)], vectors, [{'days_date': '2024-01-01'}] * 10)
+        before = vector_store._snapshot
+        columns = [vector_store._freed_at, vector_store._ids, vector_store._row_days, vector_store._row_flags]
+
+        results = self._search_with_concurrent_write(vector_store, vectors[2], lambda: vector_store.remove_vectors(
+            ["news:2", "news:3"]) and vector_store.add_vector("news:4", vectors[5]))
+
+        after = [vector_store._freed_at, vector_store._ids, vector_store._row_days, vector_store._row_flags]
+        assert all(column is original for column, original in zip(after, columns))
+        assert results[0] == ("news:2", pytest.approx(1.0))
+        assert before.live[:10].all()
+        assert [r[0] for r in vector_store.search(vectors[2], k=10, date_range=("2024-01-01", None))
+                if r[0] in ("news:2", "news:3")] == []
+
+    def test_searches_alongside_writer_thread(self, store_config):
+        """Test that searches stay consistent while another thread adds and removes vectors"""
+        store_config.checkpoint_interval = 50
+        store = VectorStoreService(store_config)
+        store.add_vectors([f"news:{i}" for i in range(100)], random_vectors(100))
+        errors = []
+
+        def writer():
+            try:
+                for batch in range(30):
+                    ids = [f"limitless:{batch}_{i}" for i in range(20)]
+                    assert store.add_vectors(ids, random_vectors(20, seed=batch))
+                    store.remove_vectors(ids[:5] + [f"news:{batch}"])
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        queries = random_vectors(8, seed=99)
+        while thread.is_alive():
+            for query in queries:
+                results = store.search(query, k=10)
+                assert len(results) == 10
+                assert all(vector_id is not None for vector_id, _ in results)
+                assert len({vector_id for vector_id, _ in results}) == 10
+        thread.join()
+        store.cleanup()
+
+        assert not errors
+        assert store.get_stats()['total_vectors'] == 100 + 30 * 15 - 30
+
+
+class TestVectorStoreCompaction:
+    """Test suite for reclaiming freed rows"""
+
+    @pytest.fixture
+    def holey_store(self, vector_store):
+        """Checkpointed store of 100 vectors with every other one removed"""
+        attributes = [{'days_date': f"2024-02-{i % 28 + 1:02d}", 'is_starred': i % 4 == 1} for i in range(100)]
+        ids = [f"{'news' if i % 3 else 'limitless'}:{i}" for i in range(100)]
+        vector_store.add_vectors(ids, random_vectors(100), attributes)
+        vector_store.remove_vectors(ids[::2])
+        assert vector_store.checkpoint()
+        return vector_store
+
+    def test_compaction_renumbers_and_shrinks_snapshot(self, holey_store, store_config):
+        """Test that freed rows are dropped from memory and disk"""
+        query = random_vectors(1, seed=1)[0]
+        expected = holey_store.search(query, k=50)
+        snapshot_bytes = os.path.getsize(store_config.index_path)
+
+        report = holey_store.compact()
+
+        assert report['compacted']
+        assert report['rows_before'] == 100
+        assert report['rows_after'] == 50
+        assert report['rows_reclaimed'] == 50
+        assert report['bytes_reclaimed'] > 0
+        assert os.path.getsize(store_config.index_path) < snapshot_bytes
+        assert not os.path.exists(holey_store.compaction_backup_path)
+        assert holey_store.next_index == 50
+        assert sorted(holey_store.id_to_index.values()) == list(range(50))
+
+        results = holey_store.search(query, k=50)
+        assert [r[0] for r in results] == [r[0] for r in expected]
+        assert [r[1] for r in results] == pytest.approx([r[1] for r in expected])
+
+    def test_filters_survive_compaction_and_reload(self, holey_store, store_config):
+        """Test that namespace partitions and attribute columns are renumbered too"""
+        query = random_vectors(1, seed=2)[0]
+        filters = {'namespace_filter': ["limitless"], 'date_range': ("2024-02-01", "2024-02-14"),
+                   'metadata_filter': {'is_starred': True}}
+        expected = holey_store.search(query, k=50, **filters)
+        counts = holey_store.get_namespace_counts()
+        assert expected
+
+        holey_store.compact()
+        assert holey_store.search(query, k=50, **filters) == expected
+        assert holey_store.get_namespace_counts() == counts
+
+        reloaded = VectorStoreService(store_config)
+        assert reloaded.search(query, k=50, **filters) == expected
+        assert reloaded.get_stats()['total_vectors'] == 50
+
+    def test_skipped_below_free_ratio(self, holey_store):
+        """Test that compaction is a no-op when too few rows are free"""
+        report = holey_store.compact(min_free_ratio=0.6)
+
+        assert not report['compacted']
+        assert report['rows_reclaimed'] == 0
+        assert holey_store.next_index == 100
+
+    def test_compaction_with_memory_map(self, store_config):
+        """Test that a compacted snapshot is re-mapped as the base segment"""
+        store_config.mmap_index = True
+        store = VectorStoreService(store_config)
+        store.add_vectors([f"limitless:{i}" for i in range(40)], random_vectors(40))
+        store.cleanup()
+
+        store = VectorStoreService(store_config)
+        store.remove_vectors([f"limitless:{i}" for i in range(30)])
+        assert store.compact()['rows_after'] == 10
+
+        assert isinstance(store._base, np.memmap)
+        assert store.get_stats()['base_rows'] == 10
+        assert store.search(random_vectors(40)[35], k=1)[0] == ("limitless:35", pytest.approx(1.0))
+
+    def test_interrupted_compaction_rolls_back(self, holey_store, store_config):
+        """Test that a crash between the matrix and ID table swaps restores the old matrix"""
+        query = random_vectors(1, seed=3)[0]
+        expected = holey_store.search(query, k=10)
+        february = ("2024-02-02", "2024-02-10")
+        expected_dated = holey_store.search(query, k=10, date_range=february)
+
+        with patch('core.vector_store.write_id_table', side_effect=OSError("disk full")):
+            assert not holey_store.compact()['compacted']
+        holey_store._wal.close()
+
+        assert not os.path.exists(holey_store.compaction_backup_path)
+        reloaded = VectorStoreService(store_config)
+        assert reloaded.search(query, k=10) == expected
+        assert reloaded.search(query, k=10, date_range=february) == expected_dated
+
+        # Same state, but as if the process died before restoring the backup
+        os.replace(store_config.index_path, reloaded.compaction_backup_path)
+        with open(store_config.index_path, 'wb') as f:
+            np.save(f, np.zeros((50, 8), dtype=np.float32))
+        recovered = VectorStoreService(store_config)
+        assert recovered.search(query, k=10) == expected
+        assert not os.path.exists(recovered.compaction_backup_path)
+
+
+def clustered_vectors(count, clusters=16, dimension=8, seed=0):
+    """Generate vectors grouped around random cluster centres"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension))
+    labels = rng.integers(0, clusters, count)
+    return (centres[labels] + 0.1 * rng.standard_normal((count, dimension))).astype(np.float32)
+
+
+class TestVectorStoreIVF:
+    """Test suite for the inverted-file index mode"""
+
+    @pytest.fixture
+    def ivf_config(self, store_config):
+        """Configuration with a small IVF index"""
+        store_config.index_type = "ivf"
+        store_config.ivf_nlist = 16
+        store_config.ivf_nprobe = 4
+        store_config.ivf_min_train_size = 200
+        return store_config
+
+    @pytest.fixture
+    def ivf_store(self, ivf_config):
+        """Store holding 1000 clustered vectors"""
+        store = VectorStoreService(ivf_config)
+        store.add_vectors([f"limitless:{i}" for i in range(1000)], clustered_vectors(1000))
+        yield store
+        store.cleanup()
+
+    def test_snapshot_shares_assignment(self, ivf_store):
+        """Test that publishing after a remove copies only per-list state"""
+        assignment = ivf_store._ivf._assignment
+        ivf_store.remove_vectors([f"limitless:{i}" for i in range(10)])
+
+        assert ivf_store._snapshot.ivf._assignment is assignment
+        results = ivf_store.search(clustered_vectors(1000)[3], k=10, nprobe=16)
+        assert "limitless:3" not in [r[0] for r in results]
+        assert ivf_store.get_stats()['ivf']['mean_list_size'] == pytest.approx(990 / 16)
+
+    def test_exact_until_trained(self, ivf_config):
+        """Test that small stores are searched exactly"""
+        store = VectorStoreService(ivf_config)
+        store.add_vectors([f"news:{i}" for i in range(50)], random_vectors(50))
+
+        assert not store.get_stats()['ivf']['trained']
+        assert len(store.search(random_vectors(1, seed=1)[0], k=100)) == 50
+
+    def test_trains_and_reports_configuration(self, ivf_store):
+        """Test that the index trains once enough vectors are stored"""
+        stats = ivf_store.get_stats()
+
+        assert stats['index_type'] == "ivf"
+        assert stats['ivf']['trained']
+        assert stats['ivf']['nlist'] == 16
+        assert stats['ivf']['nprobe'] == 4
+        assert stats['ivf']['max_list_size'] >= stats['ivf']['mean_list_size']
+
+    def test_recall_against_exact_search(self, ivf_store):
+        """Test that probing a few lists finds most true neighbours, and all lists finds all"""
+        queries = clustered_vectors(20, seed=7)
+        recall = []
+        for query in queries:
+            exact = [r[0] for r in ivf_store.search(query, k=10, nprobe=16)]
+            scores = ivf_store._score_all(query / np.linalg.norm(query))
+            expected = [ivf_store._ids[row] for row in np.argsort(-scores)[:10]]
+            assert exact == expected
+
+            approximate = {r[0] for r in ivf_store.search(query, k=10)}
+            recall.append(len(approximate & set(exact)) / 10)
+
+        assert np.mean(recall) >= 0.9
+
+    def test_removed_and_updated_rows(self, ivf_store):
+        """Test that removals and re-adds are reflected in probed lists"""
+        query = ivf_store._take_rows(np.array([ivf_store.id_to_index["limitless:5"]]))[0]
+        assert ivf_store.search(query, k=1)[0][0] == "limitless:5"
+
+        ivf_store.remove_vector("limitless:5")
+        assert "limitless:5" not in [r[0] for r in ivf_store.search(query, k=10)]
+
+        ivf_store.add_vector("limitless:6", query)
+        results = ivf_store.search(query, k=10)
+        assert results[0] == ("limitless:6", pytest.approx(1.0))
+        assert [r[0] for r in results].count("limitless:6") == 1
+
+    def test_centroids_persist(self, ivf_store, ivf_config):
+        """Test that a reloaded store reuses the checkpointed centroids"""
+        ivf_store.checkpoint()
+        reloaded = VectorStoreService(ivf_config)
+
+        np.testing.assert_array_equal(reloaded._ivf.centroids, ivf_store._ivf.centroids)
+        query = clustered_vectors(1, seed=9)[0]
+        assert reloaded.search(query, k=10) == ivf_store.search(query, k=10)
+
+    def test_retrains_when_unbalanced(self, ivf_store):
+        """Test that piling vectors into one list triggers a retrain"""
+        hot = clustered_vectors(1, seed=3)[0]
+        skewed = hot + 0.01 * random_vectors(3000, seed=4)
+
+        with patch.object(ivf_store, '_train_ivf', wraps=ivf_store._train_ivf) as mock_train:
+            ivf_store.add_vectors([f"news:{i}" for i in range(3000)], skewed)
+
+        assert mock_train.call_count == 1
+        assert ivf_store.get_stats()['ivf']['stale_postings'] == 0
+
+
+class TestVectorStoreQuantization:
+    """Test suite for the scalar-quantized scan"""
+
+    @pytest.fixture(params=["int8", "float16"])
+    def quantized_config(self, request, store_config):
+        """Configuration with quantized storage"""
+        store_config.quantization = request.param
+        return store_config
+
+    @pytest.fixture
+    def quantized_store(self, quantized_config):
+        """Quantized store holding 500 random vectors"""
+        store = VectorStoreService(quantized_config)
+        store.add_vectors([f"limitless:{i}" for i in range(500)], random_vectors(500))
+        yield store
+        store.cleanup()
+
+    def test_rescored_results_match_exact(self, quantized_store):
+        """Test that rescoring returns exact scores for the candidates it finds"""
+        vectors = random_vectors(500)
+        query = random_vectors(1, seed=6)[0]
+        expected = brute_force_search(vectors, [f"limitless:{i}" for i in range(500)], query, 5)
+        results = quantized_store.search(query, k=5)
+
+        assert [r[0] for r in results] == [e[0] for e in expected]
+        assert [r[1] for r in results] == pytest.approx([e[1] for e in expected], abs=1e-5)
+
+    def test_reports_memory_savings_and_recall(self, quantized_store, quantized_config):
+        """Test that the mode reports its footprint and recall against exact search"""
+        report = quantized_store.evaluate_quantization(num_queries=50, k=10)
+
+        expected_savings = 0.75 if quantized_config.quantization == "int8" else 0.5
+        assert report['memory_savings'] == pytest.approx(expected_savings)
+        assert report['code_bytes'] == 500 * 8 * (1 if quantized_config.quantization == "int8" else 2)
+        assert report['recall_at_k'] >= 0.95
+        assert quantized_store.get_stats()['quantization']['mode'] == quantized_config.quantization
+
+    def test_without_rescoring_scores_are_approximate(self, quantized_config):
+        """Test that disabling rescoring returns the code scores directly"""
+        quantized_config.quantization_rescore = 0
+        store = VectorStoreService(quantized_config)
+        vectors = random_vectors(100)
+        store.add_vectors([f"news:{i}" for i in range(100)], vectors)
+        store.checkpoint()
+
+        query = random_vectors(1, seed=8)[0]
+        expected = dict(brute_force_search(vectors, [f"news:{i}" for i in range(100)], query, 100))
+        for vector_id, score in store.search(query, k=10):
+            assert score == pytest.approx(expected[vector_id], abs=0.05)
+
+    def test_codes_persist(self, quantized_store, quantized_config):
+        """Test that a reloaded store reads the saved codes and searches identically"""
+        quantized_store.checkpoint()
+        assert os.path.exists(quantized_store.codes_path)
+
+        reloaded = VectorStoreService(quantized_config)
+        np.testing.assert_array_equal(
+            reloaded._codes[:reloaded.next_index], quantized_store._codes[:quantized_store.next_index]
+        )
+        query = random_vectors(1, seed=9)[0]
+        assert reloaded.search(query, k=10) == quantized_store.search(query, k=10)